@@ -1,34 +1,146 @@
+"""
+登录认证：密码哈希、JWT 签发与校验，以及已校验 token 的缓存。
+
+密码使用 bcrypt 存储。bcrypt 故意计算得很慢（默认 cost 12，单次约 0.2 秒），
+因此哈希和校验都放到专用的线程池（password_hasher）中执行：不阻塞事件循环，
+同时执行的数量不超过 PASSWORD_HASH_WORKERS，排队的请求超过 PASSWORD_HASH_QUEUE 时直接返回 503，
+撞库等突发的登录请求不会占满 CPU、拖慢简历相关接口。
+早期版本以明文存储的密码仍可登录，登录成功时自动改为 bcrypt 哈希（也可运行 migrate_user_password_hash.py --rehash 一次性转换）。
+
+每个需要登录的请求都要校验 token 签名并按用户名查询 users 表，而 token 有效期长达 7 天、用户信息很少变化。
+校验通过的 token 对应的用户信息（UserPrincipal，与数据库会话无关的普通对象）缓存在进程内，
+缓存命中时不再解码 token、也不访问数据库。
+
+缓存失效：
+- 注销（/api/auth/logout）：token 写入 revoked_tokens 表，并从本进程的缓存中移除
+- 用户信息修改或删除：事务提交后移除该用户的所有缓存
+其它 uvicorn worker 的缓存无法通知到，最多在 AUTH_CACHE_TTL 秒后重新校验（届时会查到注销记录）。
+
+配置（环境变量）：
+- JWT_SECRET_KEY：签名密钥
+- AUTH_CACHE_TTL：token 缓存有效期（秒），默认 60，设为 0 关闭缓存
+- AUTH_CACHE_MAX_ENTRIES：最多缓存的 token 数，默认 4096
+- BCRYPT_ROUNDS：bcrypt cost，默认 12；修改后旧哈希在下次登录时按新 cost 重新计算
+- PASSWORD_HASH_WORKERS：密码哈希线程数，默认 2
+- PASSWORD_HASH_QUEUE：线程都忙时允许排队的哈希任务数，默认 32
+"""
+import asyncio
+import hashlib
+import hmac
 import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import NamedTuple, Optional
+import bcrypt
 from jose import JWTError, jwt
-# from passlib.context import CryptContext  # 已禁用密码加密，使用明文存储
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
-from database import get_db
-from models import User
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+from starlette.concurrency import run_in_threadpool
+from database import SessionLocal
+from models import RevokedToken, User
 
 # JWT 配置
 SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your-secret-key-change-this-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 7天过期
 
-# 密码加密（已禁用，使用明文存储）
-# pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", "60"))
+AUTH_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "4096"))
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+PASSWORD_HASH_QUEUE = int(os.getenv("PASSWORD_HASH_QUEUE", "32"))
 
 # OAuth2 方案
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
 
+def _password_bytes(password: str) -> bytes:
+    # bcrypt 只使用前 72 个字节（bcrypt 5 起超出会报错，这里与以往版本一致地截断）
+    return password.encode("utf-8")[:72]
+
+
+def is_password_hashed(stored_password: str) -> bool:
+    return stored_password.startswith(("$2a$", "$2b$", "$2y$"))
+
+
 def verify_password(plain_password: str, stored_password: str) -> bool:
-    """验证密码（明文比较）"""
-    return plain_password == stored_password
+    """验证密码（bcrypt 哈希；兼容早期以明文存储的密码）。耗时较长，在事件循环中请使用 password_hasher.verify"""
+    if is_password_hashed(stored_password):
+        return bcrypt.checkpw(_password_bytes(plain_password), stored_password.encode("ascii"))
+    return hmac.compare_digest(plain_password.encode("utf-8"), stored_password.encode("utf-8"))
 
 
 def get_password_hash(password: str) -> str:
-    """返回密码（不加密，直接存储）"""
-    return password
+    """计算密码的 bcrypt 哈希。耗时较长，在事件循环中请使用 password_hasher.hash"""
+    return bcrypt.hashpw(_password_bytes(password), bcrypt.gensalt(BCRYPT_ROUNDS)).decode("ascii")
+
+
+def password_needs_rehash(stored_password: str) -> bool:
+    """明文密码或 cost 与当前配置不同的哈希需要重新计算"""
+    if not is_password_hashed(stored_password):
+        return True
+    return int(stored_password.split("$")[2]) != BCRYPT_ROUNDS
+
+
+class PasswordHasherBusy(Exception):
+    """密码哈希队列已满，调用方应稍后重试（HTTP 503）"""
+
+
+class PasswordHasher:
+    """
+    在专用线程池中执行 bcrypt（bcrypt 计算时释放 GIL，多个线程可以并行），
+    同时在途（执行中 + 排队中）的任务数不超过 max_workers + max_queue，超出时抛出 PasswordHasherBusy。
+    """
+
+    def __init__(self, max_workers: int = PASSWORD_HASH_WORKERS, max_queue: int = PASSWORD_HASH_QUEUE):
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="password-hash")
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        # 用户不存在时也校验一次，使响应时间与密码错误时相同，不暴露用户名是否存在
+        self._dummy_hash = None
+
+    def _submit(self, func, *args):
+        with self._lock:
+            if self._in_flight >= self.max_workers + self.max_queue:
+                raise PasswordHasherBusy("登录请求过多，请稍后重试")
+            self._in_flight += 1
+        future = self._executor.submit(func, *args)
+        future.add_done_callback(self._release)
+        return future
+
+    def _release(self, _future):
+        with self._lock:
+            self._in_flight -= 1
+
+    async def hash(self, password: str) -> str:
+        return await asyncio.wrap_future(self._submit(get_password_hash, password))
+
+    async def verify(self, plain_password: str, stored_password: Optional[str]) -> bool:
+        """stored_password 为 None（用户不存在）时与一个固定哈希比较并返回 False"""
+        if stored_password is None:
+            if self._dummy_hash is None:
+                self._dummy_hash = await self.hash("dummy-password")
+            await asyncio.wrap_future(self._submit(verify_password, plain_password, self._dummy_hash))
+            return False
+        return await asyncio.wrap_future(self._submit(verify_password, plain_password, stored_password))
+
+    def hash_blocking(self, password: str) -> str:
+        """供同步接口（在线程池中执行）使用，同样受并发上限约束"""
+        return self._submit(get_password_hash, password).result()
+
+    def stats(self):
+        return {"workers": self.max_workers, "queue_size": self.max_queue, "in_flight": self._in_flight}
+
+
+password_hasher = PasswordHasher()
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
@@ -52,11 +164,102 @@ def verify_token(token: str) -> Optional[dict]:
         return None
 
 
-async def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-) -> User:
-    """获取当前登录用户"""
+class UserPrincipal(NamedTuple):
+    """当前登录用户，接口通过 Depends(get_current_user) 获得"""
+    id: int
+    username: str
+    created_at: Optional[datetime]
+    last_login: Optional[datetime]
+
+
+class TokenCache:
+    """已校验 token -> UserPrincipal 的 LRU 缓存，条目在 ttl 秒或 token 过期时（取较早者）失效"""
+
+    def __init__(self, ttl: float = AUTH_CACHE_TTL, max_entries: int = AUTH_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max(1, max_entries)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> Optional[UserPrincipal]:
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            if entry[1] <= time.monotonic():
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+            return entry[0]
+
+    def put(self, token: str, principal: UserPrincipal, token_expires_at: float):
+        """token_expires_at 为 token 的过期时间（Unix 时间戳）"""
+        if self.ttl <= 0:
+            return
+        expires = time.monotonic() + min(self.ttl, token_expires_at - time.time())
+        with self._lock:
+            self._entries[token] = (principal, expires)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_token(self, token: str):
+        with self._lock:
+            self._entries.pop(token, None)
+
+    def invalidate_users(self, user_ids):
+        with self._lock:
+            for token in [t for t, entry in self._entries.items() if entry[0].id in user_ids]:
+                del self._entries[token]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = TokenCache()
+
+
+def token_hash(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def token_expiry(payload: dict) -> float:
+    """token 的过期时间（Unix 时间戳）；没有 exp 时按默认有效期计算"""
+    return payload.get("exp") or time.time() + ACCESS_TOKEN_EXPIRE_MINUTES * 60
+
+
+def revoke_token(db: Session, token: str, payload: dict):
+    """注销 token：记录到 revoked_tokens（顺带清理已过期的记录），提交后从缓存中移除"""
+    now = datetime.utcnow()
+    db.query(RevokedToken).filter(RevokedToken.expires_at < now).delete(synchronize_session=False)
+    hashed = token_hash(token)
+    if db.get(RevokedToken, hashed) is None:
+        db.add(RevokedToken(token_hash=hashed, expires_at=datetime.utcfromtimestamp(token_expiry(payload))))
+    db.commit()
+    token_cache.invalidate_token(token)
+
+
+def _load_principal(username: str, hashed_token: str) -> Optional[UserPrincipal]:
+    """查询用户；token 已注销或用户不存在时返回 None"""
+    db = SessionLocal()
+    try:
+        if db.get(RevokedToken, hashed_token) is not None:
+            return None
+        user = db.query(User).filter(User.username == username).first()
+        if user is None:
+            return None
+        return UserPrincipal(user.id, user.username, user.created_at, user.last_login)
+    finally:
+        db.close()
+
+
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> UserPrincipal:
+    """获取当前登录用户（优先使用缓存，未命中时校验 token 并在线程池中查询数据库）"""
+    principal = token_cache.get(token)
+    if principal is not None:
+        return principal
+
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="无效的认证凭据",
@@ -71,9 +274,32 @@ async def get_current_user(
     if username is None:
         raise credentials_exception
     
-    user = db.query(User).filter(User.username == username).first()
-    if user is None:
+    principal = await run_in_threadpool(_load_principal, username, token_hash(token))
+    if principal is None:
         raise credentials_exception
     
-    return user
+    token_cache.put(token, principal, token_expiry(payload))
+    return principal
+
+
+_CHANGED_USERS_KEY = "changed_user_ids"
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _mark_user_changed(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault(_CHANGED_USERS_KEY, set()).add(target.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_users(session):
+    user_ids = session.info.pop(_CHANGED_USERS_KEY, None)
+    if user_ids:
+        token_cache.invalidate_users(user_ids)
+
 
+@event.listens_for(Session, "after_rollback")
+def _discard_changed_users(session):
+    session.info.pop(_CHANGED_USERS_KEY, None)
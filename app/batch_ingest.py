@@ -0,0 +1,161 @@
+"""
+批量入库：/upload/batch 使用的文件展开（含 ZIP 流式解压）与分块批量写库，/upload-text/batch 也复用写库部分。
+"""
+import os
+import uuid
+import zipfile
+from typing import BinaryIO, Dict, List, Optional
+
+from dedup import DEDUP_KEYS, dedup_keys, find_duplicates, merge_candidate
+from models import Candidate
+from storage import is_blob_location, save_stream, FileTooLarge
+
+SUPPORTED_EXTS = (".pdf", ".docx")
+
+
+def _entry(original_name: str, stored_name: str = None, path: str = None, size: int = 0,
+           sha256: str = None, error: str = None) -> Dict:
+    return {
+        "original_name": original_name,
+        "stored_name": stored_name,
+        "path": path,
+        "size": size,
+        "sha256": sha256,
+        "error": error,
+    }
+
+
+def _store(src: BinaryIO, original_name: str, upload_dir: str, max_size: int) -> Dict:
+    lower = original_name.lower()
+    ext = ".pdf" if lower.endswith(".pdf") else ".docx"
+    stored_name = f"{uuid.uuid4().hex}{ext}"
+    path = os.path.join(upload_dir, stored_name)
+    try:
+        stored = save_stream(src, path, max_size)
+    except FileTooLarge as e:
+        return _entry(original_name, error=str(e))
+    return _entry(original_name, stored_name, path, stored.size, stored.sha256)
+
+
+def expand_upload(file_obj: BinaryIO, filename: str, upload_dir: str, max_size: int, max_files: int) -> List[Dict]:
+    """
+    把一个上传文件展开为若干待解析条目并写入 upload_dir（暂存目录，解析通过后由调用方移入存储）。
+    ZIP 只读取中央目录，再逐个条目按块解压到磁盘，不会把整个压缩包或条目读入内存。
+    每个条目都会返回一条记录，出错的条目带 error 字段。
+    """
+    lower = filename.lower()
+    if lower.endswith(SUPPORTED_EXTS):
+        return [_store(file_obj, filename, upload_dir, max_size)]
+    if not lower.endswith(".zip"):
+        return [_entry(filename, error="只支持 PDF、DOCX 或 ZIP 文件")]
+
+    entries = []
+    try:
+        with zipfile.ZipFile(file_obj) as zf:
+            for info in zf.infolist():
+                if info.is_dir():
+                    continue
+                name = info.filename
+                base = os.path.basename(name)
+                # 跳过 macOS 压缩时附带的元数据文件
+                if name.startswith("__MACOSX/") or base.startswith("._"):
+                    continue
+                if not base.lower().endswith(SUPPORTED_EXTS):
+                    entries.append(_entry(name, error="只支持 PDF 或 DOCX 文件"))
+                    continue
+                if len(entries) >= max_files:
+                    entries.append(_entry(name, error=f"单次最多处理 {max_files} 个文件"))
+                    break
+                # 中央目录里的大小可以伪造，save_stream 仍会按实际解压字节数限制
+                if info.file_size > max_size:
+                    entries.append(_entry(name, error=f"文件大小不能超过 {max_size / 1024 / 1024}MB"))
+                    continue
+                with zf.open(info) as src:
+                    entry = _store(src, base, upload_dir, max_size)
+                entry["original_name"] = name
+                entries.append(entry)
+    except zipfile.BadZipFile:
+        return [_entry(filename, error="ZIP 文件已损坏")]
+    return entries
+
+
+def bulk_insert_candidates(db, rows: List[Dict]) -> List[int]:
+    """
+    一次事务写入一批候选人，返回新记录的 ID（与 rows 顺序一致）。
+    rows 中每项包含 parsed 以及文件字段（可选 external_id）；flush 时 SQLAlchemy 会把同一批 INSERT 合并执行并取回主键，
+    只提交一次，也不需要逐条 refresh。
+    """
+    candidates = [
+        Candidate.from_parsed(
+            row["parsed"],
+            resume_filename=row["stored_name"],
+            resume_original_name=row["original_name"],
+            resume_path=row["path"],
+            content_hash=row.get("sha256"),
+            external_id=row.get("external_id"),
+        )
+        for row in rows
+    ]
+    try:
+        db.add_all(candidates)
+        db.flush()
+        ids = [c.id for c in candidates]
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return ids
+
+
+def resolve_duplicates(db, rows: List[Dict], mode: str) -> List[Optional[Dict]]:
+    """
+    批量入库前的重复检测（mode 为 skip 或 merge），返回与 rows 一一对应的列表：
+    - None：需要新建
+    - {"id", "matched_on", "action"}：与已有候选人重复，merge 时字段已补充到该候选人
+    - {"row", "matched_on", "action": "skipped"}：与本批中更早的第 row 条重复，只保留第一条
+    merge 的修改在这里提交。
+    """
+    keys_list = [dedup_keys(row["parsed"].get("phone"), row["parsed"].get("email"), row.get("sha256")) for row in rows]
+    existing = find_duplicates(db, keys_list)
+    seen: Dict[tuple, int] = {}
+    results: List[Optional[Dict]] = []
+    try:
+        for j, (row, keys, duplicate) in enumerate(zip(rows, keys_list, existing)):
+            if duplicate is not None:
+                info = {"id": duplicate.candidate_id, "matched_on": duplicate.matched_on, "action": "skipped"}
+                if mode == "merge":
+                    candidate = db.query(Candidate).filter(Candidate.id == duplicate.candidate_id).first()
+                    info["updated_fields"] = merge_candidate(candidate, row["parsed"], resume={
+                        "resume_filename": row["stored_name"],
+                        "resume_original_name": row["original_name"],
+                        "resume_path": row["path"],
+                        "content_hash": row.get("sha256"),
+                    } if is_blob_location(row["path"]) else None)
+                    info["action"] = "merged"
+                results.append(info)
+                continue
+            earlier = next(((seen[(c, keys[c])], label) for c, label in DEDUP_KEYS if (c, keys.get(c)) in seen), None)
+            if earlier is not None:
+                results.append({"row": earlier[0], "matched_on": earlier[1], "action": "skipped"})
+                continue
+            for column, value in keys.items():
+                seen.setdefault((column, value), j)
+            results.append(None)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return results
+
+
+def find_external_ids(db, external_ids: List[str], chunk_size: int = 1000) -> Dict[str, int]:
+    """已入库的 external_id -> 候选人 ID，按块 IN 查询"""
+    found: Dict[str, int] = {}
+    values = list(set(external_ids))
+    for start in range(0, len(values), chunk_size):
+        chunk = values[start:start + chunk_size]
+        for external_id, candidate_id in db.query(Candidate.external_id, Candidate.id).filter(
+            Candidate.external_id.in_(chunk)
+        ):
+            found[external_id] = candidate_id
+    return found
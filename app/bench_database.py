@@ -0,0 +1,186 @@
+"""
+SQLite 读写混合压测：用多个进程模拟多个 uvicorn worker，每个进程内多个线程并发执行
+/candidates 列表查询（读）和候选人入库 / 修改标签（写），比较两种数据库配置下的吞吐和延迟：
+
+- baseline：原来的配置（默认回滚日志模式，读写共用一个连接池，没有任何 PRAGMA）
+- tuned：database.py 当前的配置（WAL + PRAGMA，读连接池 + 单个写连接）
+
+运行: python bench_database.py [--processes 4] [--threads 8] [--duration 10] [--write-ratio 0.2] [--rows 3000]
+每种配置都在新建的临时数据库上运行。
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from database import Base, create_db_engine
+from models import Candidate
+from search import create_fts_table, create_name_fts_table
+from synthetic_resumes import generate_corpus, DEGREES, SKILLS, SURNAMES
+from tagging import set_candidate_tags
+from candidate_query import build_candidate_query, count_candidates, fetch_page
+
+PROFILES = ("baseline", "tuned")
+
+
+def prepare_database(path: str, rows: int):
+    url = f"sqlite:///{path}"
+    engine = create_engine(url)
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        create_fts_table(conn)
+        create_name_fts_table(conn)
+    db = sessionmaker(bind=engine)()
+    rng = random.Random(1)
+    for text, expected in generate_corpus(rows, seed=1):
+        candidate = _candidate(text, expected)
+        db.add(candidate)
+        db.flush()
+        set_candidate_tags(db, candidate, rng.sample(SKILLS, 2))
+    db.commit()
+    db.close()
+    engine.dispose()
+    return url
+
+
+def _candidate(text, expected) -> Candidate:
+    return Candidate(
+        name=expected["name"], phone=expected["phone"], email=expected["email"],
+        university=expected["university"], degree=expected["degree"], major=expected["major"],
+        resume_filename="(from_text)", resume_original_name="(from_text)", resume_path="(from_text)",
+        resume_text=text, resume_text_complete=True,
+    )
+
+
+def _engines(profile: str, url: str, threads: int):
+    if profile == "baseline":
+        engine = create_engine(url, connect_args={"check_same_thread": False})
+        return engine, engine
+    reader = create_db_engine(url, pool_size=threads, max_overflow=0)
+    writer = create_db_engine(url, pool_size=1, max_overflow=0)
+    return reader, writer
+
+
+def _read(db, rng):
+    tags = rng.sample(SKILLS, 1) if rng.random() < 0.3 else []
+    name = rng.choice(SURNAMES) if rng.random() < 0.3 else None
+    degree = rng.choice(DEGREES) if rng.random() < 0.3 else None
+    query, order_by = build_candidate_query(db, tags, "and", name, degree, None)
+    count_candidates(query)
+    fetch_page(query, order_by, page=rng.randint(1, 20), page_size=20)
+
+
+def _write(db, rng, corpus):
+    if rng.random() < 0.7:
+        text, expected = rng.choice(corpus)
+        db.add(_candidate(text, expected))
+    else:
+        candidate = db.query(Candidate).filter(Candidate.id == rng.randint(1, 1000)).first()
+        if candidate is not None:
+            set_candidate_tags(db, candidate, rng.sample(SKILLS, 3))
+    db.commit()
+
+
+def _thread_loop(ReadSession, WriteSession, deadline, write_ratio, seed, corpus, out):
+    rng = random.Random(seed)
+    while time.perf_counter() < deadline:
+        is_write = rng.random() < write_ratio
+        db = (WriteSession if is_write else ReadSession)()
+        started = time.perf_counter()
+        try:
+            if is_write:
+                _write(db, rng, corpus)
+            else:
+                _read(db, rng)
+            out["write" if is_write else "read"].append(time.perf_counter() - started)
+        except OperationalError:
+            db.rollback()
+            out["errors"] += 1
+        finally:
+            db.close()
+
+
+def _worker(profile, url, threads, duration, write_ratio, seed, queue):
+    import threading
+
+    reader, writer = _engines(profile, url, threads)
+    ReadSession = sessionmaker(bind=reader)
+    WriteSession = sessionmaker(bind=writer)
+    corpus = generate_corpus(200, seed=seed)
+    results = [{"read": [], "write": [], "errors": 0} for _ in range(threads)]
+    deadline = time.perf_counter() + duration
+    pool = [
+        threading.Thread(target=_thread_loop,
+                         args=(ReadSession, WriteSession, deadline, write_ratio, seed * 100 + i, corpus, results[i]))
+        for i in range(threads)
+    ]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    queue.put({
+        "read": [x for r in results for x in r["read"]],
+        "write": [x for r in results for x in r["write"]],
+        "errors": sum(r["errors"] for r in results),
+    })
+
+
+def _percentile(values, pct):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))] * 1000
+
+
+def run_profile(profile, args):
+    workdir = tempfile.mkdtemp(prefix=f"bench_db_{profile}_")
+    url = prepare_database(os.path.join(workdir, "bench.db"), args.rows)
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    procs = [
+        ctx.Process(target=_worker, args=(profile, url, args.threads, args.duration, args.write_ratio, i + 1, queue))
+        for i in range(args.processes)
+    ]
+    for p in procs:
+        p.start()
+    merged = {"read": [], "write": [], "errors": 0}
+    for _ in procs:
+        part = queue.get()
+        merged["read"] += part["read"]
+        merged["write"] += part["write"]
+        merged["errors"] += part["errors"]
+    for p in procs:
+        p.join()
+
+    reads, writes = merged["read"], merged["write"]
+    print(
+        f"{profile:<9} 读 {len(reads) / args.duration:8.1f}/s  p50 {_percentile(reads, 50):6.1f} ms  "
+        f"p95 {_percentile(reads, 95):7.1f} ms  p99 {_percentile(reads, 99):7.1f} ms | "
+        f"写 {len(writes) / args.duration:7.1f}/s  p95 {_percentile(writes, 95):7.1f} ms | "
+        f"锁超时 {merged['errors']}"
+    )
+
+
+def main():
+    ap = argparse.ArgumentParser(description="SQLite 读写混合压测")
+    ap.add_argument("--processes", type=int, default=4, help="模拟的 uvicorn worker 进程数")
+    ap.add_argument("--threads", type=int, default=8, help="每个进程的并发线程数")
+    ap.add_argument("--duration", type=float, default=10, help="每种配置的压测时长（秒）")
+    ap.add_argument("--write-ratio", type=float, default=0.2, help="写操作占比")
+    ap.add_argument("--rows", type=int, default=3000, help="预置的候选人数量")
+    ap.add_argument("--profile", choices=PROFILES, action="append", help="只运行指定配置，可重复")
+    args = ap.parse_args()
+
+    print(f"{args.processes} 进程 x {args.threads} 线程，写占比 {args.write_ratio:.0%}，每种配置 {args.duration:g} 秒")
+    for profile in args.profile or PROFILES:
+        run_profile(profile, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,393 @@
+"""
+解析器基准测试：在合成简历语料上测量解析耗时、吞吐、内存和字段准确率，结果可输出为 JSON 用于版本间对比。
+
+运行: python bench_parser.py [--formats text,pdf,docx] [--count 5000] [--files 30] [--json result.json]
+
+- text：parse_resume_text_cn / parse_candidate_info 的单份耗时（微秒），可用 --baseline 与旧版本对比，
+  对比时会同时校验两个版本在整个语料上的输出完全一致，例如：
+      git show HEAD~1:app/parser.py > /tmp/parser_old.py
+      python bench_parser.py --formats text --baseline /tmp/parser_old.py
+- pdf / docx：生成 1~20 页的合成简历文件（部分教育经历为表格），逐份测量文字提取和字段解析两个阶段的
+  p50 / p95 耗时，再用 --workers 个进程并行解析全部文件，得到吞吐（份/秒/核）和工作进程的峰值内存；
+  --memory 时另外用 tracemalloc 逐份测量解析过程中 Python 对象的峰值内存（会拖慢速度，不与计时同时进行）。
+
+各格式都会与生成时的期望结果比较，输出每个字段的 precision / recall：
+解析出非空值视为一次预测，与期望相同为正确；期望非空而未正确解析计入 recall 的分母。
+
+--json 把结果写入文件；--compare 与之前保存的结果比较，耗时或吞吐变差超过 --tolerance、
+或任一字段的 precision / recall 下降超过 0.5 个百分点时以非零状态退出，可用于 CI。
+--corpus-dir 指定语料目录时会保留生成的文件，参数相同的下次运行直接复用。
+"""
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+import parser as current_parser
+from synthetic_resumes import generate_corpus, generate_documents, render_docx, render_pdf
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+FUNCTIONS = ("parse_resume_text_cn", "parse_candidate_info")
+FILE_FORMATS = ("pdf", "docx")
+FIELDS = ("name", "gender", "age", "phone", "email", "university", "degree", "major")
+SCORE_TOLERANCE = 0.005  # --compare 时 precision / recall 允许的下降
+TIME_FLOOR_MS = 0.5  # --compare 时文件各阶段耗时差值小于该值不算回归（亚毫秒级的差异主要是噪声）
+TEXT_PARAMS = ("count", "seed")
+FILE_PARAMS = ("files", "min_pages", "max_pages", "seed", "full_text")
+
+
+def load_module(path: str, name: str = "baseline_parser"):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def time_function(func, texts, repeat: int) -> float:
+    """返回每份简历的最佳平均耗时（微秒）"""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for text in texts:
+            func(text)
+        best = min(best, time.perf_counter() - started)
+    return best / len(texts) * 1e6
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """最近秩百分位数"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(q / 100 * len(ordered) + 0.5)) - 1))]
+
+
+def field_scores(pairs: List[Tuple[Dict, Dict]]) -> Dict[str, Dict[str, float]]:
+    """pairs 为 (解析结果, 期望结果)，返回每个字段的 precision / recall"""
+    scores = {}
+    for field in FIELDS:
+        correct = predicted = relevant = 0
+        for parsed, expected in pairs:
+            value, truth = parsed.get(field), expected.get(field)
+            predicted += bool(value)
+            relevant += bool(truth)
+            correct += bool(value) and value == truth
+        scores[field] = {
+            "precision": round(correct / predicted, 4) if predicted else None,
+            "recall": round(correct / relevant, 4) if relevant else None,
+        }
+    return scores
+
+
+def _peak_rss_mb(who) -> Optional[float]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(who).ru_maxrss
+    # Linux 单位为 KB，macOS 为字节
+    return round(peak / 1024 / (1024 if sys.platform == "darwin" else 1), 1)
+
+
+def _print_scores(scores: Dict[str, Dict[str, float]]):
+    def fmt(v):
+        return "  -  " if v is None else f"{v:.1%}"
+    print("  字段       precision  recall")
+    for field, s in scores.items():
+        print(f"  {field:<10} {fmt(s['precision']):>9}  {fmt(s['recall']):>6}")
+
+
+# ==================== 纯文本 ====================
+
+def bench_text(args) -> Tuple[Dict, bool]:
+    corpus = generate_corpus(args.count, seed=args.seed)
+    texts = [text for text, _ in corpus]
+    avg_chars = sum(len(t) for t in texts) / len(texts)
+    print(f"[text] 语料: {len(texts)} 份合成简历，平均 {avg_chars:.0f} 字符")
+
+    baseline = load_module(args.baseline) if args.baseline else None
+    ok = True
+    result = {"count": len(texts), "avg_chars": round(avg_chars), "us_per_doc": {}}
+    for name in FUNCTIONS:
+        func = getattr(current_parser, name)
+        current_us = time_function(func, texts, args.repeat)
+        result["us_per_doc"][name] = round(current_us, 2)
+        line = f"{name:<22} 当前 {current_us:8.1f} µs/份"
+        if baseline is not None:
+            base_func = getattr(baseline, name)
+            base_us = time_function(base_func, texts, args.repeat)
+            line += f"   基线 {base_us:8.1f} µs/份   加速 {base_us / current_us:5.2f}x"
+            mismatches = sum(1 for t in texts if func(t) != base_func(t))
+            if mismatches:
+                ok = False
+                line += f"   输出不一致 {mismatches} 份"
+        print(line)
+
+    # 字段准确率（与生成时的期望结果比较）
+    pairs = [(current_parser.parse_resume_text_cn(text), expected) for text, expected in corpus]
+    hits = {field: sum(parsed.get(field) == expected[field] for parsed, expected in pairs) for field in FIELDS}
+    print("字段准确率: " + ", ".join(f"{k} {v / len(corpus):.1%}" for k, v in hits.items()))
+    result["accuracy"] = {k: round(v / len(corpus), 4) for k, v in hits.items()}
+    result["fields"] = field_scores(pairs)
+    return result, ok
+
+
+# ==================== PDF / DOCX ====================
+
+def prepare_corpus(args, formats: List[str]) -> Tuple[str, List[Dict]]:
+    """生成（或复用）文件语料，返回 (目录, [{"path", "format", "layout", "pages", "expected"}])"""
+    corpus_dir = args.corpus_dir or tempfile.mkdtemp(prefix="bench_parser_")
+    os.makedirs(corpus_dir, exist_ok=True)
+    manifest_path = os.path.join(corpus_dir, "manifest.json")
+    params = {"seed": args.seed, "files": args.files, "min_pages": args.min_pages, "max_pages": args.max_pages}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        entries = [e for e in manifest["entries"] if e["format"] in formats]
+        if manifest["params"] == params and {e["format"] for e in entries} == set(formats):
+            print(f"复用语料目录 {corpus_dir}")
+            return corpus_dir, entries
+
+    started = time.perf_counter()
+    documents = generate_documents(args.files, seed=args.seed, min_pages=args.min_pages, max_pages=args.max_pages)
+    entries = []
+    for fmt in formats:
+        render = render_pdf if fmt == "pdf" else render_docx
+        for i, document in enumerate(documents):
+            path = os.path.join(corpus_dir, f"{i:04d}_{document['layout']}_{document['pages']}p.{fmt}")
+            render(document, path)
+            entries.append({"path": path, "format": fmt, "layout": document["layout"],
+                            "pages": document["pages"], "expected": document["expected"]})
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump({"params": params, "entries": entries}, f, ensure_ascii=False)
+    print(f"生成语料: {len(entries)} 个文件，用时 {time.perf_counter() - started:.1f}s，目录 {corpus_dir}")
+    return corpus_dir, entries
+
+
+def extract(entry: Dict, full_text: bool) -> str:
+    if entry["format"] == "pdf":
+        return current_parser.extract_pdf_text(entry["path"], stop_when_complete=not full_text)[0]
+    return current_parser.extract_text_from_docx(entry["path"])
+
+
+def bench_stages(entries: List[Dict], full_text: bool) -> Dict:
+    """逐份测量提取和字段解析两个阶段（单进程），同时统计字段准确率"""
+    extract(entries[0], full_text)  # 预热：导入依赖、加载字体映射
+    extract_ms, parse_ms, total_ms = [], [], []
+    pairs, by_layout = [], {}
+    for entry in entries:
+        started = time.perf_counter()
+        text = extract(entry, full_text)
+        extracted = time.perf_counter()
+        parsed = current_parser.parse_resume_text_cn(text)
+        finished = time.perf_counter()
+        extract_ms.append((extracted - started) * 1000)
+        parse_ms.append((finished - extracted) * 1000)
+        total_ms.append((finished - started) * 1000)
+        pairs.append((parsed, entry["expected"]))
+        by_layout.setdefault(entry["layout"], []).append((parsed, entry["expected"]))
+
+    def stats(values):
+        return {"p50": round(percentile(values, 50), 3), "p95": round(percentile(values, 95), 3),
+                "max": round(max(values), 3)}
+
+    return {
+        "files": len(entries),
+        "pages": sum(e["pages"] for e in entries),
+        "extract_ms": stats(extract_ms),
+        "parse_ms": stats(parse_ms),
+        "total_ms": stats(total_ms),
+        "files_per_second_single_core": round(len(entries) / (sum(total_ms) / 1000), 2),
+        "fields": field_scores(pairs),
+        "fields_by_layout": {layout: field_scores(p) for layout, p in sorted(by_layout.items())},
+    }
+
+
+def _parse_for_pool(args: Tuple[str, bool]) -> bool:
+    path, full_text = args
+    current_parser.parse_resume_file(path, include_text=True, early_exit=not full_text)
+    return True
+
+
+def bench_pool(entries: List[Dict], workers: int, full_text: bool) -> Dict:
+    """进程池并行解析全部文件（与上传接口相同的 parse_resume_file），测量吞吐和工作进程峰值内存"""
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(_parse_for_pool, [(entries[0]["path"], full_text)] * workers))  # 预热每个进程
+        started = time.perf_counter()
+        list(executor.map(_parse_for_pool, [(e["path"], full_text) for e in entries]))
+        elapsed = time.perf_counter() - started
+    return {
+        "workers": workers,
+        "files_per_second": round(len(entries) / elapsed, 2),
+        "files_per_second_per_core": round(len(entries) / elapsed / workers, 2),
+        "pages_per_second": round(sum(e["pages"] for e in entries) / elapsed, 2),
+        "worker_peak_rss_mb": _peak_rss_mb(resource.RUSAGE_CHILDREN) if resource else None,
+    }
+
+
+def bench_memory(entries: List[Dict], full_text: bool) -> Dict:
+    """逐份用 tracemalloc 测量解析过程中 Python 对象的峰值内存（MB）"""
+    peaks = []
+    for entry in entries:
+        tracemalloc.start()
+        try:
+            current_parser.parse_resume_file(entry["path"], include_text=True, early_exit=not full_text)
+            peaks.append(tracemalloc.get_traced_memory()[1] / 1024 / 1024)
+        finally:
+            tracemalloc.stop()
+    return {"p50": round(percentile(peaks, 50), 2), "p95": round(percentile(peaks, 95), 2), "max": round(max(peaks), 2)}
+
+
+def bench_files(args, formats: List[str]) -> Dict:
+    corpus_dir, entries = prepare_corpus(args, formats)
+    results = {}
+    try:
+        for fmt in formats:
+            fmt_entries = [e for e in entries if e["format"] == fmt]
+            print(f"\n[{fmt}] {len(fmt_entries)} 个文件，共 {sum(e['pages'] for e in fmt_entries)} 页"
+                  f"{'（全文提取）' if args.full_text else ''}")
+            result = bench_stages(fmt_entries, args.full_text)
+            for stage in ("extract_ms", "parse_ms", "total_ms"):
+                s = result[stage]
+                print(f"  {stage[:-3]:<8} p50 {s['p50']:9.2f} ms   p95 {s['p95']:9.2f} ms   max {s['max']:9.2f} ms")
+            print(f"  单核 {result['files_per_second_single_core']:.2f} 份/秒")
+            _print_scores(result["fields"])
+            if args.memory:
+                result["python_peak_mb"] = bench_memory(fmt_entries, args.full_text)
+                m = result["python_peak_mb"]
+                print(f"  Python 峰值内存 p50 {m['p50']} MB   p95 {m['p95']} MB   max {m['max']} MB")
+            results[fmt] = result
+
+        all_entries = [e for e in entries if e["format"] in formats]
+        pool = bench_pool(all_entries, args.workers, args.full_text)
+        print(f"\n[pool] {pool['workers']} 个进程：{pool['files_per_second']:.2f} 份/秒，"
+              f"每核 {pool['files_per_second_per_core']:.2f} 份/秒，{pool['pages_per_second']:.2f} 页/秒，"
+              f"工作进程峰值 RSS {pool['worker_peak_rss_mb']} MB")
+        results["pool"] = pool
+    finally:
+        if not args.corpus_dir:
+            shutil.rmtree(corpus_dir, ignore_errors=True)
+    return results
+
+
+# ==================== 对比 ====================
+
+def compare(current: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """返回回归项说明；耗时越小越好、吞吐越大越好。语料参数不同的部分不比较"""
+    regressions = []
+
+    def same(keys):
+        differing = [k for k in keys if current["args"].get(k) != baseline.get("args", {}).get(k)]
+        if differing:
+            print(f"参数不同（{', '.join(differing)}），跳过对应部分的比较")
+        return not differing
+
+    def check_time(label, now, before, floor=0.0):
+        if now is not None and before and now > before * (1 + tolerance) and now - before >= floor:
+            regressions.append(f"{label}: {before} -> {now}（慢 {now / before - 1:.0%}）")
+
+    def check_rate(label, now, before):
+        if now is not None and before and now < before * (1 - tolerance):
+            regressions.append(f"{label}: {before} -> {now}（降 {1 - now / before:.0%}）")
+
+    def check_scores(label, now, before):
+        for field, s in before.items():
+            for metric in ("precision", "recall"):
+                old, new = s.get(metric), now.get(field, {}).get(metric)
+                if old is not None and (new is None or new < old - SCORE_TOLERANCE):
+                    regressions.append(f"{label} {field} {metric}: {old:.1%} -> {new if new is None else f'{new:.1%}'}")
+
+    if "text" in current and "text" in baseline and same(TEXT_PARAMS):
+        for name, before in baseline["text"]["us_per_doc"].items():
+            check_time(f"text {name} µs/份", current["text"]["us_per_doc"].get(name), before)
+        check_scores("text", current["text"]["fields"], baseline["text"]["fields"])
+    if "files" not in current or "files" not in baseline or not same(FILE_PARAMS):
+        return regressions
+    for fmt in FILE_FORMATS:
+        now, before = current["files"].get(fmt), baseline["files"].get(fmt)
+        if not now or not before:
+            continue
+        for stage in ("extract_ms", "parse_ms", "total_ms"):
+            for q in ("p50", "p95"):
+                check_time(f"{fmt} {stage} {q}", now[stage][q], before[stage][q], TIME_FLOOR_MS)
+        check_scores(fmt, now["fields"], before["fields"])
+    # 吞吐按所有文件格式一起测量，格式和进程数都相同时才可比
+    now, before = current["files"].get("pool"), baseline["files"].get("pool")
+    if now and before and now["workers"] == before["workers"] and \
+            [f for f in current["files"] if f in FILE_FORMATS] == [f for f in baseline["files"] if f in FILE_FORMATS]:
+        check_rate("pool 每核 份/秒", now["files_per_second_per_core"], before["files_per_second_per_core"])
+    return regressions
+
+
+def main():
+    ap = argparse.ArgumentParser(description="简历解析基准测试")
+    ap.add_argument("--formats", default="text,pdf,docx", help="逗号分隔：text、pdf、docx")
+    ap.add_argument("--count", type=int, default=5000, help="纯文本合成简历数量")
+    ap.add_argument("--repeat", type=int, default=5, help="纯文本重复次数，取最好的一次")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--baseline", help="旧版本 parser.py 的路径，用于纯文本对比")
+    ap.add_argument("--files", type=int, default=30, help="每种文件格式的合成简历数量")
+    ap.add_argument("--min-pages", type=int, default=1)
+    ap.add_argument("--max-pages", type=int, default=20)
+    ap.add_argument("--corpus-dir", help="保存（复用）生成的文件语料，默认使用临时目录并在结束后删除")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="吞吐测试的进程数，默认 CPU 核数")
+    ap.add_argument("--full-text", action="store_true", help="PDF 提取全文（默认与上传接口一样字段找齐即停止）")
+    ap.add_argument("--memory", action="store_true", help="逐份测量 Python 峰值内存")
+    ap.add_argument("--json", help="把结果写入该 JSON 文件")
+    ap.add_argument("--compare", help="与之前 --json 保存的结果比较，出现回归时以非零状态退出")
+    ap.add_argument("--tolerance", type=float, default=0.2, help="--compare 时耗时 / 吞吐允许变差的比例")
+    args = ap.parse_args()
+
+    formats = [f.strip() for f in args.formats.split(",") if f.strip()]
+    unknown = set(formats) - {"text", *FILE_FORMATS}
+    if unknown:
+        ap.error(f"未知格式: {', '.join(sorted(unknown))}")
+
+    results = {
+        "parser_version": current_parser.PARSER_VERSION,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "args": {k: v for k, v in vars(args).items() if k not in ("json", "compare")},
+    }
+    ok = True
+    if "text" in formats:
+        results["text"], ok = bench_text(args)
+    file_formats = [f for f in formats if f in FILE_FORMATS]
+    if file_formats:
+        results["files"] = bench_files(args, file_formats)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已写入 {args.json}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        print(f"\n与 {args.compare}（解析器版本 {baseline.get('parser_version')}）对比：" +
+              ("无回归" if not regressions else f"{len(regressions)} 项回归"))
+        for line in regressions:
+            print("  " + line)
+        if regressions:
+            ok = False
+
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
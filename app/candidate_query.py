@@ -0,0 +1,108 @@
+"""
+/candidates 的筛选与分页查询。单独成模块，便于 check_query_plans.py 对实际执行的 SQL 做执行计划检查。
+
+各筛选条件使用的索引：
+- tag：tags.name 唯一索引 + candidate_tags (tag_id, candidate_id)
+- name：candidate_names_fts（姓名按字符建的全文索引，子串匹配）
+- degree：candidates (degree, id)，同时满足按 id 倒序分页
+- q：candidates_fts
+"""
+from typing import List, Optional, Tuple
+
+from sqlalchemy import func, or_, text, Integer, Float
+from sqlalchemy.orm import Session, undefer
+
+from models import Candidate
+from search import (
+    FTS_TABLE, NAME_FTS_TABLE, BM25_WEIGHTS,
+    build_match_query, build_name_match_query, fts_available, query_terms,
+)
+from tagging import tag_filter
+
+
+def build_candidate_query(
+    db: Session,
+    tag_names: List[str],
+    tag_mode: str = "and",
+    name: Optional[str] = None,
+    degree: Optional[str] = None,
+    search: Optional[str] = None,
+):
+    """按筛选条件构造查询，返回 (query, order_by)；参数应已去除首尾空白，空值表示不筛选"""
+    query = db.query(Candidate)
+    order_by = [Candidate.id.desc()]
+
+    # 全文检索：FTS5 索引可用时按 bm25 相关度排序，否则回落为 LIKE
+    if search:
+        match = build_match_query(search)
+        if match and fts_available(db.connection()):
+            weights = ", ".join(str(w) for w in BM25_WEIGHTS)
+            fts = text(
+                f"SELECT rowid AS id, bm25({FTS_TABLE}, {weights}) AS rank "
+                f"FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :match"
+            ).bindparams(match=match).columns(id=Integer, rank=Float).subquery()
+            query = query.join(fts, fts.c.id == Candidate.id)
+            order_by = [fts.c.rank, Candidate.id.desc()]
+        else:
+            for term in query_terms(search):
+                like = f"%{term}%"
+                query = query.filter(or_(
+                    Candidate.resume_text.ilike(like),
+                    Candidate.name.ilike(like),
+                    Candidate.tags.ilike(like),
+                ))
+
+    # 按标签关联表精确筛选
+    if tag_names:
+        query = query.filter(tag_filter(tag_names, tag_mode))
+
+    # 姓名子串检索（大小写不敏感）
+    if name:
+        name_match = build_name_match_query(name)
+        if name_match and fts_available(db.connection(), NAME_FTS_TABLE):
+            matched = text(
+                f"SELECT rowid FROM {NAME_FTS_TABLE} WHERE {NAME_FTS_TABLE} MATCH :name_match"
+            ).bindparams(name_match=name_match).columns(rowid=Integer)
+            query = query.filter(Candidate.id.in_(matched))
+        else:
+            query = query.filter(
+                Candidate.name.isnot(None),
+                func.lower(Candidate.name).like(func.lower(f"%{name}%"))
+            )
+
+    # 学历精确匹配
+    if degree:
+        query = query.filter(Candidate.degree == degree)
+
+    return query, order_by
+
+
+def count_candidates(query) -> int:
+    return query.with_entities(func.count(Candidate.id)).order_by(None).scalar()
+
+
+def fetch_page(
+    query,
+    order_by,
+    page: int = 1,
+    page_size: int = 10,
+    after_id: Optional[int] = None,
+    before_id: Optional[int] = None,
+    with_text: bool = False,
+) -> Tuple[List[Candidate], bool, bool]:
+    """
+    取一页候选人，返回 (候选人列表, 是否有上一页, 是否有下一页)。
+    after_id / before_id 为游标分页（按 id 定位），否则按 page 做 OFFSET 分页；多取一条用于判断是否还有下一页。
+    """
+    if with_text:
+        query = query.options(undefer(Candidate.resume_text))
+    if before_id is not None:
+        # 向前翻页：按 id 升序取紧挨着游标的一页，再反转回降序
+        rows = query.filter(Candidate.id > before_id).order_by(Candidate.id.asc()).limit(page_size + 1).all()
+        return rows[:page_size][::-1], len(rows) > page_size, True
+    if after_id is not None:
+        query = query.filter(Candidate.id < after_id).order_by(*order_by)
+    else:
+        query = query.order_by(*order_by).offset((page - 1) * page_size)
+    rows = query.limit(page_size + 1).all()
+    return rows[:page_size], after_id is not None or page > 1, len(rows) > page_size
@@ -0,0 +1,149 @@
+"""
+/candidates 查询计划回归检查：在临时 SQLite 数据库上，对每种筛选条件组合（标签、姓名、学历、全文检索）
+和每种分页方式（OFFSET、after_id、before_id）执行 candidate_query 中的实际查询，
+对执行过的每条 SQL 运行 EXPLAIN QUERY PLAN，出现全表扫描（SCAN candidates 等）即视为失败。
+
+运行: python check_query_plans.py [--rows 3000] [--verbose]
+新增筛选条件或修改索引后运行一次；有失败时退出码为 1。
+"""
+import argparse
+import itertools
+import os
+import random
+import re
+import sys
+import tempfile
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from database import Base
+from models import Candidate
+from search import create_fts_table, create_name_fts_table
+from synthetic_resumes import generate_corpus, SKILLS
+from tagging import set_candidate_tags
+from candidate_query import build_candidate_query, count_candidates, fetch_page
+
+# 对这些表的 SCAN 视为全表扫描（FTS 虚拟表的 "SCAN ... VIRTUAL TABLE INDEX" 是索引查找，不在此列）
+FULL_SCAN_PATTERN = re.compile(r"^SCAN (candidates|candidate_tags|tags)\b(?! VIRTUAL TABLE)")
+
+TAG_CASES = {
+    "无": [],
+    "单个标签": ["Python"],
+    "多标签 and": ["Python", "Docker"],
+    "多标签 or": ["Python", "Docker"],
+}
+NAME_CASES = {"无": None, "中文姓名": "王", "英文姓名": "li"}
+DEGREE_CASES = {"无": None, "学历": "本科"}
+SEARCH_CASES = {"无": None, "全文检索": "React 北京"}
+
+
+def build_database(path: str, rows: int):
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        create_fts_table(conn)
+        create_name_fts_table(conn)
+
+    rng = random.Random(7)
+    db = sessionmaker(bind=engine)()
+    for i, (text, expected) in enumerate(generate_corpus(rows, seed=7)):
+        candidate = Candidate(
+            name=expected["name"] if i % 10 else f"Li {expected['name']}",
+            phone=expected["phone"],
+            email=expected["email"],
+            university=expected["university"],
+            degree=expected["degree"],
+            major=expected["major"],
+            resume_filename="(from_text)",
+            resume_original_name="(from_text)",
+            resume_path="(from_text)",
+            resume_text=text,
+            resume_text_complete=True,
+        )
+        db.add(candidate)
+        db.flush()
+        set_candidate_tags(db, candidate, rng.sample(SKILLS, 3))
+    db.commit()
+    db.close()
+    return engine
+
+
+def capture_statements(engine, run):
+    statements = []
+
+    def _before_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", _before_execute)
+    try:
+        run()
+    finally:
+        event.remove(engine, "before_cursor_execute", _before_execute)
+    return statements
+
+
+def explain(engine, statement, parameters):
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        cursor.execute("EXPLAIN QUERY PLAN " + statement, parameters)
+        return [row[3] for row in cursor.fetchall()]
+    finally:
+        raw.close()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="/candidates 查询计划回归检查")
+    ap.add_argument("--rows", type=int, default=3000, help="临时数据库中的候选人数量")
+    ap.add_argument("--verbose", action="store_true", help="输出所有查询的执行计划")
+    args = ap.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="query_plans_")
+    engine = build_database(os.path.join(workdir, "plans.db"), args.rows)
+    Session = sessionmaker(bind=engine)
+
+    checked, failures = 0, []
+    for (tag_case, tags), (name_case, name), (degree_case, degree), (search_case, search) in itertools.product(
+        TAG_CASES.items(), NAME_CASES.items(), DEGREE_CASES.items(), SEARCH_CASES.items()
+    ):
+        tag_mode = "or" if tag_case.endswith("or") else "and"
+        unfiltered = not (tags or name or degree or search)
+        paging_modes = {"page=1": {}, "page=3": {"page": 3}}
+        if not search:
+            paging_modes.update({"after_id": {"after_id": args.rows // 2}, "before_id": {"before_id": args.rows // 2}})
+
+        for paging, kwargs in paging_modes.items():
+            label = f"标签={tag_case} 姓名={name_case} 学历={degree_case} 检索={search_case} 分页={paging}"
+            db = Session()
+            try:
+                def run():
+                    query, order_by = build_candidate_query(db, tags, tag_mode, name, degree, search)
+                    count_candidates(query)
+                    fetch_page(query, order_by, page_size=20, with_text=bool(search), **kwargs)
+
+                statements = capture_statements(engine, run)
+            finally:
+                db.close()
+
+            for statement, parameters in statements:
+                if not statement.lstrip().upper().startswith("SELECT"):
+                    continue
+                plan = explain(engine, statement, parameters)
+                checked += 1
+                scans = [line for line in plan if FULL_SCAN_PATTERN.match(line)]
+                # 不带任何筛选时 COUNT 和按 id 倒序取第一页本来就要从表头开始扫描
+                if scans and not unfiltered:
+                    failures.append((label, statement, plan))
+                if args.verbose:
+                    print(f"{label}\n  " + "\n  ".join(plan))
+
+    print(f"检查了 {checked} 条查询，{len(failures)} 条出现全表扫描")
+    for label, statement, plan in failures:
+        print(f"\n[全表扫描] {label}\n{statement}\n  " + "\n  ".join(plan))
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
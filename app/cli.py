@@ -0,0 +1,359 @@
+"""
+离线批量导入 / 重新解析简历（不经过 HTTP 接口）
+
+    python cli.py import DIR [--dedup skip|merge|force]   # 导入目录（递归）下的所有 PDF / DOCX
+    python cli.py reparse [--since 2024-01-01]            # 用当前解析规则重新解析已入库候选人的简历文件
+
+两个命令都在进程池中解析（默认使用全部 CPU 核，解析全文，不提前结束），每 --batch-size 条一次事务写库，
+定期输出进度和预计剩余时间：
+- import：文件按内容寻址存入存储，重复检测和批量写入与 /upload/batch 相同
+- reparse：解析出的字段覆盖旧值（新结果为空的字段保留原值），并更新全文；--since 只处理该日期之后入库的候选人
+
+每写完一批把进度写入检查点文件（默认 cli_<命令>.checkpoint.json），中断后重新执行同一命令从检查点继续，
+--restart 忽略检查点从头开始；全部完成后删除检查点。import 的进度按文件路径排序记录，期间目录内容不应改变。
+
+配置（环境变量）：
+- PARSE_WORKERS：进程池大小（--workers 的默认值），默认 CPU 核数
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import or_
+
+from batch_ingest import SUPPORTED_EXTS, bulk_insert_candidates, resolve_duplicates
+from database import SessionLocal, WriteSessionLocal
+from dedup import DEDUP_MODE, DEDUP_MODES, MERGE_FIELDS
+from models import Candidate
+from parse_service import PARSE_WORKERS
+from parser import parse_resume_file
+from storage import STAGING_DIR, blob_key, blob_store, discard_staged, file_sha256, new_staging_path, resolve
+
+DEFAULT_BATCH_SIZE = 500
+PROGRESS_INTERVAL = 2.0  # 输出进度的最短间隔（秒）
+
+
+def _error_message(e: Exception) -> str:
+    return str(e).encode('utf-8', errors='replace').decode('utf-8')
+
+
+# ==================== 工作进程中执行 ====================
+
+def _parse_path(path: str) -> Dict:
+    """计算文件哈希并解析全文；失败时返回 {"error": ...}"""
+    try:
+        return {"sha256": file_sha256(path), "parsed": parse_resume_file(path, include_text=True, early_exit=False)}
+    except Exception as e:
+        return {"error": _error_message(e)}
+
+
+def _parse_target(target: tuple) -> Dict:
+    """target 为 (候选人 ID, 文件位置)，解析存储中的文件（S3 上的先下载到临时文件）"""
+    try:
+        store, key = resolve(target[1])
+        with store.local_file(key) as path:
+            return {"parsed": parse_resume_file(path, include_text=True, early_exit=False)}
+    except Exception as e:
+        return {"error": _error_message(e)}
+
+
+# ==================== 进度与检查点 ====================
+
+class Progress:
+    """按固定间隔输出已处理数量、速度和预计剩余时间"""
+
+    def __init__(self, label: str, total: int):
+        self.label = label
+        self.total = total
+        self.done = 0
+        self.failed = 0
+        self.duplicates = 0
+        self.started = time.monotonic()
+        self._last_report = 0.0
+
+    def update(self, done: int, failed: int = 0, duplicates: int = 0):
+        self.done += done
+        self.failed += failed
+        self.duplicates += duplicates
+        now = time.monotonic()
+        if now - self._last_report >= PROGRESS_INTERVAL or self.done >= self.total:
+            self._last_report = now
+            print(self.line(), flush=True)
+
+    def line(self) -> str:
+        elapsed = time.monotonic() - self.started
+        rate = self.done / elapsed if elapsed > 0 else 0
+        eta = (self.total - self.done) / rate if rate > 0 else None
+        percent = self.done / self.total * 100 if self.total else 100
+        return (f"[{self.label}] {self.done}/{self.total} ({percent:.1f}%)，{self.counts()}，"
+                f"{rate:.1f} 个/秒，已用 {_format_seconds(elapsed)}，预计剩余 {_format_seconds(eta)}")
+
+    def counts(self) -> str:
+        succeeded = self.done - self.failed - self.duplicates
+        duplicates = f"，重复 {self.duplicates}" if self.duplicates else ""
+        return f"成功 {succeeded}{duplicates}，失败 {self.failed}"
+
+
+def _format_seconds(seconds: Optional[float]) -> str:
+    if seconds is None:
+        return "--:--"
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes:02d}:{seconds:02d}"
+
+
+class Checkpoint:
+    """检查点文件：{"command", "scope", "position"}，scope 不同（换了目录或参数）时不使用"""
+
+    def __init__(self, path: str, command: str, scope: str):
+        self.path = path
+        self.command = command
+        self.scope = scope
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("command") != self.command or data.get("scope") != self.scope:
+            print(f"检查点 {self.path} 属于其它任务（{data.get('command')} {data.get('scope')}），忽略")
+            return None
+        return data.get("position")
+
+    def save(self, position):
+        # 先写临时文件再替换，中途被杀时不会留下半个检查点
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"command": self.command, "scope": self.scope, "position": position}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def _run_pool(label: str, items: List, task: Callable, flush: Callable, position_of: Callable,
+              checkpoint: Checkpoint, workers: int, batch_size: int):
+    """
+    在进程池中对 items 逐个执行 task，结果按 items 顺序每 batch_size 条交给 flush 写库，
+    flush 返回 (失败条数, 重复条数)；每批写完后把最后一条的 position_of(item) 写入检查点。
+    """
+    progress = Progress(label, len(items))
+    print(f"[{label}] 共 {len(items)} 个，{workers} 个解析进程，每批 {batch_size} 条")
+    # 最多提前提交两批：写库期间解析进程继续工作，写库跟不上时也不会把所有结果（含全文）堆在内存中
+    window = 2 * batch_size
+    pending = deque()
+    queued = iter(items)
+    batch = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        try:
+            while True:
+                for item in queued:
+                    pending.append((item, executor.submit(task, item)))
+                    if len(pending) >= window:
+                        break
+                if not pending:
+                    break
+                # 按提交顺序取结果，检查点之前的条目都已写库
+                item, future = pending.popleft()
+                batch.append((item, future.result()))
+                if len(batch) >= batch_size:
+                    progress.update(len(batch), *flush(batch))
+                    checkpoint.save(position_of(batch[-1][0]))
+                    batch = []
+            if batch:
+                progress.update(len(batch), *flush(batch))
+        except KeyboardInterrupt:
+            print(f"\n已中断，下次运行同一命令将从检查点 {checkpoint.path} 继续")
+            for _, future in pending:
+                future.cancel()  # 取消尚未开始的任务，否则退出时会等它们全部执行完
+            executor.shutdown(wait=False)
+            sys.exit(130)
+    checkpoint.clear()
+    print(f"[{label}] 完成：{progress.counts()}，用时 {_format_seconds(time.monotonic() - progress.started)}")
+
+
+# ==================== import ====================
+
+def _find_resume_files(root: str) -> List[str]:
+    """递归查找 PDF / DOCX，按路径排序（检查点依赖固定顺序）；跳过隐藏目录（含存储的暂存目录）"""
+    paths = []
+    staging = os.path.abspath(STAGING_DIR)
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames
+                       if not d.startswith(".") and os.path.abspath(os.path.join(dirpath, d)) != staging]
+        for filename in filenames:
+            if filename.lower().endswith(SUPPORTED_EXTS) and not filename.startswith("._"):
+                paths.append(os.path.join(dirpath, filename))
+    paths.sort()
+    return paths
+
+
+def _import_batch(db, batch: List[tuple], dedup: str) -> Tuple[int, int]:
+    """写入一批导入结果，返回 (失败条数, 重复条数)"""
+    failed = 0
+    rows = []
+    for path, result in batch:
+        if "error" in result:
+            failed += 1
+            print(f"解析失败 {path}: {result['error']}")
+            continue
+        ext = os.path.splitext(path)[1].lower()
+        key = blob_key(result["sha256"], ext)
+        # 复制一份放入存储，源目录中的文件保持不动
+        staging_path = new_staging_path(ext)
+        try:
+            shutil.copyfile(path, staging_path)
+            location = blob_store.put(staging_path, key)
+        except Exception as e:
+            discard_staged(staging_path)
+            failed += 1
+            print(f"保存文件失败 {path}: {_error_message(e)}")
+            continue
+        rows.append({
+            "parsed": result["parsed"],
+            "stored_name": key,
+            "original_name": os.path.basename(path),
+            "path": location,
+            "sha256": result["sha256"],
+        })
+
+    # 重复的文件不新建（存入的文件无人引用时由孤儿清理删除）
+    duplicated = 0
+    if dedup != "force" and rows:
+        try:
+            duplicates = resolve_duplicates(db, rows, dedup)
+        except Exception as e:
+            print(f"重复检测失败（{len(rows)} 条）: {_error_message(e)}")
+            return failed + len(rows), duplicated
+        duplicated = sum(1 for duplicate in duplicates if duplicate is not None)
+        rows = [row for row, duplicate in zip(rows, duplicates) if duplicate is None]
+    if rows:
+        try:
+            bulk_insert_candidates(db, rows)
+        except Exception as e:
+            failed += len(rows)
+            print(f"写入失败（{len(rows)} 条）: {_error_message(e)}")
+    return failed, duplicated
+
+
+def cmd_import(args):
+    root = os.path.abspath(args.directory)
+    if not os.path.isdir(root):
+        sys.exit(f"目录不存在: {args.directory}")
+    os.makedirs(STAGING_DIR, exist_ok=True)
+    paths = _find_resume_files(root)
+    checkpoint = Checkpoint(args.checkpoint or "cli_import.checkpoint.json", "import", f"{root} dedup={args.dedup}")
+    last_path = None if args.restart else checkpoint.load()
+    if last_path is not None:
+        paths = [p for p in paths if p > last_path]
+        print(f"从检查点继续：跳过 {last_path} 及之前的文件")
+
+    db = WriteSessionLocal()
+    try:
+        _run_pool("import", paths, _parse_path, lambda batch: _import_batch(db, batch, args.dedup),
+                  lambda path: path, checkpoint, args.workers, args.batch_size)
+    finally:
+        db.close()
+
+
+# ==================== reparse ====================
+
+def _reparse_batch(db, batch: List[tuple]) -> Tuple[int, int]:
+    """把一批重新解析的结果写回候选人，一次事务；返回 (失败条数, 0)"""
+    failed = 0
+    results = {}
+    for (candidate_id, location), result in batch:
+        if "error" in result:
+            failed += 1
+            print(f"解析失败 候选人 {candidate_id} ({location}): {result['error']}")
+            continue
+        results[candidate_id] = result["parsed"]
+    if not results:
+        return failed, 0
+    try:
+        # 逐个对象赋值而不是 bulk_update_mappings：规范化联系方式和全文检索索引由模型事件维护
+        for candidate in db.query(Candidate).filter(Candidate.id.in_(list(results))):
+            parsed = results[candidate.id]
+            for field in MERGE_FIELDS:
+                if parsed.get(field) and getattr(candidate, field) != parsed[field]:
+                    setattr(candidate, field, parsed[field])
+            candidate.resume_text = parsed.get("text")
+            candidate.resume_text_complete = parsed.get("text_complete")
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        failed += len(results)
+        print(f"写入失败（{len(results)} 条）: {_error_message(e)}")
+    return failed, 0
+
+
+def cmd_reparse(args):
+    since = None
+    if args.since:
+        try:
+            since = datetime.fromisoformat(args.since)
+        except ValueError:
+            sys.exit("--since 格式应为 YYYY-MM-DD 或 YYYY-MM-DDTHH:MM:SS")
+    checkpoint = Checkpoint(args.checkpoint or "cli_reparse.checkpoint.json", "reparse", f"since={args.since}")
+    last_id = None if args.restart else checkpoint.load()
+
+    db = SessionLocal()
+    try:
+        query = db.query(Candidate.id, Candidate.resume_path).filter(
+            # 纯文本导入的候选人（"(from_text)" 等标记）没有文件
+            or_(~Candidate.resume_path.startswith("("), ~Candidate.resume_path.endswith(")"))
+        )
+        if since is not None:
+            query = query.filter(Candidate.created_at >= since)
+        if last_id is not None:
+            query = query.filter(Candidate.id > last_id)
+            print(f"从检查点继续：跳过 ID {last_id} 及之前的候选人")
+        targets = [tuple(row) for row in query.order_by(Candidate.id)]
+    finally:
+        db.close()
+
+    db = WriteSessionLocal()
+    try:
+        _run_pool("reparse", targets, _parse_target, lambda batch: _reparse_batch(db, batch),
+                  lambda target: target[0], checkpoint, args.workers, args.batch_size)
+    finally:
+        db.close()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="离线批量导入 / 重新解析简历")
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    def common(p):
+        p.add_argument("--workers", type=int, default=PARSE_WORKERS, help="解析进程数，默认 CPU 核数")
+        p.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="每个事务写入的条数")
+        p.add_argument("--checkpoint", help="检查点文件路径，默认 cli_<命令>.checkpoint.json")
+        p.add_argument("--restart", action="store_true", help="忽略检查点，从头开始")
+
+    p = sub.add_parser("import", help="导入目录（递归）下的 PDF / DOCX")
+    p.add_argument("directory", help="简历所在目录")
+    p.add_argument("--dedup", choices=DEDUP_MODES, default=DEDUP_MODE, help="发现重复候选人时的处理方式，同 /upload/batch")
+    common(p)
+    p.set_defaults(func=cmd_import)
+
+    p = sub.add_parser("reparse", help="用当前解析规则重新解析已入库候选人的简历文件")
+    p.add_argument("--since", help="只处理该时间之后入库的候选人（YYYY-MM-DD）")
+    common(p)
+    p.set_defaults(func=cmd_reparse)
+
+    args = ap.parse_args()
+    args.workers = max(1, args.workers)
+    args.batch_size = max(1, args.batch_size)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
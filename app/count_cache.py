@@ -0,0 +1,88 @@
+"""
+候选人列表总数缓存：/candidates 每翻一页都要 COUNT 一次筛选结果，候选人多时代价和数据量成正比。
+相同筛选条件的总数在短时间内复用；本进程内有候选人插入、修改或删除时整体失效。
+
+其它 uvicorn worker 的写入无法通知到本进程，因此缓存条目另有 TTL，总数最多滞后 COUNT_CACHE_TTL 秒。
+
+配置（环境变量）：
+- COUNT_CACHE_TTL：总数缓存有效期（秒），默认 30，设为 0 关闭缓存
+- COUNT_CACHE_MAX_ENTRIES：最多缓存的筛选条件组合数，默认 256
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Hashable
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+COUNT_CACHE_TTL = float(os.getenv("COUNT_CACHE_TTL", "30"))
+COUNT_CACHE_MAX_ENTRIES = int(os.getenv("COUNT_CACHE_MAX_ENTRIES", "256"))
+
+
+class CountCache:
+    def __init__(self, ttl: float = COUNT_CACHE_TTL, max_entries: int = COUNT_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max(1, max_entries)
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], int]) -> int:
+        """返回 key 对应的总数，缓存未命中时调用 compute() 计算"""
+        if self.ttl <= 0:
+            return compute()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] == self._generation and entry[2] > now:
+                self._entries.move_to_end(key)
+                return entry[0]
+            generation = self._generation
+        value = compute()
+        with self._lock:
+            # 计算期间发生了写入，结果可能已过时，不写入缓存
+            if generation == self._generation:
+                self._entries[key] = (value, generation, now + self.ttl)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+
+count_cache = CountCache()
+
+
+_DIRTY_KEY = "candidate_counts_dirty"
+
+
+def register_invalidation(candidate_cls):
+    """
+    候选人插入/修改/删除后清空总数缓存。
+    flush 时只做标记，事务提交后才失效：提交前其它请求读到的仍是旧数据，过早失效会把旧总数重新缓存下来。
+    """
+
+    def _mark(mapper, connection, target):
+        session = object_session(target)
+        if session is not None:
+            session.info[_DIRTY_KEY] = True
+
+    for name in ("after_insert", "after_update", "after_delete"):
+        event.listen(candidate_cls, name, _mark)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    if session.info.pop(_DIRTY_KEY, False):
+        count_cache.invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session):
+    session.info.pop(_DIRTY_KEY, None)
@@ -0,0 +1,230 @@
+"""
+重复候选人检测。
+
+入库时（/upload、/save、/upload-text、/upload/batch、异步任务）按三个键查找已有候选人：
+文件内容 SHA-256、规范化手机号、规范化邮箱（见 normalize.py），每个键都是一次索引等值查询。
+命中时按 dedup 参数处理：
+- skip：不新建，返回已有候选人的 ID（默认）
+- merge：把新简历中已有候选人缺失的字段补上（没有原文件的纯文本候选人同时换成新文件），返回已有候选人
+- force：仍然新建
+
+并发上传同一份简历时两个请求可能都没有查到对方，索引不是唯一约束；这类遗漏和升级前的历史重复由批量去重处理：
+按每个键 GROUP BY 找出出现多次的值（分块，不做两两比较），共享任意一个键的候选人用并查集归为一组。
+
+    python dedup.py            # 列出重复组
+    python dedup.py --merge    # 每组合并到最早入库的候选人，删除其余记录
+
+配置（环境变量）：
+- DEDUP_MODE：入库接口 dedup 参数的默认值，默认 skip
+"""
+import argparse
+import os
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from sqlalchemy import func
+
+from models import Candidate
+from normalize import normalize_phone, normalize_email
+from storage import is_blob_location
+from tagging import split_tags, set_candidate_tags
+
+DEDUP_MODES = ("skip", "merge", "force")
+DEDUP_MODE = os.getenv("DEDUP_MODE", "skip")
+if DEDUP_MODE not in DEDUP_MODES:
+    # 否则所有入库请求都会因默认的 dedup 参数不合法返回 400，启动时直接报错
+    raise RuntimeError(f"DEDUP_MODE 只能是 skip、merge 或 force，当前为 {DEDUP_MODE!r}")
+
+# (候选人字段, 说明)，按可信度排序：同一文件 > 同一手机号 > 同一邮箱
+DEDUP_KEYS = (
+    ("content_hash", "content_hash"),
+    ("phone_normalized", "phone"),
+    ("email_normalized", "email"),
+)
+MERGE_FIELDS = ("name", "email", "phone", "university", "degree", "major")
+
+
+class Duplicate(NamedTuple):
+    candidate_id: int
+    matched_on: str  # content_hash / phone / email
+
+
+def dedup_keys(phone: Optional[str], email: Optional[str], content_hash: Optional[str]) -> Dict[str, str]:
+    """候选人字段 -> 规范化后的值（去掉为空的键）"""
+    keys = {
+        "content_hash": content_hash,
+        "phone_normalized": normalize_phone(phone),
+        "email_normalized": normalize_email(email),
+    }
+    return {column: value for column, value in keys.items() if value}
+
+
+def find_duplicate(db, phone: Optional[str], email: Optional[str], content_hash: Optional[str] = None
+                   ) -> Optional[Duplicate]:
+    """查找与给定联系方式或文件相同的已有候选人，多个命中时取最可信的键、最早入库的候选人"""
+    return find_duplicates(db, [dedup_keys(phone, email, content_hash)])[0]
+
+
+def find_duplicates(db, keys_list: List[Dict[str, str]]) -> List[Optional[Duplicate]]:
+    """
+    批量版本：keys_list 中每项为 dedup_keys() 的结果，返回与之一一对应的 Duplicate 或 None。
+    每个键一次 IN 查询，不随条数增加查询次数。
+    """
+    matches: Dict[str, Dict[str, int]] = {}
+    for column, _ in DEDUP_KEYS:
+        values = list({keys[column] for keys in keys_list if column in keys})
+        found = matches[column] = {}
+        if not values:
+            continue
+        attr = getattr(Candidate, column)
+        for value, candidate_id in db.query(attr, func.min(Candidate.id)).filter(attr.in_(values)).group_by(attr):
+            found[value] = candidate_id
+
+    results = []
+    for keys in keys_list:
+        duplicate = None
+        for column, label in DEDUP_KEYS:
+            candidate_id = matches[column].get(keys.get(column))
+            if candidate_id is not None:
+                duplicate = Duplicate(candidate_id, label)
+                break
+        results.append(duplicate)
+    return results
+
+
+def merge_candidate(candidate: Candidate, parsed: Dict, resume: Optional[Dict] = None) -> List[str]:
+    """
+    把 parsed 中的字段补充到已有候选人（只填空字段，不覆盖），返回被更新的字段名。
+    resume 为新简历的文件字段（resume_filename / resume_original_name / resume_path / content_hash），
+    已有候选人没有原文件（纯文本导入）时换成新文件和新全文。
+    """
+    updated = []
+    for field in MERGE_FIELDS:
+        if not getattr(candidate, field) and parsed.get(field):
+            setattr(candidate, field, parsed[field])
+            updated.append(field)
+    if resume and not is_blob_location(candidate.resume_path):
+        for field, value in resume.items():
+            setattr(candidate, field, value)
+        updated.extend(resume)
+        if parsed.get("text"):
+            candidate.resume_text = parsed["text"]
+            candidate.resume_text_complete = parsed.get("text_complete")
+            updated.append("resume_text")
+    elif parsed.get("text") and not candidate.resume_text:
+        candidate.resume_text = parsed["text"]
+        candidate.resume_text_complete = parsed.get("text_complete")
+        updated.append("resume_text")
+    return updated
+
+
+# ==================== 批量去重 ====================
+
+def _duplicate_values(db, column: str, chunk_size: int = 1000) -> Iterable[tuple]:
+    """某个键上出现多次的值及对应的候选人 ID：(值, id)，按值分块查询"""
+    attr = getattr(Candidate, column)
+    values = [row[0] for row in db.query(attr).filter(attr.isnot(None)).group_by(attr).having(func.count() > 1)]
+    for start in range(0, len(values), chunk_size):
+        yield from db.query(attr, Candidate.id).filter(attr.in_(values[start:start + chunk_size]))
+
+
+def find_duplicate_groups(db) -> List[Dict]:
+    """
+    找出所有重复组：[{"ids": [按入库先后排序的 ID], "matched_on": ["phone", ...]}]。
+    共享任意一个键（文件、手机号、邮箱）的候选人归为一组，A 与 B 同手机号、B 与 C 同邮箱时 A、B、C 为一组。
+    """
+    parent: Dict[int, int] = {}
+
+    def find(x: int) -> int:
+        parent.setdefault(x, x)
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    matched_on: Dict[int, set] = {}
+    for column, label in DEDUP_KEYS:
+        first_by_value: Dict[str, int] = {}
+        for value, candidate_id in _duplicate_values(db, column):
+            first = first_by_value.setdefault(value, candidate_id)
+            root_a, root_b = find(first), find(candidate_id)
+            if root_a != root_b:
+                parent[max(root_a, root_b)] = min(root_a, root_b)
+            matched_on.setdefault(candidate_id, set()).add(label)
+
+    groups: Dict[int, Dict] = {}
+    for candidate_id in parent:
+        group = groups.setdefault(find(candidate_id), {"ids": [], "matched_on": set()})
+        group["ids"].append(candidate_id)
+        group["matched_on"].update(matched_on.get(candidate_id, ()))
+    return [
+        {"ids": sorted(group["ids"]), "matched_on": [label for _, label in DEDUP_KEYS if label in group["matched_on"]]}
+        for _, group in sorted(groups.items())
+    ]
+
+
+def merge_group(db, ids: List[int]) -> Optional[int]:
+    """
+    把一组重复候选人合并到最早入库的那个：补充缺失字段、合并标签和备注，删除其余记录，返回保留的 ID。
+    被删除记录的简历文件不在这里删除，无人引用后由孤儿清理删除。由调用方提交事务。
+    """
+    candidates = db.query(Candidate).filter(Candidate.id.in_(ids)).order_by(Candidate.id).all()
+    if len(candidates) < 2:
+        return candidates[0].id if candidates else None
+    keeper, others = candidates[0], candidates[1:]
+    tags = split_tags(keeper.tags)
+    notes = [keeper.notes] if keeper.notes else []
+    for other in others:
+        merge_candidate(
+            keeper,
+            {**{field: getattr(other, field) for field in MERGE_FIELDS},
+             "text": other.resume_text, "text_complete": other.resume_text_complete},
+            resume={
+                "resume_filename": other.resume_filename,
+                "resume_original_name": other.resume_original_name,
+                "resume_path": other.resume_path,
+                "content_hash": other.content_hash,
+            } if is_blob_location(other.resume_path) else None,
+        )
+        tags.extend(tag for tag in split_tags(other.tags) if tag not in tags)
+        if other.notes and other.notes not in notes:
+            notes.append(other.notes)
+        db.delete(other)
+    set_candidate_tags(db, keeper, tags)
+    keeper.notes = "\n".join(notes)
+    return keeper.id
+
+
+def main():
+    from database import SessionLocal, WriteSessionLocal
+
+    ap = argparse.ArgumentParser(description="批量查找并合并重复候选人")
+    ap.add_argument("--merge", action="store_true", help="把每组合并到最早入库的候选人（默认只列出）")
+    args = ap.parse_args()
+
+    db = SessionLocal()
+    try:
+        groups = find_duplicate_groups(db)
+    finally:
+        db.close()
+    for group in groups:
+        print(f"{','.join(map(str, group['ids']))}\t{'/'.join(group['matched_on'])}")
+    print(f"共 {len(groups)} 组重复，涉及 {sum(len(g['ids']) for g in groups)} 位候选人")
+    if not args.merge:
+        return
+
+    db = WriteSessionLocal()
+    try:
+        for group in groups:
+            try:
+                merge_group(db, group["ids"])
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                print(f"合并 {group['ids']} 失败: {e}")
+    finally:
+        db.close()
+    print(f"已合并 {len(groups)} 组，删除 {sum(len(g['ids']) - 1 for g in groups)} 位候选人")
+
+
+if __name__ == "__main__":
+    main()
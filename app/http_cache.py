@@ -0,0 +1,36 @@
+"""
+HTTP 条件请求：为不常变化的响应（简历下载、预览等）生成 ETag / Last-Modified / Cache-Control 头，
+客户端带 If-None-Match / If-Modified-Since 再次请求且内容未变时返回 304，不再重新生成或发送响应体。
+"""
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Dict
+
+from fastapi import Request
+
+
+def cache_headers(etag: str, last_modified: float, max_age: int = 0) -> Dict[str, str]:
+    """
+    etag 为带引号的强校验值；last_modified 为 Unix 时间戳。
+    max_age 为 0 时浏览器每次使用缓存前都重新校验，否则在 max_age 秒内直接使用；只允许浏览器缓存（private），不允许代理缓存
+    """
+    return {
+        "ETag": etag,
+        "Last-Modified": formatdate(last_modified, usegmt=True),
+        "Cache-Control": f"private, max-age={max_age}" if max_age > 0 else "private, no-cache",
+    }
+
+
+def is_not_modified(request: Request, etag: str, last_modified: float) -> bool:
+    """客户端缓存是否仍然有效：有 If-None-Match 时只比较 ETag，否则比较 If-Modified-Since"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(last_modified) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
@@ -3,13 +3,13 @@
 运行: python init_user.py
 """
 import sys
-from database import SessionLocal
+from database import WriteSessionLocal
 from models import User
 from auth import get_password_hash
 
 def init_user():
     """创建默认管理员用户"""
-    db = SessionLocal()
+    db = WriteSessionLocal()
     try:
         # 检查是否已存在用户
         existing_user = db.query(User).first()
@@ -0,0 +1,378 @@
+"""
+异步入库任务队列：/upload?mode=async 只负责把文件存入存储并登记任务，立即返回任务 ID，
+解析和写库由后台 worker 完成。任务状态保存在 ingest_jobs 表中，服务重启后未完成的任务会被重新执行。
+
+配置（环境变量）：
+- INGEST_WORKERS：后台 worker 数量，默认与解析进程数相同
+- INGEST_MAX_ATTEMPTS：单个任务的最大尝试次数，默认 3
+- INGEST_STALE_SECONDS：running 状态超过该时间未更新视为中断（进程被杀等），会被重新执行，默认 300
+- INGEST_RESCAN_INTERVAL：扫描遗留任务的间隔（秒），默认 60
+"""
+import asyncio
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from database import SessionLocal, WriteSessionLocal
+from dedup import find_duplicate, merge_candidate
+from models import Candidate, IngestJob
+from parse_service import parse_service, PARSE_WORKERS, ParseServiceBusy
+from parser import extract_full_text
+from storage import local_copy
+
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", str(PARSE_WORKERS)))
+INGEST_MAX_ATTEMPTS = int(os.getenv("INGEST_MAX_ATTEMPTS", "3"))
+INGEST_STALE_SECONDS = int(os.getenv("INGEST_STALE_SECONDS", "300"))
+INGEST_RESCAN_INTERVAL = int(os.getenv("INGEST_RESCAN_INTERVAL", "60"))
+
+BUSY_RETRY_DELAY = 1.0  # 解析服务繁忙时 worker 的重试间隔（秒）
+
+
+def job_to_dict(job: IngestJob) -> Dict:
+    return {
+        "id": job.id,
+        "status": job.status,
+        "progress": job.progress,
+        "stage": job.stage,
+        "original_name": job.original_name,
+        "candidate_id": job.candidate_id,
+        "error": job.error,
+        "created_at": job.created_at,
+        "updated_at": job.updated_at,
+    }
+
+
+def create_job(db, stored_name: str, original_name: str, file_path: str, content_hash: str = None,
+               dedup_mode: str = "force") -> IngestJob:
+    """登记一个待处理的入库任务；dedup_mode 为发现重复候选人时的处理方式（skip / merge / force）"""
+    job = IngestJob(
+        id=uuid.uuid4().hex,
+        status="pending",
+        progress=0,
+        stage="queued",
+        stored_name=stored_name,
+        original_name=original_name,
+        file_path=file_path,
+        content_hash=content_hash,
+        dedup_mode=dedup_mode,
+        updated_at=datetime.utcnow(),
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def get_job(job_id: str) -> Optional[Dict]:
+    db = SessionLocal()
+    try:
+        job = db.query(IngestJob).filter(IngestJob.id == job_id).first()
+        return job_to_dict(job) if job else None
+    finally:
+        db.close()
+
+
+def _update_job(job_id: str, **fields):
+    db = WriteSessionLocal()
+    try:
+        fields["updated_at"] = datetime.utcnow()
+        db.query(IngestJob).filter(IngestJob.id == job_id).update(fields, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+def _claim_job(job_id: str) -> Optional[Dict]:
+    """
+    原子地把任务从 pending 置为 running，返回任务的文件信息；
+    多个 uvicorn worker 同时恢复任务时，只有一个能领取成功。
+    """
+    db = WriteSessionLocal()
+    try:
+        claimed = db.query(IngestJob).filter(
+            IngestJob.id == job_id,
+            IngestJob.status == "pending",
+            IngestJob.attempts < INGEST_MAX_ATTEMPTS,
+        ).update({
+            "status": "running",
+            "stage": "parsing",
+            "progress": 10,
+            "attempts": IngestJob.attempts + 1,
+            "updated_at": datetime.utcnow(),
+        }, synchronize_session=False)
+        db.commit()
+        if not claimed:
+            return None
+        job = db.query(IngestJob).filter(IngestJob.id == job_id).first()
+        return {
+            "stored_name": job.stored_name,
+            "original_name": job.original_name,
+            "file_path": job.file_path,
+            "content_hash": job.content_hash,
+            "dedup_mode": job.dedup_mode or "force",
+            "attempts": job.attempts,
+        }
+    finally:
+        db.close()
+
+
+def _save_candidate(job_id: str, parsed: Dict, info: Dict) -> Tuple[int, bool]:
+    """
+    写入候选人并在同一事务内把任务标记为完成，返回 (候选人 ID, 是否新建)。
+    与已有候选人重复且 dedup_mode 不为 force 时不新建，任务的 candidate_id 指向已有候选人，stage 为 duplicate。
+    """
+    db = WriteSessionLocal()
+    try:
+        resume = {
+            "resume_filename": info["stored_name"],
+            "resume_original_name": info["original_name"],
+            "resume_path": info["file_path"],
+            "content_hash": info["content_hash"],
+        }
+        duplicate = None
+        if info["dedup_mode"] != "force":
+            duplicate = find_duplicate(db, parsed.get("phone"), parsed.get("email"), info["content_hash"])
+        if duplicate is not None:
+            candidate = db.query(Candidate).filter(Candidate.id == duplicate.candidate_id).first()
+            if info["dedup_mode"] == "merge":
+                merge_candidate(candidate, parsed, resume)
+        else:
+            candidate = Candidate.from_parsed(parsed, **resume)
+            db.add(candidate)
+        db.flush()
+        db.query(IngestJob).filter(IngestJob.id == job_id).update({
+            "status": "done",
+            "stage": "done" if duplicate is None else "duplicate",
+            "progress": 100,
+            "candidate_id": candidate.id,
+            "error": None,
+            "updated_at": datetime.utcnow(),
+        }, synchronize_session=False)
+        db.commit()
+        return candidate.id, duplicate is None
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def _recoverable_job_ids() -> List[str]:
+    """
+    找出需要（重新）执行的任务：pending 的，以及 running 但长时间没有更新的。
+    已用完尝试次数的中断任务（每次执行都把 worker 卡死或杀掉的文件）标记为失败，不再重新排队。
+    """
+    db = WriteSessionLocal()
+    try:
+        stale_before = datetime.utcnow() - timedelta(seconds=INGEST_STALE_SECONDS)
+        stale = db.query(IngestJob).filter(
+            IngestJob.status == "running",
+            IngestJob.updated_at < stale_before,
+        )
+        stale.filter(IngestJob.attempts >= INGEST_MAX_ATTEMPTS).update({
+            "status": "failed",
+            "stage": "failed",
+            "error": f"解析简历失败: 已中断 {INGEST_MAX_ATTEMPTS} 次（进程退出或超时）",
+            "updated_at": datetime.utcnow(),
+        }, synchronize_session=False)
+        db.query(IngestJob).filter(
+            IngestJob.status == "pending",
+            IngestJob.attempts >= INGEST_MAX_ATTEMPTS,
+        ).update({
+            "status": "failed",
+            "stage": "failed",
+            "error": f"解析简历失败: 已尝试 {INGEST_MAX_ATTEMPTS} 次",
+            "updated_at": datetime.utcnow(),
+        }, synchronize_session=False)
+        stale.filter(IngestJob.attempts < INGEST_MAX_ATTEMPTS).update(
+            {"status": "pending", "stage": "queued", "progress": 0}, synchronize_session=False
+        )
+        db.commit()
+        rows = db.query(IngestJob.id).filter(IngestJob.status == "pending").order_by(IngestJob.created_at).all()
+        return [row[0] for row in rows]
+    finally:
+        db.close()
+
+
+# ==================== 全文补全 ====================
+# PDF 解析时为了尽快返回字段会提前结束读取（PDF_EARLY_EXIT），此时入库的 resume_text 只有前几页。
+# 入库后在后台重新提取全文并更新 resume_text，全文索引随之更新。
+
+_backfill_tasks = set()
+
+
+def _incomplete_text_candidates(limit: int = 100) -> List[tuple]:
+    db = SessionLocal()
+    try:
+        rows = db.query(Candidate.id, Candidate.resume_path).filter(
+            Candidate.resume_text_complete.is_(False)
+        ).order_by(Candidate.id).limit(limit).all()
+        return [(row[0], row[1]) for row in rows]
+    finally:
+        db.close()
+
+
+def _store_full_text(candidate_id: int, text: Optional[str]):
+    """写入全文；text 为 None 表示无法提取（文件丢失或损坏），清除补全标记，不再重试"""
+    db = WriteSessionLocal()
+    try:
+        candidate = db.query(Candidate).filter(Candidate.id == candidate_id).first()
+        if candidate is None:
+            return
+        if text is None:
+            candidate.resume_text_complete = None
+        else:
+            candidate.resume_text = text
+            candidate.resume_text_complete = True
+        db.commit()
+    finally:
+        db.close()
+
+
+async def _extract_full_text(path: str) -> str:
+    async with local_copy(path) as local_path:
+        while True:
+            try:
+                return await parse_service.run(extract_full_text, local_path)
+            except ParseServiceBusy:
+                await asyncio.sleep(BUSY_RETRY_DELAY)
+
+
+async def _backfill_resume_text(candidate_id: int, path: str):
+    try:
+        text = await _extract_full_text(path)
+    except Exception as e:
+        print(f"补全候选人 {candidate_id} 的简历全文失败: {e}")
+        text = None
+    await run_in_threadpool(_store_full_text, candidate_id, text)
+
+
+def schedule_text_backfill(candidate_id: int, path: str):
+    """在后台补全该候选人的简历全文（同一候选人同时只会有一个补全任务）"""
+    key = candidate_id
+    if key in _backfill_tasks:
+        return
+    _backfill_tasks.add(key)
+    task = asyncio.create_task(_backfill_resume_text(candidate_id, path))
+    task.add_done_callback(lambda _t: _backfill_tasks.discard(key))
+
+
+class JobQueue:
+    """进程内的任务分发器：asyncio.Queue + 固定数量的 worker 协程"""
+
+    def __init__(self, workers: int = INGEST_WORKERS):
+        self.workers = max(1, workers)
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._queued = set()
+        self._listeners: Dict[str, List[asyncio.Event]] = {}
+
+    async def start(self):
+        if self._queue is not None:
+            return
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._rescan_loop()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        self._queue = None
+        self._queued.clear()
+
+    def enqueue(self, job_id: str):
+        if self._queue is None or job_id in self._queued:
+            return
+        self._queued.add(job_id)
+        self._queue.put_nowait(job_id)
+
+    def pending_count(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def wait_for_update(self, job_id: str, timeout: float):
+        """等待本进程内该任务的状态变化（用于 SSE 推送）；超时后调用方应回落到查库"""
+        event = asyncio.Event()
+        self._listeners.setdefault(job_id, []).append(event)
+        try:
+            await asyncio.wait_for(event.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            listeners = self._listeners.get(job_id, [])
+            if event in listeners:
+                listeners.remove(event)
+            if not listeners:
+                self._listeners.pop(job_id, None)
+
+    def _notify(self, job_id: str):
+        for event in self._listeners.get(job_id, []):
+            event.set()
+
+    async def _rescan_loop(self):
+        while True:
+            try:
+                for job_id in await run_in_threadpool(_recoverable_job_ids):
+                    self.enqueue(job_id)
+                for candidate_id, path in await run_in_threadpool(_incomplete_text_candidates):
+                    schedule_text_backfill(candidate_id, path)
+            except Exception as e:
+                print(f"扫描入库任务失败: {e}")
+            await asyncio.sleep(INGEST_RESCAN_INTERVAL)
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            self._queued.discard(job_id)
+            try:
+                await self._process(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"入库任务 {job_id} 处理异常: {e}")
+            finally:
+                self._notify(job_id)
+
+    async def _process(self, job_id: str):
+        info = await run_in_threadpool(_claim_job, job_id)
+        if info is None:
+            # 已被其它进程领取或已完成
+            return
+        self._notify(job_id)
+
+        try:
+            async with local_copy(info["file_path"]) as path:
+                while True:
+                    try:
+                        parsed = await parse_service.parse_file(path, info["content_hash"])
+                        break
+                    except ParseServiceBusy:
+                        # 同步上传占满了解析队列，稍后重试而不是判定失败
+                        await asyncio.sleep(BUSY_RETRY_DELAY)
+        except Exception as e:
+            error_msg = str(e).encode('utf-8', errors='replace').decode('utf-8')
+            if info["attempts"] < INGEST_MAX_ATTEMPTS:
+                await run_in_threadpool(_update_job, job_id, status="pending", stage="queued",
+                                        progress=0, error=error_msg)
+                self.enqueue(job_id)
+            else:
+                await run_in_threadpool(_update_job, job_id, status="failed", stage="failed",
+                                        error=f"解析简历失败: {error_msg}")
+            return
+
+        await run_in_threadpool(_update_job, job_id, stage="saving", progress=80)
+        self._notify(job_id)
+        try:
+            candidate_id, created = await run_in_threadpool(_save_candidate, job_id, parsed, info)
+            if created and parsed.get("text_complete") is False:
+                schedule_text_backfill(candidate_id, info["file_path"])
+        except Exception as e:
+            error_msg = str(e).encode('utf-8', errors='replace').decode('utf-8')
+            await run_in_threadpool(_update_job, job_id, status="failed", stage="failed",
+                                    error=f"保存失败: {error_msg}")
+
+
+job_queue = JobQueue()
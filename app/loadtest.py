@@ -0,0 +1,584 @@
+"""
+HTTP 压测：在预置了 N 个候选人的数据库上启动 uvicorn（main:app），按比例混合发送登录、候选人列表（筛选、
+深分页、游标分页、全文检索）、标签、简历预览、解析预览和上传请求，报告每个接口的吞吐、p50 / p95 / p99 延迟和错误率。
+
+    python loadtest.py --candidates 10000 --concurrency 1,8,32 --duration 30
+    python loadtest.py --candidates 100000 --workers 4 --json result.json --slo "list:p95=200,upload:p99=3000,*:error_rate=0.01"
+
+- 数据库和上传目录放在 --workdir（默认临时目录，结束后删除）；指定 --workdir 时保留，候选人数相同的下次运行直接复用，
+  100 万条的数据库只需要生成一次。--database-url 可以改用 PostgreSQL（需要是空库或之前由本脚本生成的库）
+- 候选人由合成简历生成（固定随机种子，结果可复现），直接批量写入候选人表、标签表和全文索引表；
+  另外生成 --resumes 份 DOCX（安装了 reportlab 时再加同样数量的 PDF）简历，启动后先通过 /upload 入库，
+  供简历预览和上传使用
+- 每个并发档位先预热 --warmup 秒再统计 --duration 秒；客户端为每个并发连接一个线程（标准库 http.client，长连接），
+  请求之间不等待（闭环），吞吐到顶时继续加并发只会增加延迟，据此确定 worker 数
+- 所有请求来自同一 IP，服务端的登录限流会调高（LOGIN_RATE_PER_USER / LOGIN_RATE_PER_IP）；
+  解析缓存默认关闭，否则反复上传同一批文件测到的只是缓存（--parse-cache 打开）
+- --url 压测已经运行的服务（不启动、不准备数据，需要 --username / --password，且库中已有候选人）
+
+--slo 为逗号分隔的 接口:指标=阈值，指标为 p50 / p95 / p99（毫秒）或 error_rate（0~1），接口为 * 时对每个接口检查，
+total 为全部请求合计；任一并发档位不满足时以非零状态退出。--mix 调整各类请求的比例，如 "list=50,upload=0"。
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlencode, urlsplit
+
+from sqlalchemy import func, text
+
+from auth import get_password_hash
+from database import create_db_engine
+from models import Candidate, CandidateTag, Tag, User
+from normalize import normalize_email, normalize_phone
+from search import FTS_TABLE, NAME_FTS_TABLE, fts_available, segment, segment_chars
+from synthetic_resumes import (
+    DEGREES, SKILLS, SURNAMES, generate_documents, generate_resume, render_docx, render_pdf, render_text,
+)
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+SEED_BATCH_SIZE = 5000
+LOADTEST_USER = "loadtest"
+LOADTEST_PASSWORD = "loadtest-password"
+PAGE_SIZE = 20
+
+# 请求类型及默认比例
+DEFAULT_MIX = {
+    "login": 2,
+    "list": 25,
+    "list_filter": 20,
+    "deep_page": 5,
+    "cursor_page": 10,
+    "search": 10,
+    "tags": 10,
+    "resume_preview": 8,
+    "parse_preview": 3,
+    "upload": 7,
+}
+
+
+# ==================== 准备数据 ====================
+
+def seed_database(url: str, count: int, seed: int = 1):
+    """
+    建表（migrations.py upgrade）并写入 count 个合成候选人，已有的部分不重复写入。
+    直接按批 INSERT 候选人、标签关联和全文索引（不经过 ORM 事件），100 万条也只需要几分钟。
+    """
+    env = dict(os.environ, DATABASE_URL=url)
+    subprocess.run([sys.executable, "migrations.py", "upgrade"], cwd=APP_DIR, env=env, check=True,
+                   stdout=subprocess.DEVNULL)
+    engine = create_db_engine(url, pool_size=1, max_overflow=0)
+    try:
+        with engine.begin() as conn:
+            # 只统计本脚本生成的（纯文本）候选人；上传的样本和压测中上传的候选人不算在内
+            existing = conn.execute(
+                func.count(Candidate.id).select().where(Candidate.resume_path == "(from_text)")
+            ).scalar()
+            next_id = (conn.execute(func.max(Candidate.id).select()).scalar() or 0) + 1
+            if not conn.execute(User.__table__.select().where(User.username == LOADTEST_USER)).first():
+                conn.execute(User.__table__.insert(), {
+                    "username": LOADTEST_USER, "password_hash": get_password_hash(LOADTEST_PASSWORD),
+                })
+            for name in SKILLS:
+                if not conn.execute(Tag.__table__.select().where(Tag.name == name)).first():
+                    conn.execute(Tag.__table__.insert(), {"name": name})
+            tag_ids = dict(conn.execute(text("SELECT name, id FROM tags")).fetchall())
+            fts = fts_available(conn)
+            name_fts = fts_available(conn, NAME_FTS_TABLE)
+        if existing >= count:
+            print(f"数据库中已有 {existing} 个候选人，跳过生成")
+            return
+
+        # 固定种子，且按序号跳到已有数量之后，同样参数生成的数据相同
+        rng = random.Random(seed)
+        started = time.perf_counter()
+        for _ in range(existing):
+            generate_resume(rng, rng.randint(1, 6))
+            rng.sample(SKILLS, rng.randint(0, 3))
+        for start in range(existing, count, SEED_BATCH_SIZE):
+            rows, links, fts_rows, name_rows = [], [], [], []
+            for _ in range(min(SEED_BATCH_SIZE, count - start)):
+                resume, expected = generate_resume(rng, rng.randint(1, 6))
+                tags = rng.sample(SKILLS, rng.randint(0, 3))
+                body = render_text(resume)
+                candidate_id = next_id
+                next_id += 1
+                rows.append({
+                    "id": candidate_id,
+                    "name": expected["name"], "email": expected["email"], "phone": expected["phone"],
+                    "university": expected["university"], "degree": expected["degree"], "major": expected["major"],
+                    "phone_normalized": normalize_phone(expected["phone"]),
+                    "email_normalized": normalize_email(expected["email"]),
+                    "resume_filename": "(from_text)", "resume_original_name": "(from_text)",
+                    "resume_path": "(from_text)",
+                    "tags": ",".join(tags), "notes": "",
+                    "resume_text": body, "resume_text_complete": True,
+                })
+                links.extend({"candidate_id": candidate_id, "tag_id": tag_ids[tag]} for tag in tags)
+                if fts:
+                    fts_rows.append({"id": candidate_id, "name": segment(expected["name"]),
+                                     "tags": segment(" ".join(tags)), "body": segment(body)})
+                if name_fts:
+                    name_rows.append({"id": candidate_id, "name": segment_chars(expected["name"])})
+            with engine.begin() as conn:
+                conn.execute(Candidate.__table__.insert(), rows)
+                if links:
+                    conn.execute(CandidateTag.__table__.insert(), links)
+                if fts_rows:
+                    conn.execute(text(f"INSERT INTO {FTS_TABLE} (rowid, name, tags, body) "
+                                      "VALUES (:id, :name, :tags, :body)"), fts_rows)
+                if name_rows:
+                    conn.execute(text(f"INSERT INTO {NAME_FTS_TABLE} (rowid, name) VALUES (:id, :name)"), name_rows)
+            done = start + len(rows)
+            elapsed = time.perf_counter() - started
+            print(f"生成候选人 {done}/{count}，{(done - existing) / elapsed:.0f} 条/秒", flush=True)
+
+        with engine.begin() as conn:
+            if conn.dialect.name == "postgresql":
+                # 显式写入了主键，需要把序列推到最大值之后
+                conn.execute(text("SELECT setval(pg_get_serial_sequence('candidates', 'id'), "
+                                  "(SELECT MAX(id) FROM candidates))"))
+            elif conn.dialect.name == "sqlite":
+                conn.execute(text("ANALYZE"))
+    finally:
+        engine.dispose()
+
+
+def generate_resume_files(directory: str, count: int, seed: int = 7) -> List[str]:
+    """生成 count 份 DOCX（有 reportlab 时另加 count 份 PDF），返回文件路径"""
+    os.makedirs(directory, exist_ok=True)
+    try:
+        import reportlab  # noqa: F401
+        formats = ("docx", "pdf")
+    except ImportError:
+        print("未安装 reportlab，简历样本只有 DOCX")
+        formats = ("docx",)
+    paths = []
+    for i, document in enumerate(generate_documents(count, seed=seed, max_pages=5)):
+        for fmt in formats:
+            path = os.path.join(directory, f"sample_{i:03d}.{fmt}")
+            if not os.path.exists(path):
+                (render_pdf if fmt == "pdf" else render_docx)(document, path)
+            paths.append(path)
+    return paths
+
+
+# ==================== 服务进程 ====================
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(url: str, workdir: str, workers: int, parse_cache: bool) -> Tuple[subprocess.Popen, str]:
+    port = _free_port()
+    env = dict(
+        os.environ,
+        DATABASE_URL=url,
+        UPLOAD_DIR=os.path.join(workdir, "uploads"),
+        PARSE_CACHE_PATH=os.path.join(workdir, "parse_cache.db"),
+        PARSE_CACHE_ENABLED="1" if parse_cache else "0",
+        PREVIEW_STORE_PATH=os.path.join(workdir, "preview_sessions.db"),
+        LOGIN_RATE_PER_USER="1000000",
+        LOGIN_RATE_PER_IP="1000000",
+    )
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning", "--no-access-log"],
+        cwd=APP_DIR, env=env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"服务启动失败，退出码 {process.returncode}")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            conn.request("GET", "/")
+            conn.getresponse().read()
+            conn.close()
+            print(f"服务已启动：{base_url}，{workers} 个 worker")
+            return process, base_url
+        except OSError:
+            time.sleep(0.2)
+    stop_server(process)
+    raise RuntimeError("服务在 60 秒内未能启动")
+
+
+def stop_server(process: subprocess.Popen):
+    process.terminate()
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+# ==================== HTTP 客户端 ====================
+
+class Client:
+    """单个长连接；连接断开时重连一次"""
+
+    def __init__(self, base_url: str, timeout: float = 60):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == "https" else 80)
+        self.https = parts.scheme == "https"
+        self.timeout = timeout
+        self.token: Optional[str] = None
+        self._conn = None
+
+    def _connection(self):
+        if self._conn is None:
+            cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+            self._conn = cls(self.host, self.port, timeout=self.timeout)
+        return self._conn
+
+    def request(self, method: str, path: str, body: Optional[bytes] = None,
+                headers: Optional[Dict[str, str]] = None) -> Tuple[int, bytes]:
+        headers = dict(headers or {})
+        if self.token:
+            headers.setdefault("Authorization", f"Bearer {self.token}")
+        for attempt in range(2):
+            try:
+                conn = self._connection()
+                conn.request(method, path, body=body, headers=headers)
+                response = conn.getresponse()
+                return response.status, response.read()
+            except (http.client.HTTPException, OSError):
+                self.close()
+                if attempt:
+                    raise
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def login(self, username: str, password: str) -> Tuple[int, bytes]:
+        status, data = self.request("POST", "/api/auth/login",
+                                    json.dumps({"username": username, "password": password}).encode(),
+                                    {"Content-Type": "application/json"})
+        if status == 200:
+            self.token = json.loads(data)["access_token"]
+        return status, data
+
+
+def multipart(path: str) -> Tuple[bytes, str]:
+    """单个文件字段 file 的 multipart/form-data 请求体"""
+    boundary = uuid.uuid4().hex
+    with open(path, "rb") as f:
+        content = f.read()
+    body = (
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; "
+        f"filename=\"{os.path.basename(path)}\"\r\nContent-Type: application/octet-stream\r\n\r\n"
+    ).encode() + content + f"\r\n--{boundary}--\r\n".encode()
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+# ==================== 请求类型 ====================
+
+class Workload:
+    """生成各类请求；context 中为压测前准备好的数据（最大 ID、带文件的候选人、简历样本）"""
+
+    def __init__(self, context: Dict, username: str, password: str):
+        self.context = context
+        self.username = username
+        self.password = password
+
+    def run(self, kind: str, client: Client, rng: random.Random) -> int:
+        return getattr(self, kind)(client, rng)
+
+    def login(self, client, rng):
+        return client.login(self.username, self.password)[0]
+
+    def _list(self, client, params):
+        return client.request("GET", "/candidates?" + urlencode(params))[0]
+
+    def list(self, client, rng):
+        return self._list(client, {"page": 1, "page_size": PAGE_SIZE})
+
+    def list_filter(self, client, rng):
+        params = {"page": rng.randint(1, 5), "page_size": PAGE_SIZE}
+        choice = rng.random()
+        if choice < 0.4:
+            params["tag"] = ",".join(rng.sample(SKILLS, rng.choice((1, 1, 2))))
+            params["tag_mode"] = rng.choice(("and", "or"))
+        elif choice < 0.7:
+            params["degree"] = rng.choice(DEGREES)
+        else:
+            params["name"] = rng.choice(SURNAMES)
+        return self._list(client, params)
+
+    def deep_page(self, client, rng):
+        last_page = max(1, self.context["total"] // PAGE_SIZE)
+        return self._list(client, {"page": rng.randint(last_page // 2, last_page), "page_size": PAGE_SIZE})
+
+    def cursor_page(self, client, rng):
+        return self._list(client, {"after_id": rng.randint(1, max(1, self.context["max_id"])), "page_size": PAGE_SIZE})
+
+    def search(self, client, rng):
+        return self._list(client, {"q": rng.choice(SKILLS), "page_size": PAGE_SIZE})
+
+    def tags(self, client, rng):
+        return client.request("GET", "/tags?with_counts=true")[0]
+
+    def resume_preview(self, client, rng):
+        ids = self.context["file_candidate_ids"]
+        if not ids:
+            return self.list(client, rng)
+        return client.request("GET", f"/candidates/{rng.choice(ids)}/resume/preview")[0]
+
+    def parse_preview(self, client, rng):
+        body, content_type = multipart(rng.choice(self.context["resume_files"]))
+        return client.request("POST", "/preview", body, {"Content-Type": content_type})[0]
+
+    def upload(self, client, rng):
+        body, content_type = multipart(rng.choice(self.context["resume_files"]))
+        return client.request("POST", "/upload?dedup=force", body, {"Content-Type": content_type})[0]
+
+
+def prepare_context(base_url: str, username: str, password: str, resume_files: List[str]) -> Dict:
+    """登录、上传简历样本（得到带文件的候选人供预览），并取得当前最大的候选人 ID"""
+    client = Client(base_url)
+    status, data = client.login(username, password)
+    if status != 200:
+        raise RuntimeError(f"登录失败（{status}）：{data[:200]!r}")
+    file_candidate_ids = []
+    for path in resume_files:
+        body, content_type = multipart(path)
+        status, data = client.request("POST", "/upload?dedup=skip", body, {"Content-Type": content_type})
+        if status == 200:
+            file_candidate_ids.append(json.loads(data)["id"])
+        else:
+            print(f"上传样本 {os.path.basename(path)} 失败（{status}）")
+    status, data = client.request("GET", "/candidates?page_size=1")
+    if status != 200:
+        raise RuntimeError(f"查询候选人失败（{status}）")
+    page = json.loads(data)
+    client.close()
+    return {
+        "total": page["total"],
+        "max_id": page["data"][0]["id"] if page["data"] else 1,
+        "file_candidate_ids": file_candidate_ids,
+        "resume_files": resume_files,
+    }
+
+
+# ==================== 执行与统计 ====================
+
+def _percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * pct / 100))] * 1000, 2)
+
+
+def _summarize(latencies: List[float], errors: int, statuses: Dict[str, int], duration: float) -> Dict:
+    count = len(latencies)
+    return {
+        "requests": count,
+        "rps": round(count / duration, 2),
+        "p50": _percentile(latencies, 50),
+        "p95": _percentile(latencies, 95),
+        "p99": _percentile(latencies, 99),
+        "error_rate": round(errors / count, 4) if count else None,
+        "statuses": statuses,
+    }
+
+
+def run_step(base_url: str, workload: Workload, mix: Dict[str, int], concurrency: int,
+             warmup: float, duration: float, seed: int) -> Dict:
+    """以 concurrency 个并发连接持续发送请求：先预热 warmup 秒，再统计 duration 秒"""
+    kinds = [kind for kind, weight in mix.items() if weight > 0]
+    weights = [mix[kind] for kind in kinds]
+    records: List[List[tuple]] = [[] for _ in range(concurrency)]
+    start_at = time.perf_counter() + warmup
+    stop_at = start_at + duration
+    login_failures = []
+
+    def loop(index: int):
+        rng = random.Random(seed * 1000 + index)
+        client = Client(base_url)
+        if client.login(workload.username, workload.password)[0] != 200:
+            login_failures.append(index)
+            return
+        out = records[index]
+        while True:
+            kind = rng.choices(kinds, weights)[0]
+            started = time.perf_counter()
+            if started >= stop_at:
+                break
+            try:
+                status = workload.run(kind, client, rng)
+            except Exception:
+                status = None
+            finished = time.perf_counter()
+            if started >= start_at:
+                out.append((kind, finished - started, status))
+        client.close()
+
+    threads = [threading.Thread(target=loop, args=(i,), daemon=True) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    if login_failures:
+        raise RuntimeError(f"{len(login_failures)} 个并发连接登录失败")
+
+    by_kind: Dict[str, Dict] = {}
+    all_latencies, all_errors, all_statuses = [], 0, {}
+    for kind, latency, status in (r for rs in records for r in rs):
+        entry = by_kind.setdefault(kind, {"latencies": [], "errors": 0, "statuses": {}})
+        key = str(status) if status is not None else "error"
+        is_error = status is None or status >= 400
+        entry["latencies"].append(latency)
+        entry["errors"] += is_error
+        entry["statuses"][key] = entry["statuses"].get(key, 0) + 1
+        all_latencies.append(latency)
+        all_errors += is_error
+        all_statuses[key] = all_statuses.get(key, 0) + 1
+    return {
+        "concurrency": concurrency,
+        "duration": duration,
+        "total": _summarize(all_latencies, all_errors, all_statuses, duration),
+        "endpoints": {
+            kind: _summarize(e["latencies"], e["errors"], e["statuses"], duration)
+            for kind, e in sorted(by_kind.items(), key=lambda item: kinds.index(item[0]))
+        },
+    }
+
+
+def print_step(step: Dict):
+    total = step["total"]
+    print(f"\n[并发 {step['concurrency']}] {total['requests']} 个请求，{total['rps']:.1f} 请求/秒，"
+          f"错误率 {(total['error_rate'] or 0):.2%}")
+    print(f"  {'接口':<16}{'请求数':>8}{'请求/秒':>10}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}{'错误率':>9}")
+    for kind, s in list(step["endpoints"].items()) + [("total", total)]:
+        print(f"  {kind:<16}{s['requests']:>8}{s['rps']:>10.1f}{s['p50'] or 0:>10.1f}{s['p95'] or 0:>10.1f}"
+              f"{s['p99'] or 0:>10.1f}{(s['error_rate'] or 0):>9.2%}")
+        errors = {k: v for k, v in s["statuses"].items() if k == "error" or int(k) >= 400}
+        if errors and kind != "total":
+            print(f"  {'':<16}错误状态 {errors}")
+
+
+def parse_slo(spec: str) -> List[Tuple[str, str, float]]:
+    """"list:p95=200,*:error_rate=0.01" -> [(接口, 指标, 阈值)]"""
+    rules = []
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        try:
+            target, rest = item.split(":", 1)
+            metric, value = rest.split("=", 1)
+            if metric not in ("p50", "p95", "p99", "error_rate"):
+                raise ValueError
+            rules.append((target.strip(), metric.strip(), float(value)))
+        except ValueError:
+            raise SystemExit(f"--slo 格式错误: {item}（应为 接口:p95=毫秒 或 接口:error_rate=比例）")
+    return rules
+
+
+def check_slo(steps: List[Dict], rules: List[Tuple[str, str, float]]) -> List[str]:
+    violations = []
+    for step in steps:
+        for target, metric, limit in rules:
+            if target == "total":
+                targets = {"total": step["total"]}
+            elif target == "*":
+                targets = step["endpoints"]
+            else:
+                targets = {target: step["endpoints"][target]} if target in step["endpoints"] else {}
+            for name, stats in targets.items():
+                value = stats.get(metric)
+                if value is not None and value > limit:
+                    violations.append(f"并发 {step['concurrency']} {name} {metric} = {value} > {limit}")
+    return violations
+
+
+def parse_mix(spec: Optional[str]) -> Dict[str, int]:
+    mix = dict(DEFAULT_MIX)
+    for item in filter(None, (part.strip() for part in (spec or "").split(","))):
+        kind, _, weight = item.partition("=")
+        if kind not in mix or not weight.isdigit():
+            raise SystemExit(f"--mix 格式错误: {item}（可用：{', '.join(DEFAULT_MIX)}）")
+        mix[kind] = int(weight)
+    return mix
+
+
+def main():
+    ap = argparse.ArgumentParser(description="HTTP 压测与延迟 SLO 报告")
+    ap.add_argument("--candidates", type=int, default=10000, help="预置的候选人数量（如 10000 / 100000 / 1000000）")
+    ap.add_argument("--resumes", type=int, default=20, help="简历文件样本数量（每种格式）")
+    ap.add_argument("--concurrency", default="1,8,32", help="逗号分隔的并发档位，依次执行")
+    ap.add_argument("--duration", type=float, default=30, help="每个档位的统计时长（秒）")
+    ap.add_argument("--warmup", type=float, default=5, help="每个档位统计前的预热时长（秒）")
+    ap.add_argument("--workers", type=int, default=1, help="uvicorn worker 数")
+    ap.add_argument("--mix", help="各类请求的比例，如 \"list=50,upload=0\"")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--workdir", help="数据库、上传目录和简历样本所在目录，指定时保留以便复用")
+    ap.add_argument("--database-url", help="使用指定的数据库（如 PostgreSQL），默认 workdir 下的 SQLite")
+    ap.add_argument("--parse-cache", action="store_true", help="服务端启用解析缓存")
+    ap.add_argument("--url", help="压测已运行的服务，不启动服务、不准备数据")
+    ap.add_argument("--username", default=LOADTEST_USER)
+    ap.add_argument("--password", default=LOADTEST_PASSWORD)
+    ap.add_argument("--json", help="把结果写入该 JSON 文件")
+    ap.add_argument("--slo", help="延迟 / 错误率目标，如 \"list:p95=200,*:error_rate=0.01\"")
+    args = ap.parse_args()
+
+    levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+    mix = parse_mix(args.mix)
+    rules = parse_slo(args.slo) if args.slo else []
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="loadtest_")
+    os.makedirs(workdir, exist_ok=True)
+    server = None
+    try:
+        resume_files = generate_resume_files(os.path.join(workdir, "samples"), args.resumes)
+        if args.url:
+            base_url = args.url.rstrip("/")
+        else:
+            url = args.database_url or f"sqlite:///{os.path.join(os.path.abspath(workdir), 'loadtest.db')}"
+            seed_database(url, args.candidates, args.seed)
+            server, base_url = start_server(url, workdir, args.workers, args.parse_cache)
+        context = prepare_context(base_url, args.username, args.password, resume_files)
+        workload = Workload(context, args.username, args.password)
+        print(f"最大候选人 ID {context['max_id']}，带文件的候选人 {len(context['file_candidate_ids'])} 个，"
+              f"请求比例 {', '.join(f'{k}={v}' for k, v in mix.items() if v)}")
+
+        steps = []
+        for level in levels:
+            step = run_step(base_url, workload, mix, level, args.warmup, args.duration, args.seed)
+            print_step(step)
+            steps.append(step)
+    finally:
+        if server is not None:
+            stop_server(server)
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    violations = check_slo(steps, rules)
+    if rules:
+        print("\nSLO：" + ("全部满足" if not violations else f"{len(violations)} 项不满足"))
+        for line in violations:
+            print("  " + line)
+    if args.json:
+        config = {k: v for k, v in vars(args).items() if k not in ("password", "json")}
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"config": config, "mix": mix, "steps": steps, "slo_violations": violations},
+                      f, ensure_ascii=False, indent=2)
+        print(f"结果已写入 {args.json}")
+    if violations:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,18 @@
+import asyncio
+import json
 import os
 import sys
-import uuid
-from typing import List
+import time
+from typing import List, Optional
+from urllib.parse import quote
 
-from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, Body
+from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, Body, Query, Request
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import JSONResponse, FileResponse, StreamingResponse, Response, RedirectResponse
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
 
 # 设置标准输出编码为 UTF-8，避免 Windows 控制台编码问题
 if sys.platform == 'win32':
@@ -15,33 +20,46 @@ if sys.platform == 'win32':
     sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
     sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
 
-from database import Base, engine, get_db
-from models import Candidate, User
-from parser import parse_resume_file, parse_resume_text_cn, extract_docx_to_html
+from database import get_write_db, get_read_db, run_db, SessionLocal, WriteSessionLocal
+from models import Candidate, User, IngestJob
+from parser import parse_resume_text_cn, extract_docx_to_html, parse_cache, docx_html_cache, PARSER_VERSION
+from parse_service import parse_service, ParseServiceBusy, ParseTimeout
+from jobs import job_queue, create_job, get_job, job_to_dict, schedule_text_backfill
+from batch_ingest import expand_upload, bulk_insert_candidates, resolve_duplicates, find_external_ids
+from text_ingest import iter_records, normalize_record, parse_resume_texts, RecordError
+from dedup import DEDUP_MODE, DEDUP_MODES, find_duplicate, find_duplicate_groups, merge_candidate
+from storage import (
+    save_stream, file_sha256, StoredFile, FileTooLarge, STAGING_DIR, blob_key, new_staging_path,
+    discard_staged, blob_store, local_store, is_blob_location, is_remote, resolve, local_copy, delete_if_unused,
+    sweep_orphan_blobs, claim_orphan_sweep,
+)
+from preview_store import preview_store, PREVIEW_GC_INTERVAL
+from search import highlight_snippet
+from candidate_query import build_candidate_query, count_candidates, fetch_page
+from count_cache import count_cache
+from http_cache import cache_headers, is_not_modified
+from migrations import check_on_startup
+from tagging import TAG_MAX_LENGTH, TAG_MODES, split_tags, set_candidate_tags, tag_counts
 from auth import (
-    verify_password, get_password_hash, create_access_token,
-    get_current_user, ACCESS_TOKEN_EXPIRE_MINUTES
+    password_hasher, PasswordHasherBusy, password_needs_rehash, create_access_token, verify_token, revoke_token,
+    get_current_user, oauth2_scheme, UserPrincipal, ACCESS_TOKEN_EXPIRE_MINUTES
 )
-from datetime import timedelta
-
-Base.metadata.create_all(bind=engine)
+from rate_limit import login_user_limiter, login_ip_limiter
+from datetime import datetime, timedelta, timezone
 
-# 执行数据库迁移（添加 tags 字段）
+# 数据库结构由 migrations.py 按版本管理：部署时运行 python migrations.py upgrade，
+# 这里只检查版本（DB_MIGRATE_ON_STARTUP=1 时加锁后自动执行迁移）
 try:
-    from migrate import migrate_add_tags_field
-    migrate_add_tags_field()
+    check_on_startup()
 except Exception as e:
     print(f"数据库迁移警告: {e}")
 
-# 执行数据库迁移（添加 notes 字段）
-try:
-    from migrate_add_notes_field import migrate_add_notes_field
-    migrate_add_notes_field()
-except Exception as e:
-    print(f"数据库迁移警告（notes）: {e}")
+os.makedirs(STAGING_DIR, exist_ok=True)
 
-UPLOAD_DIR = "uploads"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
+# 简历原文件在浏览器中的缓存时间（秒），过期后用 If-None-Match 重新校验
+RESUME_CACHE_MAX_AGE = int(os.getenv("RESUME_CACHE_MAX_AGE", "3600"))
+# 设置后（如 /protected-uploads/）下载和 PDF 预览改为返回 X-Accel-Redirect，由 nginx 直接发送上传目录中的文件
+DOWNLOAD_ACCEL_PREFIX = os.getenv("DOWNLOAD_ACCEL_PREFIX", "")
 
 app = FastAPI(
     title="简历解析后端",
@@ -65,6 +83,77 @@ app.add_middleware(
 )
 
 
+@app.on_event("startup")
+def start_parse_service():
+    """预先启动解析进程池，避免第一个上传请求承担进程创建的开销"""
+    parse_service.start()
+
+
+@app.on_event("shutdown")
+def stop_parse_service():
+    parse_service.shutdown()
+
+
+def _referenced_upload_names(names: List[str]) -> set:
+    """返回 names（存储键）中仍被候选人、未完成的入库任务或有效预览会话引用的键"""
+    names = list(names)
+    db = SessionLocal()
+    try:
+        in_use = {row[0] for row in db.query(Candidate.resume_filename).filter(Candidate.resume_filename.in_(names))}
+        in_use.update(row[0] for row in db.query(IngestJob.stored_name).filter(
+            IngestJob.stored_name.in_(names),
+            IngestJob.status.in_(("pending", "running")),
+        ))
+    finally:
+        db.close()
+    in_use.update(preview_store.live_files())
+    return in_use
+
+
+def _sweep_orphans() -> int:
+    """清理存储中无人引用的文件；使用 S3 时上传目录中早期的本地文件也一并检查"""
+    stores = {id(blob_store): blob_store, id(local_store): local_store}
+    return sum(
+        sweep_orphan_blobs(store, _referenced_upload_names, preview_store.ttl * 2) for store in stores.values()
+    )
+
+
+async def _preview_gc_loop():
+    """定期清理过期的预览会话；存储中无人引用的孤儿文件每 ORPHAN_SWEEP_INTERVAL 秒由其中一个 worker 清理"""
+    while True:
+        await asyncio.sleep(PREVIEW_GC_INTERVAL)
+        try:
+            expired = await run_in_threadpool(preview_store.collect_expired)
+            orphans = 0
+            if await run_in_threadpool(claim_orphan_sweep):
+                orphans = await run_in_threadpool(_sweep_orphans)
+            if expired or orphans:
+                print(f"已清理过期预览 {expired} 个，孤儿文件 {orphans} 个")
+        except Exception as e:
+            print(f"清理预览文件失败: {e}")
+
+
+@app.on_event("startup")
+async def start_preview_gc():
+    app.state.preview_gc_task = asyncio.create_task(_preview_gc_loop())
+
+
+@app.on_event("shutdown")
+async def stop_preview_gc():
+    app.state.preview_gc_task.cancel()
+
+
+@app.on_event("startup")
+async def start_job_queue():
+    """启动异步入库 worker，并恢复上次未完成的任务"""
+    await job_queue.start()
+
+
+@app.on_event("shutdown")
+async def stop_job_queue():
+    await job_queue.stop()
+
+
 # ==================== 认证相关接口 ====================
 
 from pydantic import BaseModel
@@ -79,39 +168,95 @@ class TokenResponse(BaseModel):
     username: str
     expires_in: int
 
+def _client_ip(request: Request) -> str:
+    return request.client.host if request.client else "unknown"
+
+
+def _check_rate_limit(*limits):
+    """依次从 (限流器, key) 对应的令牌桶取令牌，任一超限时返回 429"""
+    for limiter, key in limits:
+        allowed, retry_after = limiter.acquire(key)
+        if not allowed:
+            raise HTTPException(
+                status_code=429,
+                detail="尝试过于频繁，请稍后再试",
+                headers={"Retry-After": str(retry_after)}
+            )
+
+
+def _find_login_user(username: str):
+    """返回 (id, username, password_hash)，用户不存在时返回 None"""
+    db = SessionLocal()
+    try:
+        user = db.query(User).filter(User.username == username).first()
+        return (user.id, user.username, user.password_hash) if user else None
+    finally:
+        db.close()
+
+
+def _record_login(user_id: int, new_password_hash: Optional[str]):
+    """更新最后登录时间；new_password_hash 不为空时同时替换密码哈希（明文或旧 cost 的哈希）"""
+    db = WriteSessionLocal()
+    try:
+        user = db.get(User, user_id)
+        user.last_login = datetime.utcnow()
+        if new_password_hash:
+            user.password_hash = new_password_hash
+        db.commit()
+    finally:
+        db.close()
+
+
 @app.post("/api/auth/login", summary="用户登录", tags=["认证"])
-def login(login_data: LoginRequest, db: Session = Depends(get_db)):
+async def login(login_data: LoginRequest, request: Request):
     """用户登录，返回 JWT token"""
-    user = db.query(User).filter(User.username == login_data.username).first()
+    # 先限流，再进入 bcrypt 计算
+    _check_rate_limit(
+        (login_ip_limiter, _client_ip(request)),
+        (login_user_limiter, login_data.username.strip().lower()),
+    )
+
+    user = await run_in_threadpool(_find_login_user, login_data.username)
+    try:
+        valid = await password_hasher.verify(login_data.password, user[2] if user else None)
+    except PasswordHasherBusy as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
     
-    if not user or not verify_password(login_data.password, user.password_hash):
+    if not valid:
         raise HTTPException(
             status_code=401,
             detail="用户名或密码错误"
         )
-    
+    user_id, username, stored_hash = user
+
+    # 明文或 cost 已变化的旧哈希在登录成功时重新计算；哈希线程池繁忙时留到下次登录
+    new_hash = None
+    if password_needs_rehash(stored_hash):
+        try:
+            new_hash = await password_hasher.hash(login_data.password)
+        except PasswordHasherBusy:
+            pass
+
     # 更新最后登录时间
-    from datetime import datetime
-    user.last_login = datetime.utcnow()
-    db.commit()
+    await run_in_threadpool(_record_login, user_id, new_hash)
     
     # 创建 token
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.username, "user_id": user.id},
+        data={"sub": username, "user_id": user_id},
         expires_delta=access_token_expires
     )
     
     return TokenResponse(
         access_token=access_token,
         token_type="bearer",
-        username=user.username,
+        username=username,
         expires_in=ACCESS_TOKEN_EXPIRE_MINUTES * 60
     )
 
 
 @app.get("/api/auth/me", summary="获取当前用户信息", tags=["认证"])
-def get_me(current_user: User = Depends(get_current_user)):
+def get_me(current_user: UserPrincipal = Depends(get_current_user)):
     """获取当前登录用户信息"""
     return {
         "id": current_user.id,
@@ -121,9 +266,23 @@ def get_me(current_user: User = Depends(get_current_user)):
     }
 
 
+@app.post("/api/auth/logout", summary="退出登录", tags=["认证"])
+def logout(
+    token: str = Depends(oauth2_scheme),
+    current_user: UserPrincipal = Depends(get_current_user),
+    db: Session = Depends(get_write_db),
+):
+    """注销当前 token，之后使用该 token 的请求返回 401"""
+    payload = verify_token(token)
+    if payload is not None:
+        revoke_token(db, token, payload)
+    return {"message": "已退出登录"}
+
+
 @app.post("/api/auth/register", summary="用户注册", tags=["认证"])
-def register(login_data: LoginRequest, db: Session = Depends(get_db)):
+def register(login_data: LoginRequest, request: Request, db: Session = Depends(get_write_db)):
     """注册新用户（仅用于初始化，生产环境建议移除或添加权限控制）"""
+    _check_rate_limit((login_ip_limiter, _client_ip(request)))
     try:
         # 验证输入
         if not login_data.username or not login_data.username.strip():
@@ -151,6 +310,12 @@ def register(login_data: LoginRequest, db: Session = Depends(get_db)):
                 detail="密码长度不能超过200个字符"
             )
         
+        # 先计算哈希（bcrypt 在密码哈希线程池中计算），再访问数据库，计算期间不占用写连接
+        try:
+            password = password_hasher.hash_blocking(login_data.password)
+        except PasswordHasherBusy as e:
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+        
         # 检查用户是否已存在
         existing_user = db.query(User).filter(User.username == login_data.username.strip()).first()
         if existing_user:
@@ -159,12 +324,10 @@ def register(login_data: LoginRequest, db: Session = Depends(get_db)):
                 detail="用户名已存在"
             )
         
-        # 创建新用户（明文存储密码）
-        password = get_password_hash(login_data.password)  # 直接返回密码，不加密
-        
+        # 创建新用户
         new_user = User(
             username=login_data.username.strip(),
-            password_hash=password  # 直接存储明文密码
+            password_hash=password
         )
         db.add(new_user)
         db.commit()
@@ -196,6 +359,87 @@ def root():
 
 
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
+PARSE_RETRY_AFTER = "5"  # 解析服务繁忙时建议客户端重试的间隔（秒）
+JOB_EVENTS_POLL_INTERVAL = 1.0  # SSE 推送任务进度时查库的最长间隔（秒）
+BATCH_MAX_FILES = int(os.getenv("BATCH_MAX_FILES", "1000"))  # /upload/batch 单次最多处理的文件数
+BATCH_COMMIT_SIZE = int(os.getenv("BATCH_COMMIT_SIZE", "200"))  # /upload/batch、/upload-text/batch 每次事务写入的候选人数
+TEXT_BATCH_MAX_RECORDS = int(os.getenv("TEXT_BATCH_MAX_RECORDS", "10000"))  # /upload-text/batch 单次最多处理的记录数
+TEXT_RECORD_MAX_BYTES = int(os.getenv("TEXT_RECORD_MAX_BYTES", str(1024 * 1024)))  # /upload-text/batch 单条记录的大小上限
+
+async def _save_upload(file: UploadFile, save_path: str) -> StoredFile:
+    """把上传文件按块写入 save_path（在线程池中执行），同时计算 SHA-256"""
+    try:
+        return await run_in_threadpool(save_stream, file.file, save_path, MAX_FILE_SIZE)
+    except FileTooLarge as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"保存文件失败: {e}")
+
+
+async def _store_blob(staging_path: str, key: str) -> str:
+    """把暂存文件按内容寻址移入存储，返回位置"""
+    try:
+        return await run_in_threadpool(blob_store.put, staging_path, key)
+    except Exception as e:
+        discard_staged(staging_path)
+        error_msg = str(e).encode('utf-8', errors='replace').decode('utf-8')
+        raise HTTPException(status_code=500, detail=f"保存文件失败: {error_msg}")
+
+
+DEDUP_DESCRIPTION = "发现重复候选人（同一文件、手机号或邮箱）时：skip 返回已有候选人；merge 把新信息补充到已有候选人；force 仍然新建"
+
+
+def _check_dedup_mode(dedup: str):
+    if dedup not in DEDUP_MODES:
+        raise HTTPException(status_code=400, detail="dedup 只能是 skip、merge 或 force")
+
+
+def _lookup_duplicate(db: Session, dedup: str, parsed: dict, content_hash: Optional[str] = None):
+    """dedup 不为 force 时查找重复的已有候选人，返回 (候选人, Duplicate)；没有重复时返回 None"""
+    if dedup == "force":
+        return None
+    duplicate = find_duplicate(db, parsed.get("phone"), parsed.get("email"), content_hash)
+    if duplicate is None:
+        return None
+    return _find_candidate(db, duplicate.candidate_id), duplicate
+
+
+def _apply_duplicate(db: Session, candidate: Candidate, duplicate, dedup: str, parsed: dict,
+                     resume: Optional[dict] = None) -> dict:
+    """按 dedup 处理重复：merge 时补充字段并提交；返回附在响应中的 duplicate 说明"""
+    info = {"id": candidate.id, "matched_on": duplicate.matched_on, "action": "skipped"}
+    if dedup == "merge":
+        try:
+            info["updated_fields"] = merge_candidate(candidate, parsed, resume)
+            db.commit()
+            db.refresh(candidate)
+        except Exception:
+            db.rollback()
+            raise
+        info["action"] = "merged"
+    return info
+
+
+def _add_candidate(db: Session, candidate: Candidate) -> Candidate:
+    """新建候选人并提交（在线程池中调用，写连接被占用时不阻塞事件循环）"""
+    try:
+        db.add(candidate)
+        db.commit()
+        db.refresh(candidate)
+    except Exception:
+        db.rollback()
+        raise
+    return candidate
+
+
+def _save_parsed(db: Session, dedup: str, parsed: dict, resume: dict):
+    """/save 的写库部分（在线程池中调用），返回 (候选人, duplicate 说明)"""
+    existing = _lookup_duplicate(db, dedup, parsed, resume["content_hash"])
+    if existing is not None:
+        candidate, duplicate = existing
+        return candidate, _apply_duplicate(db, candidate, duplicate, dedup, parsed, resume)
+    return _add_candidate(db, Candidate.from_parsed(parsed, **resume)), None
+
 
 @app.post("/preview", summary="预览简历解析结果（不保存）")
 async def preview_resume(
@@ -206,32 +450,21 @@ async def preview_resume(
     if not (filename_lower.endswith(".pdf") or filename_lower.endswith(".docx")):
         raise HTTPException(status_code=400, detail="只支持 PDF 或 DOCX 文件")
     
-    # 检查文件大小
-    content = await file.read()
-    if len(content) > MAX_FILE_SIZE:
-        raise HTTPException(status_code=400, detail=f"文件大小不能超过 {MAX_FILE_SIZE / 1024 / 1024}MB")
-    
     ext = ".pdf" if filename_lower.endswith(".pdf") else ".docx"
-    unique_name = f"{uuid.uuid4().hex}{ext}"
-    save_path = os.path.join(UPLOAD_DIR, unique_name)
+    staging_path = new_staging_path(ext)
 
-    # 临时保存文件用于解析
-    try:
-        with open(save_path, "wb") as f:
-            f.write(content)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"保存文件失败: {e}")
+    # 先写入暂存目录用于解析（按块写盘，超过大小限制立即中止）
+    stored = await _save_upload(file, staging_path)
 
-    # 解析
+    # 解析（在进程池中执行，不阻塞事件循环）
     try:
-        parsed = parse_resume_file(save_path)
+        parsed = await parse_service.parse_file(staging_path, stored.sha256)
+    except (ParseServiceBusy, ParseTimeout) as e:
+        discard_staged(staging_path)
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": PARSE_RETRY_AFTER})
     except Exception as e:
         # 删除临时文件
-        try:
-            if os.path.exists(save_path):
-                os.remove(save_path)
-        except:
-            pass
+        discard_staged(staging_path)
         # 安全处理异常消息
         error_msg = str(e)
         try:
@@ -247,8 +480,22 @@ async def preview_resume(
     except:
         safe_filename = "unknown_file"
     
-    # 返回预览结果（包含临时文件信息，用于后续保存）
+    # 解析通过后移入存储；解析结果和文件信息保存在服务端，客户端只拿到 preview_token
+    stored_name = blob_key(stored.sha256, ext)
+    location = await _store_blob(staging_path, stored_name)
+    preview_token = await run_in_threadpool(preview_store.create, {
+        "stored_name": stored_name,
+        "original_name": safe_filename,
+        "path": location,
+        "sha256": stored.sha256,
+        "parsed": {k: v for k, v in parsed.items() if k != "text"},
+        "text": parsed.get("text"),
+    })
+
+    # 返回预览结果（保存时回传 preview_token 即可）
     return {
+        "preview_token": preview_token,
+        "expires_in": preview_store.ttl,
         "parsed": {
             "name": parsed.get("name"),
             "email": parsed.get("email"),
@@ -258,9 +505,8 @@ async def preview_resume(
             "major": parsed.get("major"),
         },
         "file_info": {
-            "stored_name": unique_name,
+            "stored_name": stored_name,
             "original_name": safe_filename,
-            "temp_path": save_path,  # 临时文件路径，保存时需要
         }
     }
 
@@ -268,34 +514,30 @@ async def preview_resume(
 @app.post("/save", summary="保存已解析的候选人信息")
 async def save_candidate(
         parsed_data: dict = Body(...),
-        db: Session = Depends(get_db),
-        current_user: User = Depends(get_current_user),
+        dedup: str = Query(DEDUP_MODE, description=DEDUP_DESCRIPTION),
+        db: Session = Depends(get_write_db),
+        current_user: UserPrincipal = Depends(get_current_user),
 ):
-    """保存预览后的候选人信息"""
+    """保存预览后的候选人信息：凭 /preview 返回的 preview_token 直接入库，不重新解析"""
+    _check_dedup_mode(dedup)
+    preview_token = parsed_data.get("preview_token")
+    session = await run_in_threadpool(preview_store.pop, preview_token) if preview_token else None
+    if session is None:
+        raise HTTPException(status_code=400, detail="预览已过期，请重新上传")
+
     try:
-        parsed = parsed_data.get("parsed", {})
-        file_info = parsed_data.get("file_info", {})
-        
-        if not file_info.get("temp_path") or not os.path.exists(file_info["temp_path"]):
-            raise HTTPException(status_code=400, detail="文件已过期，请重新上传")
-        
-        candidate = Candidate(
-            name=parsed.get("name"),
-            email=parsed.get("email"),
-            phone=parsed.get("phone"),
-            university=parsed.get("university"),
-            degree=parsed.get("degree"),
-            major=parsed.get("major"),
-            resume_filename=file_info.get("stored_name"),
-            resume_original_name=file_info.get("original_name"),
-            resume_path=file_info.get("temp_path"),
-        )
-        print(candidate.resume_path)
-        db.add(candidate)
-        db.commit()
-        db.refresh(candidate)
+        parsed = {**session["parsed"], "text": session.get("text")}
+        resume = {
+            "resume_filename": session["stored_name"],
+            "resume_original_name": session["original_name"],
+            "resume_path": session["path"],
+            "content_hash": session["sha256"],
+        }
+        candidate, duplicate_info = await run_in_threadpool(_save_parsed, db, dedup, parsed, resume)
+        if duplicate_info is None and candidate.resume_text_complete is False:
+            schedule_text_backfill(candidate.id, candidate.resume_path)
 
-        return {
+        response = {
             "id": candidate.id,
             "name": candidate.name,
             "email": candidate.email,
@@ -306,8 +548,13 @@ async def save_candidate(
             "tags": candidate.tags or "",
             "created_at": candidate.created_at,
         }
+        if duplicate_info is not None:
+            response["duplicate"] = duplicate_info
+        return response
     except Exception as e:
-        db.rollback()
+        await run_in_threadpool(db.rollback)
+        # 写库失败时把会话放回，允许用户重试保存
+        await run_in_threadpool(preview_store.restore, preview_token, session)
         error_msg = str(e).encode('utf-8', errors='replace').decode('utf-8')
         raise HTTPException(status_code=500, detail=f"保存失败: {error_msg}")
 
@@ -315,33 +562,54 @@ async def save_candidate(
 @app.post("/upload", summary="上传简历（PDF/DOCX）并解析")
 async def upload_resume(
         file: UploadFile = File(...),
-        db: Session = Depends(get_db),
-        current_user: User = Depends(get_current_user),
+        mode: str = Query("sync", description="sync：解析完成后返回候选人；async：立即返回任务 ID，后台解析入库"),
+        dedup: str = Query(DEDUP_MODE, description=DEDUP_DESCRIPTION),
+        db: Session = Depends(get_write_db),
+        current_user: UserPrincipal = Depends(get_current_user),
 ):
+    if mode not in ("sync", "async"):
+        raise HTTPException(status_code=400, detail="mode 只能是 sync 或 async")
+    _check_dedup_mode(dedup)
+
     filename_lower = file.filename.lower()
     if not (filename_lower.endswith(".pdf") or filename_lower.endswith(".docx")):
         raise HTTPException(status_code=400, detail="只支持 PDF 或 DOCX 文件")
     
-    # 检查文件大小
-    content = await file.read()
-    if len(content) > MAX_FILE_SIZE:
-        raise HTTPException(status_code=400, detail=f"文件大小不能超过 {MAX_FILE_SIZE / 1024 / 1024}MB")
-    
     ext = ".pdf" if filename_lower.endswith(".pdf") else ".docx"
-    unique_name = f"{uuid.uuid4().hex}{ext}"
-    save_path = os.path.join(UPLOAD_DIR, unique_name)
+    staging_path = new_staging_path(ext)
+
+    # 保存文件（按块写入暂存目录，超过大小限制立即中止）
+    stored = await _save_upload(file, staging_path)
+    stored_name = blob_key(stored.sha256, ext)
 
-    # 保存文件
+    # 安全处理文件名，避免特殊字符导致的编码问题
+    safe_filename = file.filename
     try:
-        with open(save_path, "wb") as f:
-            f.write(content)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"保存文件失败: {e}")
+        # 确保文件名可以安全编码
+        safe_filename = safe_filename.encode('utf-8', errors='replace').decode('utf-8')
+    except:
+        safe_filename = "unknown_file"
+
+    # 异步模式：登记任务后立即返回，由后台 worker 解析入库
+    if mode == "async":
+        location = await _store_blob(staging_path, stored_name)
+        job = await run_in_threadpool(create_job, db, stored_name=stored_name, original_name=safe_filename,
+                                      file_path=location, content_hash=stored.sha256, dedup_mode=dedup)
+        job_queue.enqueue(job.id)
+        return JSONResponse(status_code=202, content=jsonable_encoder({
+            **job_to_dict(job),
+            "status_url": f"/jobs/{job.id}",
+            "events_url": f"/jobs/{job.id}/events",
+        }))
 
-    # 解析
+    # 解析（在进程池中执行，不阻塞事件循环）
     try:
-        parsed = parse_resume_file(save_path)
+        parsed = await parse_service.parse_file(staging_path, stored.sha256)
+    except (ParseServiceBusy, ParseTimeout) as e:
+        discard_staged(staging_path)
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": PARSE_RETRY_AFTER})
     except Exception as e:
+        discard_staged(staging_path)
         # 安全处理异常消息，避免编码问题
         error_msg = str(e)
         try:
@@ -351,30 +619,39 @@ async def upload_resume(
             error_msg = "解析简历时发生错误"
         raise HTTPException(status_code=500, detail=f"解析简历失败: {error_msg}")
 
-    # 安全处理文件名，避免特殊字符导致的编码问题
-    safe_filename = file.filename
-    try:
-        # 确保文件名可以安全编码
-        safe_filename = safe_filename.encode('utf-8', errors='replace').decode('utf-8')
-    except:
-        safe_filename = "unknown_file"
-    
-    candidate = Candidate(
-        name=parsed.get("name"),
-        email=parsed.get("email"),
-        phone=parsed.get("phone"),
-        university=parsed.get("university"),
-        degree=parsed.get("degree"),
-        major=parsed.get("major"),
-        resume_filename=unique_name,
-        resume_original_name=safe_filename,
-        resume_path=save_path,
-    )
-    db.add(candidate)
-    db.commit()
-    db.refresh(candidate)
+    # 重复检测：skip 时不保存新文件；merge 时只有已有候选人没有原文件才使用新文件
+    duplicate_info = None
+    existing = await run_in_threadpool(_lookup_duplicate, db, dedup, parsed, stored.sha256)
+    needs_blob = existing is None or (dedup == "merge" and not is_blob_location(existing[0].resume_path))
+    if needs_blob:
+        # 查重开启的读事务占着写连接；移入存储（S3 时上传整个文件）之前先结束，之后写库时再重新取连接
+        await run_in_threadpool(db.rollback)
+    if existing is not None:
+        candidate, duplicate = existing
+        resume = None
+        if needs_blob:
+            resume = {
+                "resume_filename": stored_name,
+                "resume_original_name": safe_filename,
+                "resume_path": await _store_blob(staging_path, stored_name),
+                "content_hash": stored.sha256,
+            }
+        else:
+            discard_staged(staging_path)
+        duplicate_info = await run_in_threadpool(_apply_duplicate, db, candidate, duplicate, dedup, parsed, resume)
+    else:
+        location = await _store_blob(staging_path, stored_name)
+        candidate = await run_in_threadpool(_add_candidate, db, Candidate.from_parsed(
+            parsed,
+            resume_filename=stored_name,
+            resume_original_name=safe_filename,
+            resume_path=location,
+            content_hash=stored.sha256,
+        ))
+        if candidate.resume_text_complete is False:
+            schedule_text_backfill(candidate.id, candidate.resume_path)
 
-    return {
+    response = {
         "id": candidate.id,
         "name": candidate.name,
         "email": candidate.email,
@@ -388,17 +665,193 @@ async def upload_resume(
         },
         "created_at": candidate.created_at,
     }
+    if duplicate_info is not None:
+        response["duplicate"] = duplicate_info
+    return response
+
+
+async def _parse_with_retry(path: str, content_hash: str, slots: asyncio.Semaphore):
+    """批量解析时使用：占用一个并发名额，解析服务繁忙时等待重试而不是直接失败"""
+    async with slots:
+        while True:
+            try:
+                return await parse_service.parse_file(path, content_hash)
+            except ParseServiceBusy:
+                await asyncio.sleep(1)
+
+
+@app.get("/parse-service/stats", summary="解析服务与解析缓存的运行状态")
+def get_parse_service_stats(current_user: UserPrincipal = Depends(get_current_user)):
+    return {
+        "service": parse_service.stats(),
+        "cache": parse_cache.stats(),
+        "docx_html_cache": docx_html_cache.stats(),
+    }
+
+
+@app.post("/upload/batch", summary="批量上传简历（多个 PDF/DOCX 或 ZIP 压缩包）")
+async def upload_resume_batch(
+        files: List[UploadFile] = File(...),
+        dedup: str = Query(DEDUP_MODE, description=DEDUP_DESCRIPTION + "；同一批内重复的文件只保留第一份"),
+        db: Session = Depends(get_write_db),
+        current_user: UserPrincipal = Depends(get_current_user),
+):
+    """
+    一次上传多个简历文件或 ZIP 压缩包：文件按块写入暂存目录，并行解析，解析通过的移入存储，
+    按 BATCH_COMMIT_SIZE 分块批量入库。
+    返回每个文件的处理结果以及吞吐统计。
+    """
+    _check_dedup_mode(dedup)
+    started = time.perf_counter()
+
+    # 1) 展开并落盘（ZIP 逐条目流式解压），文件 I/O 放到线程池执行
+    entries = []
+    for upload in files:
+        remaining = BATCH_MAX_FILES - len(entries)
+        if remaining <= 0:
+            entries.append({"original_name": upload.filename, "error": f"单次最多处理 {BATCH_MAX_FILES} 个文件"})
+            continue
+        entries.extend(await run_in_threadpool(
+            expand_upload, upload.file, upload.filename, STAGING_DIR, MAX_FILE_SIZE, remaining
+        ))
+
+    # 2) 分块：块内并行解析，解析完成后一次性写入
+    results = [None] * len(entries)
+    for i, entry in enumerate(entries):
+        if entry.get("error"):
+            results[i] = {"filename": entry["original_name"], "status": "error", "error": entry["error"]}
+
+    slots = asyncio.Semaphore(parse_service.max_workers)
+    pending = [i for i, entry in enumerate(entries) if not entry.get("error")]
+    for start in range(0, len(pending), BATCH_COMMIT_SIZE):
+        chunk = pending[start:start + BATCH_COMMIT_SIZE]
+        outcomes = await asyncio.gather(
+            *(_parse_with_retry(entries[i]["path"], entries[i]["sha256"], slots) for i in chunk),
+            return_exceptions=True,
+        )
+
+        rows, row_indexes = [], []
+        for i, outcome in zip(chunk, outcomes):
+            entry = entries[i]
+            if isinstance(outcome, Exception):
+                error_msg = str(outcome).encode('utf-8', errors='replace').decode('utf-8')
+                results[i] = {"filename": entry["original_name"], "status": "error", "error": f"解析简历失败: {error_msg}"}
+                discard_staged(entry["path"])
+                continue
+            rows.append({**entry, "parsed": outcome})
+            row_indexes.append(i)
+
+        # 解析通过的文件按内容寻址移入存储（S3 上传在线程池中并行执行）
+        for row in rows:
+            row["stored_name"] = blob_key(row["sha256"], os.path.splitext(row["path"])[1])
+        stored = await asyncio.gather(
+            *(_store_blob(row["path"], row["stored_name"]) for row in rows), return_exceptions=True
+        )
+        kept_rows, kept_indexes = [], []
+        for i, row, outcome in zip(row_indexes, rows, stored):
+            if isinstance(outcome, HTTPException):
+                results[i] = {"filename": row["original_name"], "status": "error", "error": outcome.detail}
+                continue
+            row["path"] = outcome
+            kept_rows.append(row)
+            kept_indexes.append(i)
+        rows, row_indexes = kept_rows, kept_indexes
+
+        # 重复检测：一次查询整块；重复的条目不新建（其文件无人引用时由孤儿清理删除）
+        duplicates = [None] * len(rows)
+        if dedup != "force" and rows:
+            try:
+                duplicates = await run_in_threadpool(resolve_duplicates, db, rows, dedup)
+            except Exception as e:
+                error_msg = str(e).encode('utf-8', errors='replace').decode('utf-8')
+                for i in row_indexes:
+                    results[i] = {"filename": entries[i]["original_name"], "status": "error", "error": f"保存失败: {error_msg}"}
+                continue
+        duplicate_rows = [(i, row, dup) for i, row, dup in zip(row_indexes, rows, duplicates) if dup is not None]
+        deduped_indexes = row_indexes  # resolve_duplicates 返回的 row 为在这一列表中的位置
+        rows, row_indexes = (
+            [row for row, dup in zip(rows, duplicates) if dup is None],
+            [i for i, dup in zip(row_indexes, duplicates) if dup is None],
+        )
+
+        ids = []
+        if rows:
+            try:
+                ids = await run_in_threadpool(bulk_insert_candidates, db, rows)
+            except Exception as e:
+                error_msg = str(e).encode('utf-8', errors='replace').decode('utf-8')
+                for i in row_indexes:
+                    results[i] = {"filename": entries[i]["original_name"], "status": "error", "error": f"保存失败: {error_msg}"}
+        for i, row, candidate_id in zip(row_indexes, rows, ids):
+            parsed = row["parsed"]
+            if parsed.get("text_complete") is False:
+                schedule_text_backfill(candidate_id, row["path"])
+            results[i] = {
+                "filename": row["original_name"],
+                "status": "ok",
+                "id": candidate_id,
+                "name": parsed.get("name"),
+                "email": parsed.get("email"),
+                "phone": parsed.get("phone"),
+            }
+        # 与本批中更早条目重复的，指向该条目新建的候选人
+        for i, row, dup in duplicate_rows:
+            if "row" in dup:
+                first = results[deduped_indexes[dup.pop("row")]]
+                if first["status"] != "ok":
+                    results[i] = {"filename": row["original_name"], "status": "error", "error": "与同批文件重复，且该文件未能保存"}
+                    continue
+                dup["id"] = first["id"]
+            results[i] = {"filename": row["original_name"], "status": "duplicate", "duplicate": dup, "id": dup["id"]}
+
+    elapsed = time.perf_counter() - started
+    total_bytes = sum(entry.get("size") or 0 for entry in entries)
+    succeeded = sum(1 for r in results if r["status"] == "ok")
+    duplicated = sum(1 for r in results if r["status"] == "duplicate")
+    return {
+        "results": results,
+        "summary": {
+            "files": len(results),
+            "succeeded": succeeded,
+            "duplicates": duplicated,
+            "failed": len(results) - succeeded - duplicated,
+            "bytes": total_bytes,
+            "elapsed_seconds": round(elapsed, 3),
+            "files_per_second": round(len(results) / elapsed, 2) if elapsed > 0 else None,
+            "mb_per_second": round(total_bytes / 1024 / 1024 / elapsed, 2) if elapsed > 0 else None,
+        },
+    }
 
 
 @app.post("/upload-text", summary="上传简历纯文本并解析（爬虫/接口用）")
 def upload_resume_text(
         text: str = Body(..., embed=True, description="简历的纯文本内容"),
-        db: Session = Depends(get_db),
+        dedup: str = Query(DEDUP_MODE, description=DEDUP_DESCRIPTION),
+        db: Session = Depends(get_write_db),
 ):
+    _check_dedup_mode(dedup)
     try:
         parsed = parse_resume_text_cn(text)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"解析简历文本失败: {e}")
+
+    existing = _lookup_duplicate(db, dedup, parsed)
+    if existing is not None:
+        candidate, duplicate = existing
+        duplicate_info = _apply_duplicate(db, candidate, duplicate, dedup,
+                                          {**parsed, "text": text, "text_complete": True})
+        return {
+            "id": candidate.id,
+            "name": candidate.name,
+            "email": candidate.email,
+            "phone": candidate.phone,
+            "university": candidate.university,
+            "degree": candidate.degree,
+            "major": candidate.major,
+            "created_at": candidate.created_at,
+            "duplicate": duplicate_info,
+        }
+
     candidate = Candidate(
         name=parsed.get("name"),
         email=parsed.get("email"),
@@ -409,6 +862,8 @@ def upload_resume_text(
         resume_filename="(from_text)",
         resume_original_name="(from_text)",
         resume_path="(from_text)",
+        resume_text=text,
+        resume_text_complete=True,
     )
     db.add(candidate)
     db.commit()
@@ -426,131 +881,490 @@ def upload_resume_text(
     }
 
 
+async def _parse_texts(texts: List[str]) -> List[dict]:
+    """把一批文本平均分给各解析进程并行解析，解析服务繁忙时等待重试；某一份失败时其中每条都记为失败"""
+    size = max(1, -(-len(texts) // parse_service.max_workers))
+    parts = [texts[start:start + size] for start in range(0, len(texts), size)]
+
+    async def run(part):
+        while True:
+            try:
+                return await parse_service.run(parse_resume_texts, part)
+            except ParseServiceBusy:
+                await asyncio.sleep(1)
+
+    parsed = []
+    for part, outcome in zip(parts, await asyncio.gather(*(run(part) for part in parts), return_exceptions=True)):
+        if isinstance(outcome, Exception):
+            error_msg = str(outcome).encode('utf-8', errors='replace').decode('utf-8')
+            outcome = [{"error": error_msg}] * len(part)
+        parsed.extend(outcome)
+    return parsed
+
+
+def _in_write_session(fn, *args):
+    """在一个短会话中执行 fn(db, *args)，结束后立即归还写连接（在线程池中调用）"""
+    db = WriteSessionLocal()
+    try:
+        return fn(db, *args)
+    finally:
+        db.close()
+
+
+async def _ingest_text_chunk(chunk: List[tuple], dedup: str, results: List[dict], first_by_external_id: dict):
+    """
+    /upload-text/batch 的一块记录：external_id 已入库的直接返回，其余并行解析、重复检测后一次事务写入。
+    chunk 中每项为 (序号, {"text", "external_id"})，结果写入 results[序号]。
+    请求体是流式读取的，每一步写库都使用单独的短会话，解析和等待后续数据时不占用写连接。
+    """
+    def result(i, record, status, **fields):
+        results[i] = {"index": i, "external_id": record["external_id"], "status": status, **fields}
+
+    # 1) 幂等：external_id 已入库的不再解析；同一请求中重复的指向第一次出现的记录
+    external_ids = [record["external_id"] for _, record in chunk if record["external_id"]]
+    existing = await run_in_threadpool(_in_write_session, find_external_ids, external_ids) if external_ids else {}
+    todo, repeats = [], []
+    for i, record in chunk:
+        external_id = record["external_id"]
+        if external_id in existing:
+            result(i, record, "exists", id=existing[external_id])
+            continue
+        first = first_by_external_id.get(external_id) if external_id else None
+        if first is not None and (results[first] is None or results[first]["status"] != "error"):
+            repeats.append((i, record, first))
+            continue
+        if external_id:
+            first_by_external_id[external_id] = i
+        todo.append((i, record))
+
+    # 2) 并行解析
+    parsed_list = await _parse_texts([record["text"] for _, record in todo]) if todo else []
+    rows, row_indexes = [], []
+    for (i, record), parsed in zip(todo, parsed_list):
+        if "error" in parsed:
+            result(i, record, "error", error=f"解析简历文本失败: {parsed['error']}")
+            continue
+        rows.append({
+            "parsed": {**parsed, "text": record["text"], "text_complete": True},
+            "stored_name": "(from_text)",
+            "original_name": "(from_text)",
+            "path": "(from_text)",
+            "external_id": record["external_id"],
+        })
+        row_indexes.append(i)
+    records = dict(chunk)
+
+    # 3) 重复检测（与 /upload/batch 相同）
+    duplicates = [None] * len(rows)
+    if dedup != "force" and rows:
+        try:
+            duplicates = await run_in_threadpool(_in_write_session, resolve_duplicates, rows, dedup)
+        except Exception as e:
+            error_msg = str(e).encode('utf-8', errors='replace').decode('utf-8')
+            for i in row_indexes:
+                result(i, records[i], "error", error=f"保存失败: {error_msg}")
+            rows, row_indexes = [], []
+    duplicate_rows = [(i, dup) for i, dup in zip(row_indexes, duplicates) if dup is not None]
+    deduped_indexes = row_indexes  # resolve_duplicates 返回的 row 为在这一列表中的位置
+    rows, row_indexes = (
+        [row for row, dup in zip(rows, duplicates) if dup is None],
+        [i for i, dup in zip(row_indexes, duplicates) if dup is None],
+    )
+
+    # 4) 一次事务写入；另一个请求同时提交了相同 external_id 时违反唯一索引，
+    #    重新查询后把这些记录标为已存在，其余记录再写一次
+    for attempt in range(2):
+        if not rows:
+            break
+        try:
+            ids = await run_in_threadpool(_in_write_session, bulk_insert_candidates, rows)
+        except IntegrityError as e:
+            if attempt == 0:
+                taken = await run_in_threadpool(
+                    _in_write_session, find_external_ids, [row["external_id"] for row in rows if row["external_id"]]
+                )
+                if taken:
+                    kept_rows, kept_indexes = [], []
+                    for i, row in zip(row_indexes, rows):
+                        if row["external_id"] in taken:
+                            result(i, records[i], "exists", id=taken[row["external_id"]])
+                        else:
+                            kept_rows.append(row)
+                            kept_indexes.append(i)
+                    rows, row_indexes = kept_rows, kept_indexes
+                    continue
+            error_msg = str(e).encode('utf-8', errors='replace').decode('utf-8')
+            for i in row_indexes:
+                result(i, records[i], "error", error=f"保存失败: {error_msg}")
+            break
+        except Exception as e:
+            error_msg = str(e).encode('utf-8', errors='replace').decode('utf-8')
+            for i in row_indexes:
+                result(i, records[i], "error", error=f"保存失败: {error_msg}")
+            break
+        for i, row, candidate_id in zip(row_indexes, rows, ids):
+            parsed = row["parsed"]
+            result(i, records[i], "ok", id=candidate_id,
+                   name=parsed.get("name"), email=parsed.get("email"), phone=parsed.get("phone"))
+        break
+
+    # 与本批中更早记录重复的，指向该记录新建的候选人
+    for i, dup in duplicate_rows:
+        if "row" in dup:
+            first = results[deduped_indexes[dup.pop("row")]]
+            if first["status"] not in ("ok", "exists"):
+                result(i, records[i], "error", error="与同批记录重复，且该记录未能保存")
+                continue
+            dup["id"] = first["id"]
+        result(i, records[i], "duplicate", id=dup["id"], duplicate=dup)
+    for i, record, first in repeats:
+        if results[first]["status"] == "error":
+            result(i, record, "error", error="与同批记录的 external_id 相同，且该记录未能保存")
+        else:
+            result(i, record, "exists", id=results[first]["id"])
+
+
+@app.post("/upload-text/batch", summary="批量上传简历纯文本（NDJSON 或 JSON 数组，爬虫/接口用）")
+async def upload_resume_text_batch(
+        request: Request,
+        dedup: str = Query(DEDUP_MODE, description=DEDUP_DESCRIPTION + "；同一批内重复的记录只保留第一条"),
+        current_user: UserPrincipal = Depends(get_current_user),
+):
+    """
+    请求体为 NDJSON（每行一条）或 JSON 数组，记录格式 {"text": "...", "external_id": "..."}，
+    边接收边解码，每满 BATCH_COMMIT_SIZE 条在解析进程池中并行解析并一次事务写入。
+    external_id 可选：已入库的 external_id 不会重复新建，返回 status=exists 和已有候选人 ID，
+    因此请求中断后可以整批重新提交。
+    返回与请求记录顺序一致的处理结果（index 为记录序号）以及吞吐统计。
+    """
+    _check_dedup_mode(dedup)
+    started = time.perf_counter()
+
+    results: List[Optional[dict]] = []
+    first_by_external_id: dict = {}
+    chunk: List[tuple] = []
+    async for item in iter_records(request.stream(), TEXT_RECORD_MAX_BYTES):
+        i = len(results)
+        if i >= TEXT_BATCH_MAX_RECORDS:
+            results.append({"index": i, "external_id": None, "status": "error",
+                            "error": f"单次最多处理 {TEXT_BATCH_MAX_RECORDS} 条记录，之后的记录未处理"})
+            break
+        record = normalize_record(item)
+        if isinstance(record, RecordError):
+            results.append({"index": i, "external_id": None, "status": "error", "error": record.message})
+            continue
+        results.append(None)
+        chunk.append((i, record))
+        if len(chunk) >= BATCH_COMMIT_SIZE:
+            await _ingest_text_chunk(chunk, dedup, results, first_by_external_id)
+            chunk = []
+    if chunk:
+        await _ingest_text_chunk(chunk, dedup, results, first_by_external_id)
+
+    elapsed = time.perf_counter() - started
+    counts = {status: sum(1 for r in results if r["status"] == status)
+              for status in ("ok", "exists", "duplicate", "error")}
+    return {
+        "results": results,
+        "summary": {
+            "records": len(results),
+            "succeeded": counts["ok"],
+            "existing": counts["exists"],
+            "duplicates": counts["duplicate"],
+            "failed": counts["error"],
+            "elapsed_seconds": round(elapsed, 3),
+            "records_per_second": round(len(results) / elapsed, 2) if elapsed > 0 else None,
+        },
+    }
+
+
+@app.get("/jobs/{job_id}", summary="查询异步入库任务状态")
+def get_ingest_job(
+        job_id: str,
+        current_user: UserPrincipal = Depends(get_current_user),
+):
+    job = get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    return job
+
+
+@app.get("/jobs/{job_id}/events", summary="订阅异步入库任务进度（Server-Sent Events）")
+async def stream_ingest_job(
+        job_id: str,
+        current_user: UserPrincipal = Depends(get_current_user),
+):
+    job = await run_in_threadpool(get_job, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="任务不存在")
+
+    async def event_stream():
+        last = None
+        while True:
+            current = await run_in_threadpool(get_job, job_id)
+            if current is None:
+                return
+            snapshot = (current["status"], current["progress"], current["stage"])
+            if snapshot != last:
+                last = snapshot
+                yield f"event: progress\ndata: {json.dumps(jsonable_encoder(current), ensure_ascii=False)}\n\n"
+            if current["status"] in ("done", "failed"):
+                return
+            # 本进程处理的任务会被立即唤醒；其它进程处理的任务依靠超时后查库
+            await job_queue.wait_for_update(job_id, timeout=JOB_EVENTS_POLL_INTERVAL)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _find_candidate(db: Session, candidate_id: int) -> Optional[Candidate]:
+    return db.query(Candidate).filter(Candidate.id == candidate_id).first()
+
+
+def _resume_file_response(candidate: Candidate, request: Request, media_type: str, disposition: str):
+    """
+    返回简历原文件：
+    - ETag 取文件内容的 SHA-256（早期没有 content_hash 的记录用修改时间和大小），If-None-Match 命中时返回 304
+    - 支持 Range / If-Range（FileResponse 实现），浏览器内置的 PDF 阅读器可以按需分段加载
+    - 设置 DOWNLOAD_ACCEL_PREFIX 时只返回 X-Accel-Redirect 头，由 nginx 以 sendfile 零拷贝发送文件
+    - 文件保存在 S3 时重定向到临时签名链接，由浏览器直接从对象存储下载（ETag、Range 由对象存储处理）
+    """
+    location = candidate.resume_path
+    if is_blob_location(location) and is_remote(location):
+        store, key = resolve(location)
+        url = store.presigned_url(key, candidate.resume_original_name, media_type, disposition)
+        return RedirectResponse(url, status_code=307, headers={"Cache-Control": "private, no-store"})
+
+    try:
+        stat_result = os.stat(location)
+    except OSError:
+        raise HTTPException(status_code=404, detail="简历文件不存在")
+
+    if candidate.content_hash:
+        etag = f'"{candidate.content_hash}"'
+    else:
+        etag = f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+    headers = cache_headers(etag, stat_result.st_mtime, max_age=RESUME_CACHE_MAX_AGE)
+    if is_not_modified(request, etag, stat_result.st_mtime):
+        return Response(status_code=304, headers=headers)
+
+    response = FileResponse(
+        path=location,
+        filename=candidate.resume_original_name,
+        media_type=media_type,
+        headers=headers,
+        stat_result=stat_result,
+        content_disposition_type=disposition,
+    )
+    if DOWNLOAD_ACCEL_PREFIX:
+        relative = local_store.key_of(location)
+        return Response(media_type=media_type, headers={
+            **headers,
+            "Content-Disposition": response.headers["content-disposition"],
+            "X-Accel-Redirect": DOWNLOAD_ACCEL_PREFIX + quote(relative),
+        })
+    return response
+
+
 @app.get("/candidates/{candidate_id}/resume/download", summary="下载简历文件")
-def download_resume(candidate_id: int, db: Session = Depends(get_db)):
+async def download_resume(candidate_id: int, request: Request, db=Depends(get_read_db)):
     """下载候选人的原始简历文件"""
-    candidate = db.query(Candidate).filter(Candidate.id == candidate_id).first()
+    candidate = await run_db(db, _find_candidate, candidate_id)
     if not candidate:
         raise HTTPException(status_code=404, detail="候选人不存在")
     
-    if not os.path.exists(candidate.resume_path):
-        raise HTTPException(status_code=404, detail="简历文件不存在")
-    
     # 使用原始文件名作为下载文件名
-    return FileResponse(
-        path=candidate.resume_path,
-        filename=candidate.resume_original_name,
-        media_type="application/octet-stream"
-    )
+    return _resume_file_response(candidate, request, "application/octet-stream", "attachment")
+
+
+def _resume_last_modified(candidate: Candidate) -> float:
+    """本地文件取修改时间；S3 中的文件按内容寻址、不会被改写，取候选人的入库时间"""
+    if is_remote(candidate.resume_path):
+        created_at = candidate.created_at
+        if created_at is None:
+            return 0.0
+        if created_at.tzinfo is None:
+            created_at = created_at.replace(tzinfo=timezone.utc)
+        return created_at.timestamp()
+    try:
+        return os.path.getmtime(candidate.resume_path)
+    except OSError:
+        raise HTTPException(status_code=404, detail="简历文件不存在")
+
+
+async def _docx_html_preview(candidate: Candidate, request: Request):
+    """
+    DOCX 的 HTML 预览。HTML 按文件内容哈希缓存（docx_html_cache），只在首次预览时转换一次，
+    转换在解析进程池中执行；响应带 ETag / Last-Modified，浏览器再次预览时内容未变则返回 304。
+    """
+    mtime = _resume_last_modified(candidate)
+    content_hash = candidate.content_hash or await run_in_threadpool(file_sha256, candidate.resume_path)
+    headers = cache_headers(f'"{content_hash}-{PARSER_VERSION}"', mtime)
+    if is_not_modified(request, headers["ETag"], mtime):
+        return Response(status_code=304, headers=headers)
+
+    html_content = await run_in_threadpool(docx_html_cache.get, content_hash)
+    if html_content is None:
+        try:
+            async with local_copy(candidate.resume_path) as path:
+                html_content = await parse_service.run(extract_docx_to_html, path)
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail="简历文件不存在")
+        except (ParseServiceBusy, ParseTimeout) as e:
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": PARSE_RETRY_AFTER})
+        except Exception as e:
+            error_msg = str(e).encode('utf-8', errors='replace').decode('utf-8')
+            raise HTTPException(status_code=500, detail=f"DOCX 预览失败: {error_msg}")
+        await run_in_threadpool(docx_html_cache.put, content_hash, html_content)
+
+    return JSONResponse({
+        "type": "html",
+        "content": html_content,
+        "filename": candidate.resume_original_name
+    }, headers=headers)
 
 
 @app.get("/candidates/{candidate_id}/resume/preview", summary="预览简历文件")
-def preview_resume_file(candidate_id: int, db: Session = Depends(get_db)):
+async def preview_resume_file(candidate_id: int, request: Request, db=Depends(get_read_db)):
     """预览候选人的原始简历文件（PDF可直接预览，DOCX返回HTML）"""
-    candidate = db.query(Candidate).filter(Candidate.id == candidate_id).first()
-    print(candidate)
+    candidate = await run_db(db, _find_candidate, candidate_id)
     if not candidate:
         raise HTTPException(status_code=404, detail="候选人不存在")
     
-    if not os.path.exists(candidate.resume_path):
-        raise HTTPException(status_code=404, detail="简历文件不存在")
-    
     file_ext = os.path.splitext(candidate.resume_path)[1].lower()
     
     # PDF 文件可以直接在浏览器中预览
     if file_ext == ".pdf":
-        return FileResponse(
-            path=candidate.resume_path,
-            filename=candidate.resume_original_name,
-            media_type="application/pdf"
-        )
+        return _resume_file_response(candidate, request, "application/pdf", "inline")
+
     # DOCX 文件转换为 HTML 预览
-    elif file_ext == ".docx":
-        try:
-            html_content = extract_docx_to_html(candidate.resume_path)
-            return JSONResponse({
-                "type": "html",
-                "content": html_content,
-                "filename": candidate.resume_original_name
-            })
-        except Exception as e:
-            error_msg = str(e).encode('utf-8', errors='replace').decode('utf-8')
-            raise HTTPException(status_code=500, detail=f"DOCX 预览失败: {error_msg}")
-    else:
-        raise HTTPException(status_code=400, detail="不支持的文件格式")
+    if file_ext == ".docx":
+        return await _docx_html_preview(candidate, request)
+    raise HTTPException(status_code=400, detail="不支持的文件格式")
 
 
 @app.get("/candidates/{candidate_id}/resume/preview-html", summary="获取DOCX文件的HTML预览")
-def get_docx_html_preview(candidate_id: int, db: Session = Depends(get_db)):
+async def get_docx_html_preview(candidate_id: int, request: Request, db=Depends(get_read_db)):
     """获取DOCX文件的HTML格式预览内容"""
-    candidate = db.query(Candidate).filter(Candidate.id == candidate_id).first()
-    print(candidate)
+    candidate = await run_db(db, _find_candidate, candidate_id)
     if not candidate:
         raise HTTPException(status_code=404, detail="候选人不存在")
     
-    if not os.path.exists(candidate.resume_path):
-        raise HTTPException(status_code=404, detail="简历文件不存在")
-    
     file_ext = os.path.splitext(candidate.resume_path)[1].lower()
     if file_ext != ".docx":
         raise HTTPException(status_code=400, detail="此接口仅支持 DOCX 文件")
     
-    try:
-        html_content = extract_docx_to_html(candidate.resume_path)
-        return JSONResponse({
-            "type": "html",
-            "content": html_content,
-            "filename": candidate.resume_original_name
-        })
-    except Exception as e:
-        error_msg = str(e).encode('utf-8', errors='replace').decode('utf-8')
-        raise HTTPException(status_code=500, detail=f"DOCX 预览失败: {error_msg}")
+    return await _docx_html_preview(candidate, request)
+
+
+def _duplicate_groups(db: Session, limit: int) -> dict:
+    groups = find_duplicate_groups(db)
+    shown = groups[:limit]
+    ids = [candidate_id for group in shown for candidate_id in group["ids"]]
+    by_id = {c.id: c for c in db.query(Candidate).filter(Candidate.id.in_(ids))} if ids else {}
+    return {
+        "total": len(groups),
+        "groups": [
+            {
+                "matched_on": group["matched_on"],
+                "candidates": [
+                    {
+                        "id": by_id[candidate_id].id,
+                        "name": by_id[candidate_id].name,
+                        "email": by_id[candidate_id].email,
+                        "phone": by_id[candidate_id].phone,
+                        "university": by_id[candidate_id].university,
+                        "created_at": by_id[candidate_id].created_at,
+                    }
+                    for candidate_id in group["ids"] if candidate_id in by_id
+                ],
+            }
+            for group in shown
+        ],
+    }
+
+
+@app.get("/candidates/duplicates", summary="列出疑似重复的候选人（同一文件、手机号或邮箱）")
+async def list_duplicate_candidates(
+        limit: int = Query(100, ge=1, le=1000, description="最多返回的重复组数"),
+        db=Depends(get_read_db),
+        current_user: UserPrincipal = Depends(get_current_user),
+):
+    """按规范化的手机号、邮箱和文件哈希分组查找重复（不做两两比较）；合并请运行 python dedup.py --merge"""
+    return await run_db(db, _duplicate_groups, limit)
 
 
 @app.get("/candidates", summary="获取候选人列表")
-def list_candidates(
+async def list_candidates(
     tag: str = None,
+    tag_mode: str = "and",
     name: str = None,
     degree: str = None,
+    q: str = None,
     page: int = 1,
     page_size: int = 10,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    after_id: int = None,
+    before_id: int = None,
+    db=Depends(get_read_db),
+    current_user: UserPrincipal = Depends(get_current_user)
 ):
-    """获取候选人列表，支持按标签、姓名、学历筛选和分页"""
-    query = db.query(Candidate)
-    
-    # 如果提供了标签参数，进行筛选
-    if tag and tag.strip():
-        tag_filter = f"%{tag.strip()}%"
-        query = query.filter(Candidate.tags.like(tag_filter))
-    
-    # 如果提供了姓名参数，进行模糊搜索
-    if name and name.strip():
-        name_filter = f"%{name.strip()}%"
-        # 使用大小写不敏感的模糊搜索，并排除 NULL 值
-        # SQLite 的 LIKE 默认大小写不敏感，但使用 func.lower 更明确
-        query = query.filter(
-            Candidate.name.isnot(None),
-            func.lower(Candidate.name).like(func.lower(name_filter))
-        )
-    
-    # 如果提供了学历参数，进行精确匹配
-    if degree and degree.strip():
-        query = query.filter(Candidate.degree == degree.strip())
-    
-    # 获取总数
-    total = query.count()
-    
-    # 分页查询
-    offset = (page - 1) * page_size
-    candidates: List[Candidate] = query.order_by(Candidate.id.desc()).offset(offset).limit(page_size).all()
-    
+    """
+    获取候选人列表，支持按标签、姓名、学历筛选和分页。
+    tag 可以是逗号分隔的多个标签（精确匹配），tag_mode=and 要求全部包含，tag_mode=or 包含任意一个即可。
+    q 为全文检索关键词（空格分隔，需全部命中），结果按相关度排序并附带高亮片段 snippet。
+
+    分页有两种方式：
+    - page：OFFSET 分页，页码越大越慢
+    - after_id / before_id：游标分页，取响应中的 next_cursor / prev_cursor 翻到下一页 / 上一页，
+      按主键定位，任意深度的翻页代价相同（全文检索按相关度排序，不支持游标分页）
+    total 来自总数缓存，同一筛选条件翻页时不会重复 COUNT。
+    DB_ASYNC=1 时查询通过异步会话执行，否则在线程池中执行。
+    """
+    if tag_mode not in TAG_MODES:
+        raise HTTPException(status_code=400, detail="tag_mode 只能是 and 或 or")
+    if after_id is not None and before_id is not None:
+        raise HTTPException(status_code=400, detail="after_id 和 before_id 不能同时使用")
+    cursor_mode = after_id is not None or before_id is not None
+    if cursor_mode and q and q.strip():
+        raise HTTPException(status_code=400, detail="全文检索结果按相关度排序，不支持游标分页")
+    if page < 1 or page_size < 1:
+        raise HTTPException(status_code=400, detail="page 和 page_size 必须大于 0")
+
+    search = q.strip() if q and q.strip() else None
+    return await run_db(
+        db, _candidate_page, split_tags(tag), tag_mode,
+        name.strip() if name else None, degree.strip() if degree else None, search,
+        page, page_size, after_id, before_id,
+    )
+
+
+def _candidate_page(db: Session, tag_names: List[str], tag_mode: str, name: str, degree: str, search: str,
+                    page: int, page_size: int, after_id: int, before_id: int) -> dict:
+    """/candidates 的查询部分（同步代码，由 run_db 在异步会话或线程池中执行）"""
+    query, order_by = build_candidate_query(db, tag_names, tag_mode, name, degree, search)
+
+    # 获取总数（相同筛选条件复用缓存结果）
+    count_key = (tuple(tag_names), tag_mode, name, degree, search)
+    total = count_cache.get_or_compute(count_key, lambda: count_candidates(query))
+
+    candidates, has_prev, has_next = fetch_page(
+        query, order_by, page, page_size, after_id, before_id, with_text=bool(search)
+    )
+
+    # 游标仅在按 id 排序时有意义（全文检索按相关度排序）
+    next_cursor = candidates[-1].id if candidates and has_next and not search else None
+    prev_cursor = candidates[0].id if candidates and has_prev and not search else None
+
     return {
         "total": total,
-        "page": page,
+        "page": None if after_id is not None or before_id is not None else page,
         "page_size": page_size,
         "total_pages": (total + page_size - 1) // page_size,  # 向上取整
+        "next_cursor": next_cursor,
+        "prev_cursor": prev_cursor,
         "data": [
             {
                 "id": c.id,
@@ -564,6 +1378,7 @@ def list_candidates(
                 "notes": c.notes or "",
                 "resume_original_name": c.resume_original_name,
                 "created_at": c.created_at,
+                **({"snippet": highlight_snippet(c.resume_text, search)} if search else {}),
             }
             for c in candidates
         ]
@@ -574,8 +1389,8 @@ def list_candidates(
 def update_candidate_tags(
     candidate_id: int,
     tags: str = Body(..., embed=True, description="标签字符串，多个标签用逗号分隔"),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_write_db),
+    current_user: UserPrincipal = Depends(get_current_user),
 ):
     """更新候选人的标签"""
     candidate = db.query(Candidate).filter(Candidate.id == candidate_id).first()
@@ -583,8 +1398,10 @@ def update_candidate_tags(
         raise HTTPException(status_code=404, detail="候选人不存在")
     
     # 清理标签：去除空格，去重
-    tag_list = [t.strip() for t in tags.split(",") if t.strip()]
-    candidate.tags = ",".join(tag_list)
+    tag_list = split_tags(tags)
+    if any(len(t) > TAG_MAX_LENGTH for t in tag_list):
+        raise HTTPException(status_code=400, detail=f"单个标签不能超过 {TAG_MAX_LENGTH} 个字符")
+    set_candidate_tags(db, candidate, tag_list)
     
     db.commit()
     db.refresh(candidate)
@@ -599,8 +1416,8 @@ def update_candidate_tags(
 def update_candidate_notes(
     candidate_id: int,
     notes: str = Body(..., embed=True, description="备注信息"),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_write_db),
+    current_user: UserPrincipal = Depends(get_current_user),
 ):
     """更新候选人的备注"""
     candidate = db.query(Candidate).filter(Candidate.id == candidate_id).first()
@@ -619,49 +1436,47 @@ def update_candidate_notes(
 
 
 @app.get("/tags", summary="获取所有标签列表")
-def get_all_tags(db: Session = Depends(get_db)):
-    """获取所有候选人的标签列表（去重）"""
-    candidates = db.query(Candidate).filter(Candidate.tags.isnot(None), Candidate.tags != "").all()
-    all_tags = set()
-    for candidate in candidates:
-        if candidate.tags:
-            tags = [t.strip() for t in candidate.tags.split(",") if t.strip()]
-            all_tags.update(tags)
-    return sorted(list(all_tags))
+async def get_all_tags(with_counts: bool = False, db=Depends(get_read_db)):
+    """
+    获取所有候选人的标签列表（去重，按名称排序）。
+    with_counts=true 时返回 [{"name": 标签, "count": 候选人数}]，否则只返回标签名列表。
+    """
+    counts = await run_db(db, tag_counts)
+    if with_counts:
+        return counts
+    return [item["name"] for item in counts]
 
 
 @app.delete("/candidates/{candidate_id}", summary="删除候选人")
 def delete_candidate(
     candidate_id: int, 
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: Session = Depends(get_write_db),
+    current_user: UserPrincipal = Depends(get_current_user)
 ):
-    """删除候选人及其关联的简历文件"""
+    """删除候选人；关联的简历文件没有其它候选人引用时一并删除"""
     candidate = db.query(Candidate).filter(Candidate.id == candidate_id).first()
     if not candidate:
         raise HTTPException(status_code=404, detail="候选人不存在")
-    
-    # 删除关联的简历文件（如果存在）
     resume_path = candidate.resume_path
-    if resume_path and os.path.exists(resume_path):
-        try:
-            # 排除特殊标记路径（如 "(from_text)"）
-            if not resume_path.startswith("(") and not resume_path.endswith(")"):
-                os.remove(resume_path)
-                print(f"已删除简历文件: {resume_path}")
-        except Exception as e:
-            # 文件删除失败不影响数据库删除，只记录警告
-            print(f"删除简历文件失败: {e}")
-    
+
     # 删除数据库记录
     try:
         db.delete(candidate)
         db.commit()
-        return {
-            "message": "候选人删除成功",
-            "id": candidate_id
-        }
     except Exception as e:
         db.rollback()
         error_msg = str(e).encode('utf-8', errors='replace').decode('utf-8')
-        raise HTTPException(status_code=500, detail=f"删除失败: {error_msg}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"删除失败: {error_msg}")
+
+    # 文件按内容寻址，同一文件可能被多个候选人引用：提交后再统计引用，无人引用时才删除
+    # （排除 "(from_text)" 等特殊标记；仍被引用或刚被重新上传的文件保留，后者由孤儿清理删除）
+    try:
+        if delete_if_unused(resume_path, _referenced_upload_names):
+            print(f"已删除简历文件: {resume_path}")
+    except Exception as e:
+        # 文件删除失败不影响数据库删除，只记录警告
+        print(f"删除简历文件失败: {e}")
+    return {
+        "message": "候选人删除成功",
+        "id": candidate_id
+    }
\ No newline at end of file
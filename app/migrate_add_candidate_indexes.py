@@ -0,0 +1,34 @@
+"""
+数据库迁移：为 /candidates 的筛选条件补充索引
+- ix_candidates_degree_id：学历筛选 + 按 id 倒序分页
+- candidate_names_fts：姓名按字符建立的全文索引，用于姓名子串检索
+"""
+from sqlalchemy import inspect, text
+from database import engine
+from search import NAME_FTS_TABLE, create_name_fts_table, index_name
+
+def migrate_add_candidate_indexes(conn):
+    """创建缺失的索引，并为已有候选人建立姓名索引"""
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_candidates_degree_id ON candidates (degree, id)"))
+
+    if conn.dialect.name != "sqlite":
+        print("非 SQLite 数据库，不创建姓名索引表，姓名检索使用 LIKE 查询")
+        return
+    if inspect(conn).has_table(NAME_FTS_TABLE):
+        print(f"{NAME_FTS_TABLE} 已存在，无需迁移")
+        return
+
+    try:
+        create_name_fts_table(conn)
+    except Exception as e:
+        print(f"当前 SQLite 不支持 FTS5，姓名检索将使用 LIKE 查询: {e}")
+        return
+
+    rows = conn.execute(text("SELECT id, name FROM candidates")).fetchall()
+    for candidate_id, name in rows:
+        index_name(conn, candidate_id, name)
+    print(f"{NAME_FTS_TABLE} 创建成功，已索引 {len(rows)} 位候选人")
+
+if __name__ == "__main__":
+    with engine.begin() as conn:  # 使用 begin() 自动管理事务
+        migrate_add_candidate_indexes(conn)
@@ -0,0 +1,28 @@
+"""
+数据库迁移：添加 content_hash（文件内容 SHA-256）字段
+"""
+from sqlalchemy import inspect, text
+from database import engine
+
+def migrate_add_content_hash_field(conn):
+    """
+    为 candidates 和 ingest_jobs 表添加 content_hash 字段，并为 candidates.content_hash 建索引
+    """
+    for table in ("candidates", "ingest_jobs"):
+        # 检查字段是否已存在
+        columns = [column["name"] for column in inspect(conn).get_columns(table)]
+
+        if 'content_hash' not in columns:
+            print(f"正在为 {table} 添加 content_hash 字段...")
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN content_hash VARCHAR(64)"))
+            print(f"{table}.content_hash 字段添加成功！")
+        else:
+            print(f"{table}.content_hash 字段已存在，无需迁移")
+
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_candidates_content_hash ON candidates (content_hash)"
+    ))
+
+if __name__ == "__main__":
+    with engine.begin() as conn:  # 使用 begin() 自动管理事务
+        migrate_add_content_hash_field(conn)
@@ -0,0 +1,47 @@
+"""
+数据库迁移：添加重复检测所需的字段和索引
+- candidates.phone_normalized / email_normalized：规范化后的手机号和邮箱（带索引），并为已有候选人回填
+- ingest_jobs.dedup_mode：异步入库任务发现重复时的处理方式
+"""
+from sqlalchemy import inspect, text
+from database import engine
+from normalize import normalize_phone, normalize_email
+
+BACKFILL_BATCH_SIZE = 1000
+
+def migrate_add_dedup_fields(conn):
+    """添加缺失的字段和索引，回填规范化的联系方式"""
+    for table, column, ddl in (
+        ("candidates", "phone_normalized", "VARCHAR(32)"),
+        ("candidates", "email_normalized", "VARCHAR"),
+        ("ingest_jobs", "dedup_mode", "VARCHAR(8)"),
+    ):
+        # 检查字段是否已存在
+        columns = [c["name"] for c in inspect(conn).get_columns(table)]
+        if column not in columns:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+            print(f"{table}.{column} 字段添加成功！")
+        else:
+            print(f"{table}.{column} 字段已存在，无需迁移")
+
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_candidates_phone_normalized ON candidates (phone_normalized)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_candidates_email_normalized ON candidates (email_normalized)"))
+
+    rows = conn.execute(text(
+        "SELECT id, phone, email FROM candidates"
+        " WHERE (phone IS NOT NULL AND phone_normalized IS NULL) OR (email IS NOT NULL AND email_normalized IS NULL)"
+    )).fetchall()
+    params = [
+        {"id": candidate_id, "phone": normalize_phone(phone), "email": normalize_email(email)}
+        for candidate_id, phone, email in rows
+    ]
+    for start in range(0, len(params), BACKFILL_BATCH_SIZE):
+        conn.execute(
+            text("UPDATE candidates SET phone_normalized = :phone, email_normalized = :email WHERE id = :id"),
+            params[start:start + BACKFILL_BATCH_SIZE],
+        )
+    print(f"已回填 {len(params)} 位候选人的规范化联系方式")
+
+if __name__ == "__main__":
+    with engine.begin() as conn:  # 使用 begin() 自动管理事务
+        migrate_add_dedup_fields(conn)
@@ -0,0 +1,22 @@
+"""
+数据库迁移：添加 candidates.external_id 字段
+调用方提供的外部 ID（如爬虫的原始页面 ID），/upload-text/batch 据此保证重复提交不会重复入库；
+唯一索引允许多个 NULL（SQLite 和 PostgreSQL 都是如此）。
+"""
+from sqlalchemy import inspect, text
+from database import engine
+
+def migrate_add_external_id_field(conn):
+    """添加 external_id 字段和唯一索引"""
+    # 检查字段是否已存在
+    columns = [c["name"] for c in inspect(conn).get_columns("candidates")]
+    if "external_id" not in columns:
+        conn.execute(text("ALTER TABLE candidates ADD COLUMN external_id VARCHAR(200)"))
+        print("candidates.external_id 字段添加成功！")
+    else:
+        print("candidates.external_id 字段已存在，无需迁移")
+    conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS ix_candidates_external_id ON candidates (external_id)"))
+
+if __name__ == "__main__":
+    with engine.begin() as conn:  # 使用 begin() 自动管理事务
+        migrate_add_external_id_field(conn)
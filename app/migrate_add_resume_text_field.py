@@ -0,0 +1,50 @@
+"""
+数据库迁移：添加 resume_text（简历全文）字段，并创建全文检索表 candidates_fts
+"""
+from sqlalchemy import inspect, text
+from database import engine
+from search import FTS_TABLE, create_fts_table, index_row
+
+def migrate_add_resume_text_field(conn):
+    """
+    为 candidates 表添加 resume_text / resume_text_complete 字段；
+    SQLite 支持 FTS5 时创建 candidates_fts，并为已有候选人建立索引。
+    已有记录此时还没有全文，只索引姓名和标签，全文由后台补全任务提取后自动写入索引
+    """
+    # 检查字段是否已存在
+    columns = [column["name"] for column in inspect(conn).get_columns("candidates")]
+
+    for column, ddl in (("resume_text", "TEXT"), ("resume_text_complete", "BOOLEAN")):
+        if column not in columns:
+            print(f"正在添加 {column} 字段...")
+            conn.execute(text(f"ALTER TABLE candidates ADD COLUMN {column} {ddl}"))
+            print(f"{column} 字段添加成功！")
+            if column == "resume_text_complete":
+                # 已有的文件简历标记为未补全，启动后由后台任务重新提取全文
+                conn.execute(text(
+                    "UPDATE candidates SET resume_text_complete = :incomplete WHERE resume_path != '(from_text)'"
+                ), {"incomplete": False})
+        else:
+            print(f"{column} 字段已存在，无需迁移")
+
+    if conn.dialect.name != "sqlite":
+        print("非 SQLite 数据库，不创建 FTS5 全文索引，全文检索使用 LIKE 查询")
+        return
+    if inspect(conn).has_table(FTS_TABLE):
+        print(f"{FTS_TABLE} 已存在，无需迁移")
+        return
+
+    try:
+        create_fts_table(conn)
+    except Exception as e:
+        print(f"当前 SQLite 不支持 FTS5，全文检索将使用 LIKE 查询: {e}")
+        return
+
+    rows = conn.execute(text("SELECT id, name, tags, resume_text FROM candidates")).fetchall()
+    for candidate_id, name, tags, body in rows:
+        index_row(conn, candidate_id, name, tags, body)
+    print(f"{FTS_TABLE} 创建成功，已索引 {len(rows)} 位候选人")
+
+if __name__ == "__main__":
+    with engine.begin() as conn:  # 使用 begin() 自动管理事务
+        migrate_add_resume_text_field(conn)
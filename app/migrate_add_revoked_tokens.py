@@ -0,0 +1,14 @@
+"""
+数据库迁移：创建 revoked_tokens（已注销 token）表
+"""
+from database import engine
+from models import RevokedToken
+
+def migrate_add_revoked_tokens(conn):
+    """创建 revoked_tokens 表（已存在时跳过）"""
+    RevokedToken.__table__.create(conn, checkfirst=True)
+    print("revoked_tokens 表已就绪")
+
+if __name__ == "__main__":
+    with engine.begin() as conn:  # 使用 begin() 自动管理事务
+        migrate_add_revoked_tokens(conn)
@@ -0,0 +1,17 @@
+"""
+数据库迁移：为存储键补充索引
+文件按内容寻址保存后，多个候选人可能共用同一个文件；删除候选人和清理孤儿文件时按键统计引用：
+- ix_candidates_resume_filename
+- ix_ingest_jobs_stored_name
+"""
+from sqlalchemy import text
+from database import engine
+
+def migrate_add_storage_key_indexes(conn):
+    """创建缺失的索引"""
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_candidates_resume_filename ON candidates (resume_filename)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_ingest_jobs_stored_name ON ingest_jobs (stored_name)"))
+
+if __name__ == "__main__":
+    with engine.begin() as conn:  # 使用 begin() 自动管理事务
+        migrate_add_storage_key_indexes(conn)
@@ -0,0 +1,44 @@
+"""
+数据库迁移：把 candidates.tags 中逗号分隔的标签拆分写入 tags / candidate_tags 表
+（两张表本身由 migrations.py 中的第 1 个迁移创建）
+"""
+from sqlalchemy import text
+from database import engine
+from tagging import split_tags
+
+def migrate_add_tag_tables(conn):
+    """关联表为空且存在带标签的候选人时，从 tags 字段回填关联表"""
+    if conn.execute(text("SELECT 1 FROM candidate_tags LIMIT 1")).first():
+        print("candidate_tags 已有数据，无需迁移")
+        return
+
+    rows = conn.execute(
+        text("SELECT id, tags FROM candidates WHERE tags IS NOT NULL AND tags != ''")
+    ).fetchall()
+    if not rows:
+        print("没有需要迁移的标签")
+        return
+
+    print(f"正在迁移 {len(rows)} 位候选人的标签...")
+    parsed = [(candidate_id, split_tags(tags)) for candidate_id, tags in rows]
+    existing = {name for name, in conn.execute(text("SELECT name FROM tags"))}
+    names = sorted({name for _, tag_list in parsed for name in tag_list} - existing)
+    if names:
+        conn.execute(text("INSERT INTO tags (name) VALUES (:name)"), [{"name": n} for n in names])
+    tag_ids = {name: tag_id for tag_id, name in conn.execute(text("SELECT id, name FROM tags"))}
+
+    links = [
+        {"candidate_id": candidate_id, "tag_id": tag_ids[name]}
+        for candidate_id, tag_list in parsed
+        for name in tag_list
+    ]
+    if links:
+        conn.execute(
+            text("INSERT INTO candidate_tags (candidate_id, tag_id) VALUES (:candidate_id, :tag_id)"),
+            links,
+        )
+    print(f"标签迁移完成：{len(tag_ids)} 个标签，{len(links)} 条关联")
+
+if __name__ == "__main__":
+    with engine.begin() as conn:  # 使用 begin() 自动管理事务
+        migrate_add_tag_tables(conn)
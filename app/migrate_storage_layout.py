@@ -0,0 +1,66 @@
+"""
+迁移脚本：把早期平铺在上传目录下的简历文件（uploads/<uuid>.pdf）移入按内容寻址的存储（ab/cd/<sha256>.pdf）
+
+新上传的文件已经按内容寻址保存，早期文件仍可按原路径读取；此脚本用于一次性整理旧文件，
+内容相同的文件合并为一份。STORAGE_BACKEND=s3 时文件上传到 S3 并删除本地副本。
+运行: python migrate_storage_layout.py [--apply]
+不带参数时只统计需要迁移的文件数量。
+"""
+import argparse
+import os
+import shutil
+
+from database import WriteSessionLocal
+from models import Candidate, IngestJob
+from storage import blob_key, blob_store, file_sha256, is_blob_location, is_remote, local_store, new_staging_path
+
+
+def _legacy_candidates(db):
+    """resume_filename 不含 / 的本地文件记录（纯文本导入的候选人除外）"""
+    rows = db.query(Candidate).filter(~Candidate.resume_filename.contains("/")).all()
+    return [c for c in rows if is_blob_location(c.resume_path) and not is_remote(c.resume_path)]
+
+
+def migrate_storage_layout(apply: bool = False):
+    """统计（apply=True 时迁移）平铺存放的旧文件"""
+    db = WriteSessionLocal()
+    try:
+        candidates = _legacy_candidates(db)
+        print(f"共 {len(candidates)} 份简历文件需要迁移到分片目录")
+        if not candidates or not apply:
+            return
+
+        moved = missing = 0
+        for candidate in candidates:
+            path = candidate.resume_path
+            if not os.path.exists(path):
+                missing += 1
+                print(f"文件不存在，跳过候选人 {candidate.id}: {path}")
+                continue
+            content_hash = candidate.content_hash or file_sha256(path)
+            ext = os.path.splitext(path)[1]
+            key = blob_key(content_hash, ext)
+            # 复制一份放入存储，写库成功后才删除旧文件，中途失败时旧记录仍然可用
+            staging_path = new_staging_path(ext)
+            shutil.copyfile(path, staging_path)
+            location = blob_store.put(staging_path, key)
+
+            old_name = candidate.resume_filename
+            candidate.resume_filename = key
+            candidate.resume_path = location
+            candidate.content_hash = content_hash
+            db.query(IngestJob).filter(IngestJob.stored_name == old_name).update(
+                {"stored_name": key, "file_path": location}, synchronize_session=False
+            )
+            db.commit()
+            os.remove(path)
+            moved += 1
+        print(f"已迁移 {moved} 份，缺失 {missing} 份；存储位置：{local_store.root if blob_store is local_store else 'S3'}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="把平铺存放的旧简历文件移入按内容寻址的分片目录")
+    ap.add_argument("--apply", action="store_true", help="执行迁移（默认只统计）")
+    migrate_storage_layout(ap.parse_args().apply)
@@ -1,26 +1,39 @@
 """
-迁移脚本：更新 users 表的 password_hash 字段长度
+迁移脚本：把 users 表中以明文存储的密码改为 bcrypt 哈希
+
+明文密码在用户下次登录成功时会自动改为哈希；此脚本用于一次性转换所有剩余的明文密码。
+运行: python migrate_user_password_hash.py [--rehash]
+不带参数时只统计明文密码的数量。
 """
-from sqlalchemy import text
+import argparse
+from sqlalchemy import inspect, text
 from database import engine
+from auth import get_password_hash, is_password_hashed
 
-def migrate_user_password_hash():
-    """检查并更新 password_hash 字段长度"""
+def migrate_user_password_hash(rehash: bool = False):
+    """统计（rehash=True 时转换）以明文存储的密码"""
     with engine.begin() as conn:
-        # SQLite 不支持直接修改列类型，需要重建表
-        # 但为了安全，我们只检查字段是否存在
-        result = conn.execute(text("PRAGMA table_info(users)"))
-        columns = [row[1] for row in result]
-        
-        if 'password_hash' in columns:
-            print("password_hash 字段已存在")
-            # SQLite 中 String 类型没有长度限制，所以不需要迁移
-            # 但如果将来迁移到其他数据库，需要确保字段长度足够
-            print("注意：SQLite 中 String 类型没有长度限制")
-            print("bcrypt 哈希通常是 60 字符，当前字段可以存储")
-        else:
+        # 检查字段是否存在
+        columns = [column["name"] for column in inspect(conn).get_columns("users")]
+
+        if 'password_hash' not in columns:
             print("password_hash 字段不存在，需要创建表")
+            return
 
-if __name__ == "__main__":
-    migrate_user_password_hash()
+        rows = conn.execute(text("SELECT id, username, password_hash FROM users")).fetchall()
+        plaintext = [(user_id, username, stored) for user_id, username, stored in rows if not is_password_hashed(stored)]
+        print(f"共 {len(rows)} 个用户，其中 {len(plaintext)} 个密码以明文存储")
+        if not plaintext or not rehash:
+            return
 
+        for user_id, username, stored in plaintext:
+            conn.execute(
+                text("UPDATE users SET password_hash = :password_hash WHERE id = :id"),
+                {"password_hash": get_password_hash(stored), "id": user_id},
+            )
+            print(f"已转换用户 {username}")
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="把明文密码转换为 bcrypt 哈希")
+    ap.add_argument("--rehash", action="store_true", help="转换所有明文密码（默认只统计）")
+    migrate_user_password_hash(ap.parse_args().rehash)
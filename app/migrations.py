@@ -0,0 +1,186 @@
+"""
+数据库结构版本管理：按版本号顺序执行迁移，已执行的版本记录在 schema_version 表中，每个迁移只执行一次。
+
+以前每个 uvicorn worker 启动时都会依次检查所有字段和索引，冷启动变慢，多个 worker 同时启动时还会并发执行 DDL。
+现在部署时运行一次：
+
+    python migrations.py upgrade      # 执行所有未执行的迁移
+    python migrations.py status       # 查看当前版本和待执行的迁移
+
+worker 启动时只查询一次 schema_version，版本落后时打印提示，不做任何 DDL。
+设置 DB_MIGRATE_ON_STARTUP=1 时由 worker 启动时自行执行 upgrade：执行前先加锁
+（SQLite 为数据库文件旁的文件锁，PostgreSQL 为 advisory lock），同时启动的其它 worker 等待锁释放后发现已是最新版本，直接跳过。
+
+新增表、字段、索引时在 MIGRATIONS 末尾追加新版本，不要修改已发布的迁移。每个迁移和它的版本记录在同一个事务中提交，
+迁移函数接收数据库连接，应当可以重复执行（先检查再修改），以便对版本表出现之前的旧数据库补齐版本记录。
+
+配置（环境变量）：
+- DB_MIGRATE_ON_STARTUP：worker 启动时是否自动执行迁移，默认 0
+"""
+import argparse
+import contextlib
+import os
+import sys
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, select, text
+
+from database import Base, engine
+from migrate import migrate_add_tags_field
+from migrate_add_notes_field import migrate_add_notes_field
+from migrate_add_content_hash_field import migrate_add_content_hash_field
+from migrate_add_resume_text_field import migrate_add_resume_text_field
+from migrate_add_tag_tables import migrate_add_tag_tables
+from migrate_add_candidate_indexes import migrate_add_candidate_indexes
+from migrate_add_revoked_tokens import migrate_add_revoked_tokens
+from migrate_add_storage_key_indexes import migrate_add_storage_key_indexes
+from migrate_add_dedup_fields import migrate_add_dedup_fields
+from migrate_add_external_id_field import migrate_add_external_id_field
+
+DB_MIGRATE_ON_STARTUP = os.getenv("DB_MIGRATE_ON_STARTUP", "0") == "1"
+
+# PostgreSQL advisory lock 的键，任意固定整数
+PG_LOCK_KEY = 724_110_015
+
+schema_version = Table(
+    "schema_version",
+    MetaData(),
+    Column("version", Integer, primary_key=True),
+    Column("name", String(200), nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+def create_base_tables(conn):
+    """按当前模型创建缺失的表（已存在的表不做修改）"""
+    import models  # noqa: F401  注册所有模型
+
+    Base.metadata.create_all(bind=conn)
+
+
+# (版本号, 说明, 迁移函数)，版本号递增
+MIGRATIONS = [
+    (1, "创建基础表", create_base_tables),
+    (2, "candidates.tags 字段", migrate_add_tags_field),
+    (3, "candidates.notes 字段", migrate_add_notes_field),
+    (4, "content_hash 字段", migrate_add_content_hash_field),
+    (5, "resume_text 字段和全文检索表", migrate_add_resume_text_field),
+    (6, "标签关联表回填", migrate_add_tag_tables),
+    (7, "候选人筛选索引", migrate_add_candidate_indexes),
+    (8, "已注销 token 表", migrate_add_revoked_tokens),
+    (9, "存储键索引", migrate_add_storage_key_indexes),
+    (10, "重复检测字段", migrate_add_dedup_fields),
+    (11, "candidates.external_id 字段", migrate_add_external_id_field),
+]
+
+
+def current_version(conn) -> int:
+    """已执行到的版本号；版本表不存在时为 0"""
+    if not inspect(conn).has_table(schema_version.name):
+        return 0
+    return conn.execute(select(schema_version.c.version).order_by(schema_version.c.version.desc())).scalar() or 0
+
+
+def pending_migrations(bind=engine) -> List[Tuple[int, str]]:
+    """尚未执行的迁移 [(版本号, 说明)]"""
+    with bind.connect() as conn:
+        version = current_version(conn)
+    return [(v, name) for v, name, _ in MIGRATIONS if v > version]
+
+
+@contextlib.contextmanager
+def migration_lock(bind=engine):
+    """
+    跨进程的迁移锁，同一时间只有一个进程执行迁移。
+    SQLite 使用数据库文件旁的 .migrate.lock 文件锁（只在同一台机器上有效，SQLite 本身也只能本机共享）；
+    PostgreSQL 使用 pg_advisory_lock，连接断开时自动释放。
+    """
+    if bind.dialect.name == "postgresql":
+        with bind.connect() as conn:
+            conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": PG_LOCK_KEY})
+            conn.commit()
+            try:
+                yield
+            finally:
+                conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": PG_LOCK_KEY})
+                conn.commit()
+        return
+
+    database = bind.url.database
+    if bind.dialect.name != "sqlite" or not database or database == ":memory:":
+        yield
+        return
+    try:
+        import fcntl
+    except ImportError:  # Windows 上没有 fcntl，开发环境通常只有一个进程
+        yield
+        return
+    with open(os.path.abspath(database) + ".migrate.lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def upgrade(bind=engine, target: Optional[int] = None) -> int:
+    """加锁后依次执行未执行的迁移（直到 target 版本），返回执行的迁移数"""
+    applied = 0
+    with migration_lock(bind):
+        with bind.begin() as conn:
+            schema_version.create(conn, checkfirst=True)
+            version = current_version(conn)
+        for number, name, migrate in MIGRATIONS:
+            if number <= version or (target is not None and number > target):
+                continue
+            print(f"执行迁移 {number}：{name}")
+            with bind.begin() as conn:
+                migrate(conn)
+                conn.execute(schema_version.insert().values(
+                    version=number, name=name, applied_at=datetime.utcnow()
+                ))
+            applied += 1
+    return applied
+
+
+def check_on_startup():
+    """worker 启动时调用：DB_MIGRATE_ON_STARTUP=1 时执行迁移，否则只检查版本"""
+    if DB_MIGRATE_ON_STARTUP:
+        applied = upgrade()
+        if applied:
+            print(f"数据库迁移完成，执行了 {applied} 个迁移")
+        return
+    pending = pending_migrations()
+    if pending:
+        print(
+            f"数据库结构版本落后，有 {len(pending)} 个迁移未执行（最新为 {pending[-1][0]}）。"
+            f"请运行 python migrations.py upgrade，或设置 DB_MIGRATE_ON_STARTUP=1"
+        )
+
+
+def main():
+    ap = argparse.ArgumentParser(description="数据库结构迁移")
+    sub = ap.add_subparsers(dest="command")
+    up = sub.add_parser("upgrade", help="执行所有未执行的迁移")
+    up.add_argument("--to", type=int, dest="target", help="只迁移到指定版本")
+    sub.add_parser("status", help="查看当前版本和待执行的迁移")
+    args = ap.parse_args()
+
+    if args.command == "upgrade":
+        applied = upgrade(target=args.target)
+        print(f"执行了 {applied} 个迁移" if applied else "数据库已是最新版本")
+        return
+
+    if args.command != "status":
+        ap.print_help()
+        sys.exit(1)
+    with engine.connect() as conn:
+        version = current_version(conn)
+    print(f"当前版本：{version}")
+    for number, name in pending_migrations():
+        print(f"  待执行 {number}：{name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,10 @@
-from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, ForeignKey, Index
+from sqlalchemy.orm import deferred, relationship, validates
 from sqlalchemy.sql import func
 from database import Base
+from normalize import normalize_phone, normalize_email
+from search import register_index_events
+from count_cache import register_invalidation
 
 
 class Candidate(Base):
@@ -15,19 +19,115 @@ class Candidate(Base):
     university = Column(String, index=True, nullable=True)
     degree = Column(String, nullable=True)
     major = Column(String, nullable=True)
+    # 规范化后的手机号和邮箱，用于重复检测（由 phone / email 赋值时自动维护）；不加唯一约束，
+    # 允许显式选择仍然新建（dedup=force）以及历史数据中已有的重复
+    phone_normalized = Column(String(32), index=True, nullable=True)
+    email_normalized = Column(String, index=True, nullable=True)
 
     # 文件相关
-    resume_filename = Column(String, nullable=False)  # 存在服务器上的文件名
+    resume_filename = Column(String, index=True, nullable=False)  # 存储键（ab/cd/<sha256>.pdf，早期为上传目录下的文件名）
     resume_original_name = Column(String, nullable=False)  # 原始上传文件名
-    resume_path = Column(String, nullable=False)  # 文件路径
+    resume_path = Column(String, nullable=False)  # 文件位置（本地路径或 s3://...）
+    content_hash = Column(String(64), index=True, nullable=True)  # 文件内容 SHA-256（纯文本导入为空）
+    # 调用方提供的外部 ID（/upload-text/batch），重复提交同一 ID 时返回已有候选人
+    external_id = Column(String(200), unique=True, index=True, nullable=True)
 
-    # 标签（逗号分隔的字符串，如："前端,React,3年经验"）
+    # 标签（逗号分隔的字符串，如："前端,React,3年经验"），用于展示；
+    # 筛选和统计使用 tags / candidate_tags 表，两者由 tagging.set_candidate_tags 同步维护
     tags = Column(String, nullable=True, default="")
+    tag_items = relationship("Tag", secondary="candidate_tags", order_by="Tag.name")
 
     # 备注
     notes = Column(String, nullable=True, default="")
 
+    # 简历全文（用于全文检索）；延迟加载，列表查询不会读取这一大字段
+    resume_text = deferred(Column(Text, nullable=True))
+    # resume_text 是否为全文：PDF 提前结束提取时只有前几页，后台补全后置为 True
+    resume_text_complete = Column(Boolean, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        # 按学历筛选并按 id 倒序分页
+        Index("ix_candidates_degree_id", "degree", "id"),
+    )
+
+    @validates("phone")
+    def _normalize_phone(self, key, value):
+        self.phone_normalized = normalize_phone(value)
+        return value
+
+    @validates("email")
+    def _normalize_email(self, key, value):
+        self.email_normalized = normalize_email(value)
+        return value
+
+    @classmethod
+    def from_parsed(cls, parsed: dict, resume_filename: str, resume_original_name: str, resume_path: str,
+                    content_hash: str = None, external_id: str = None):
+        """根据解析结果构造候选人对象（未加入会话）"""
+        return cls(
+            name=parsed.get("name"),
+            email=parsed.get("email"),
+            phone=parsed.get("phone"),
+            university=parsed.get("university"),
+            degree=parsed.get("degree"),
+            major=parsed.get("major"),
+            resume_filename=resume_filename,
+            resume_original_name=resume_original_name,
+            resume_path=resume_path,
+            content_hash=content_hash,
+            external_id=external_id,
+            resume_text=parsed.get("text"),
+            resume_text_complete=parsed.get("text_complete"),
+        )
+
+
+register_index_events(Candidate)
+register_invalidation(Candidate)
+
+
+class Tag(Base):
+    __tablename__ = "tags"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String(100), unique=True, nullable=False)
+
+
+class CandidateTag(Base):
+    """候选人与标签的关联；(tag_id, candidate_id) 索引用于按标签筛选和统计数量"""
+    __tablename__ = "candidate_tags"
+
+    candidate_id = Column(Integer, ForeignKey("candidates.id", ondelete="CASCADE"), primary_key=True)
+    tag_id = Column(Integer, ForeignKey("tags.id", ondelete="CASCADE"), primary_key=True)
+
+    __table_args__ = (
+        Index("ix_candidate_tags_tag_id", "tag_id", "candidate_id"),
+    )
+
+
+class IngestJob(Base):
+    """异步入库任务：/upload 的异步模式下，文件先落盘并登记任务，由后台 worker 解析并入库"""
+    __tablename__ = "ingest_jobs"
+
+    id = Column(String(32), primary_key=True)  # uuid4 hex
+    # pending -> running -> done / failed
+    status = Column(String(16), index=True, nullable=False, default="pending")
+    progress = Column(Integer, nullable=False, default=0)  # 0-100
+    stage = Column(String(32), nullable=True)  # 当前阶段说明：queued / parsing / saving / done / duplicate
+
+    stored_name = Column(String, index=True, nullable=False)  # 存储键，同 candidates.resume_filename
+    original_name = Column(String, nullable=False)
+    file_path = Column(String, nullable=False)
+    content_hash = Column(String(64), nullable=True)
+    dedup_mode = Column(String(8), nullable=True)  # 发现重复时的处理方式（见 dedup.DEDUP_MODES）
+
+    candidate_id = Column(Integer, nullable=True)  # 新建的候选人，或重复时已有的候选人
+    error = Column(String, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), nullable=True)
 
 
 class User(Base):
@@ -38,3 +138,11 @@ class User(Base):
     password_hash = Column(String(255), nullable=False)  # 存储密码哈希（bcrypt哈希通常是60字符，255足够）
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     last_login = Column(DateTime(timezone=True), nullable=True)
+
+
+class RevokedToken(Base):
+    """已注销的 token（按 SHA-256 存储，不保存 token 原文），过期后可删除"""
+    __tablename__ = "revoked_tokens"
+
+    token_hash = Column(String(64), primary_key=True)
+    expires_at = Column(DateTime, nullable=False, index=True)
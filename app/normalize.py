@@ -0,0 +1,30 @@
+"""
+联系方式规范化：用于重复候选人检测（candidates.phone_normalized / email_normalized）。
+同一个人在不同简历里的写法常常不同（"+86 138-1234-5678"、"13812345678"；"ZhangSan@Example.com "），
+规范化后按等值查询即可命中索引，不需要逐行比较。
+"""
+import re
+from typing import Optional
+
+_NON_DIGITS = re.compile(r"\D")
+PHONE_MIN_DIGITS = 7  # 少于该位数的视为无效号码（解析误识别的片段），不参与去重
+
+
+def normalize_phone(phone: Optional[str]) -> Optional[str]:
+    """只保留数字并去掉中国大陆国家码（+86 / 0086）；无效时返回 None"""
+    if not phone:
+        return None
+    digits = _NON_DIGITS.sub("", phone)
+    if digits.startswith("0086"):
+        digits = digits[4:]
+    elif digits.startswith("86") and len(digits) == 13:
+        digits = digits[2:]
+    return digits if len(digits) >= PHONE_MIN_DIGITS else None
+
+
+def normalize_email(email: Optional[str]) -> Optional[str]:
+    """去除空白并转为小写；不含 @ 时返回 None"""
+    if not email:
+        return None
+    email = email.strip().lower()
+    return email if "@" in email else None
@@ -0,0 +1,116 @@
+"""
+简历解析服务：把 CPU 密集的 parse_resume_file（pdfplumber / python-docx）放到进程池中执行，
+避免解析大文件时阻塞 uvicorn 的事件循环（登录、列表等请求不再被卡住）。
+
+配置（环境变量）：
+- PARSE_WORKERS：进程池大小，默认 CPU 核数
+- PARSE_QUEUE_SIZE：所有进程都忙时允许排队等待的任务数，默认 16
+- PARSE_TIMEOUT：单个解析任务的超时时间（秒），默认 60
+"""
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from parser import parse_resume_file, parse_cache, PARSE_CACHE_ENABLED
+
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", str(os.cpu_count() or 1)))
+PARSE_QUEUE_SIZE = int(os.getenv("PARSE_QUEUE_SIZE", "16"))
+PARSE_TIMEOUT = float(os.getenv("PARSE_TIMEOUT", "60"))
+
+
+class ParseServiceBusy(Exception):
+    """解析队列已满，调用方应稍后重试（HTTP 503）"""
+
+
+class ParseTimeout(Exception):
+    """解析任务超时（HTTP 503）"""
+
+
+class ParseService:
+    """
+    基于 ProcessPoolExecutor 的有界解析服务。
+
+    同时在途（执行中 + 排队中）的任务数不超过 max_workers + max_queue，
+    超出时直接抛出 ParseServiceBusy，而不是无限堆积在内存里。
+    注意：超时的任务无法从工作进程中强行取消，它仍然占用名额直到真正结束，
+    这样背压统计才是真实的。
+    """
+
+    def __init__(self, max_workers: int = PARSE_WORKERS, max_queue: int = PARSE_QUEUE_SIZE,
+                 timeout: float = PARSE_TIMEOUT):
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self.timeout = timeout
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._in_flight = 0
+
+    @property
+    def capacity(self) -> int:
+        return self.max_workers + self.max_queue
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def start(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def _release(self, _future):
+        self._in_flight -= 1
+
+    async def run(self, func, *args):
+        """在进程池中执行 func(*args)，受队列容量和超时限制。"""
+        if self._in_flight >= self.capacity:
+            raise ParseServiceBusy("解析服务繁忙，请稍后重试")
+        self.start()
+
+        loop = asyncio.get_running_loop()
+        try:
+            future = loop.run_in_executor(self._executor, func, *args)
+        except BrokenProcessPool:
+            # 工作进程异常退出（如被 OOM kill），重建进程池后再提交一次
+            self._executor = None
+            self.start()
+            future = loop.run_in_executor(self._executor, func, *args)
+
+        self._in_flight += 1
+        future.add_done_callback(self._release)
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            raise ParseTimeout(f"解析超时（超过 {self.timeout:g} 秒）")
+
+    async def parse_file(self, path: str, content_hash: Optional[str] = None) -> Dict[str, Optional[str]]:
+        """
+        异步解析简历文件（PDF / DOCX），结果中包含提取出的全文（"text" 字段）。
+        提供 content_hash 时先查解析缓存，命中则不占用解析进程。
+        """
+        use_cache = bool(content_hash) and PARSE_CACHE_ENABLED
+        if use_cache:
+            cached = await run_in_threadpool(parse_cache.get, content_hash)
+            if cached is not None:
+                return cached
+        parsed = await self.run(parse_resume_file, path, True)
+        if use_cache:
+            await run_in_threadpool(parse_cache.put, content_hash, parsed)
+        return parsed
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "workers": self.max_workers,
+            "queue_size": self.max_queue,
+            "in_flight": self._in_flight,
+        }
+
+
+parse_service = ParseService()
@@ -1,6 +1,12 @@
+import hashlib
+import json
+import os
 import re
+import sqlite3
 import sys
-from typing import Dict, Optional
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
 
 import pdfplumber
 from docx import Document
@@ -11,27 +17,146 @@ if sys.platform == 'win32':
     sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
     sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
 
+PHONE_PATTERN = re.compile(r"1[3-9]\d{9}")
+EMAIL_PATTERN = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}")
 
-def extract_text_from_pdf(pdf_path: str) -> str:
-    """从 PDF 中提取全部文字。"""
+
+# PDF 提取配置（环境变量）：
+# - PDF_MAX_PAGES：最多提取的页数，0 表示不限制
+# - PDF_EARLY_EXIT：只需要字段时，找齐姓名/联系方式/教育经历后停止读取后续页
+# - PDF_PAGE_WORKERS：长 PDF 全文提取时按页分片并行的进程数，0 表示不并行
+# - PDF_PARALLEL_MIN_PAGES：达到该页数才启用并行
+PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", "50"))
+PDF_EARLY_EXIT = os.getenv("PDF_EARLY_EXIT", "1") == "1"
+PDF_PAGE_WORKERS = int(os.getenv("PDF_PAGE_WORKERS", "0"))
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "8"))
+
+# parse_resume_text_cn 读取“教育经历”之后的行数
+EDU_BLOCK_LINES = 5
+
+_page_pool = None
+
+
+def _clean_page_text(t: Optional[str]) -> str:
+    # 安全处理文本，移除可能导致编码问题的字符
+    if not t:
+        return ""
+    # 确保文本是有效的 UTF-8
+    try:
+        return t.encode('utf-8', errors='replace').decode('utf-8')
+    except:
+        return ""
+
+
+def iter_pdf_page_texts(pdf_path: str, max_pages: Optional[int] = None, start: int = 0):
+    """逐页惰性提取 PDF 文字，调用方可以随时停止迭代，后续页不会被解析。"""
+    with pdfplumber.open(pdf_path) as pdf:
+        pages = pdf.pages[start:max_pages] if max_pages else pdf.pages[start:]
+        for page in pages:
+            yield _clean_page_text(page.extract_text())
+            # 释放已处理页面的缓存对象，长文档时内存不随页数增长
+            page.flush_cache()
+
+
+def _extract_pdf_page_range(pdf_path: str, start: int, end: int) -> List[str]:
+    """进程池任务：提取 [start, end) 范围内各页的文字"""
+    with pdfplumber.open(pdf_path) as pdf:
+        return [_clean_page_text(page.extract_text()) for page in pdf.pages[start:end]]
+
+
+def _get_page_pool():
+    global _page_pool
+    if _page_pool is None:
+        from concurrent.futures import ProcessPoolExecutor
+        _page_pool = ProcessPoolExecutor(max_workers=PDF_PAGE_WORKERS)
+    return _page_pool
+
+
+class _FieldTracker:
+    """
+    逐页检查 parse_resume_text_cn 需要的信息是否都已出现：
+    手机号、邮箱，以及“教育经历”标题及其后 EDU_BLOCK_LINES 行。
+    都找到之后，后面的页面不会再改变解析结果。
+    """
+
+    def __init__(self):
+        self.phone = False
+        self.email = False
+        self.edu_lines_after = -1  # -1 表示还没遇到“教育经历”
+
+    def feed(self, page_text: str):
+        if not self.phone and PHONE_PATTERN.search(page_text):
+            self.phone = True
+        if not self.email and EMAIL_PATTERN.search(page_text):
+            self.email = True
+        if self.edu_lines_after >= EDU_BLOCK_LINES:
+            return
+        for line in page_text.splitlines():
+            if not line.strip():
+                continue
+            if self.edu_lines_after >= 0:
+                self.edu_lines_after += 1
+            elif "教育经历" in line:
+                self.edu_lines_after = 0
+
+    @property
+    def complete(self) -> bool:
+        return self.phone and self.email and self.edu_lines_after >= EDU_BLOCK_LINES
+
+
+def extract_pdf_text(pdf_path: str, max_pages: Optional[int] = None, stop_when_complete: bool = False,
+                     workers: Optional[int] = None) -> Tuple[str, bool]:
+    """
+    从 PDF 中提取文字，返回 (文本, 是否为全文)。
+    - stop_when_complete：逐页读取，字段找齐后立即停止（只需要字段、不需要全文时使用）
+    - workers：全文提取时，页数达到 PDF_PARALLEL_MIN_PAGES 则按页分片交给多个进程并行提取
+    达到 max_pages 上限或提前停止时，“是否为全文”为 False。
+    """
+    max_pages = PDF_MAX_PAGES if max_pages is None else max_pages
+    workers = PDF_PAGE_WORKERS if workers is None else workers
     text_parts = []
     try:
         with pdfplumber.open(pdf_path) as pdf:
-            for page in pdf.pages:
-                t = page.extract_text() or ""
-                # 安全处理文本，移除可能导致编码问题的字符
-                if t:
-                    # 确保文本是有效的 UTF-8
-                    try:
-                        t = t.encode('utf-8', errors='replace').decode('utf-8')
-                    except:
-                        t = ""
+            total = len(pdf.pages)
+        limit = min(total, max_pages) if max_pages else total
+
+        if stop_when_complete:
+            tracker = _FieldTracker()
+            for t in iter_pdf_page_texts(pdf_path, limit):
                 text_parts.append(t)
+                tracker.feed(t)
+                if tracker.complete:
+                    break
+        elif workers > 1 and limit >= PDF_PARALLEL_MIN_PAGES:
+            step = (limit + workers - 1) // workers
+            pool = _get_page_pool() if workers == PDF_PAGE_WORKERS else None
+            if pool is None:
+                from concurrent.futures import ProcessPoolExecutor
+                pool = ProcessPoolExecutor(max_workers=workers)
+            try:
+                futures = [
+                    pool.submit(_extract_pdf_page_range, pdf_path, start, min(start + step, limit))
+                    for start in range(0, limit, step)
+                ]
+                for future in futures:
+                    text_parts.extend(future.result())
+            finally:
+                # 临时创建的进程池在出错时也要关闭，否则子进程会一直留着
+                if pool is not _page_pool:
+                    pool.shutdown(cancel_futures=True)
+        else:
+            text_parts.extend(iter_pdf_page_texts(pdf_path, limit))
     except Exception as e:
         # 如果提取失败，返回空字符串而不是抛出异常
         error_msg = str(e).encode('utf-8', errors='replace').decode('utf-8')
         raise ValueError(f"PDF 文本提取失败: {error_msg}")
-    return "\n".join(text_parts)
+    return "\n".join(text_parts), len(text_parts) == total
+
+
+def extract_text_from_pdf(pdf_path: str) -> str:
+    """从 PDF 中提取全部文字（受 PDF_MAX_PAGES 限制）。"""
+    text, _ = extract_pdf_text(pdf_path)
+    return text
 
 
 def extract_text_from_docx(docx_path: str) -> str:
@@ -131,82 +256,120 @@ def extract_docx_to_html(docx_path: str) -> str:
         raise ValueError(f"DOCX 转 HTML 失败: {error_msg}")
 
 
-def parse_candidate_info(text: str) -> Dict[str, Optional[str]]:
+# ==================== 字段抽取 ====================
+
+DEGREES = ("博士", "硕士", "本科", "大专", "中专")  # 按优先级排列
+DEGREE_PATTERN = re.compile("|".join(DEGREES))
+NAME_PATTERN = re.compile(r"[\u4e00-\u9fa5]{2,4}")
+AGE_PATTERN = re.compile(r"(\d{1,2})\s*岁")
+UNIVERSITY_PATTERN = re.compile(r"(.+(大学|学院))")
+UNIVERSITY_SHORT_PATTERN = re.compile(r"(.+?(大学|学院))")
+MAJOR_PATTERN = re.compile(r"专业[:：\s]*([\u4e00-\u9fa5A-Za-z0-9（）()·\s]{2,30})")
+MAJOR_WORD_CHAR_PATTERN = re.compile(r"[\u4e00-\u9fa5A-Za-z]")
+MAJOR_EXCLUDE_KEYS = ("学历", "学位", "全日制", "统招", "非全日制")
+
+# 除换行符、回车符和制表符以外的控制字符
+CONTROL_CHARS_PATTERN = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+def clean_text(text: str) -> str:
     """
-    通用文本解析（备用）。
-    简单解析：邮箱、电话、学校、学历、专业。
+    不间断空格转为普通空格，移除除换行符和制表符以外的控制字符。
+    用预编译的字符类一次替换：中文文本上 str.translate(dict) 会逐字符查字典，并不比 Python 循环快。
     """
+    return CONTROL_CHARS_PATTERN.sub("", text.replace("\u00A0", " "))
 
-    lines = [line.strip() for line in text.splitlines() if line.strip()]
 
-    email = None
-    email_pattern = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}")
-    for line in lines:
-        m = email_pattern.search(line)
-        if m:
-            email = m.group(0)
-            break
+def split_lines(text: str) -> List[str]:
+    return [line.strip() for line in text.splitlines() if line.strip()]
 
-    phone = None
-    phone_pattern = re.compile(r"1[3-9]\d{9}")
-    for line in lines:
-        m = phone_pattern.search(line)
-        if m:
-            phone = m.group(0)
-            break
+
+def first_degree(text: str) -> Optional[str]:
+    """
+    在文本中查找学历关键词：一次扫描找出出现过的所有关键词，再按 DEGREES 的优先级取第一个。
+    与逐个关键词 `in` 查找的结果一致。
+    """
+    found = set(DEGREE_PATTERN.findall(text))
+    if not found:
+        return None
+    for d in DEGREES:
+        if d in found:
+            return d
+    return None
+
+
+def _search_group(pattern: re.Pattern, text: str, group: int = 0) -> Optional[str]:
+    m = pattern.search(text)
+    return m.group(group) if m else None
+
+
+def _pick_major(line: str) -> Optional[str]:
+    """
+    专业：针对这种行格式精细拆分
+    示例行：“本科学历 丨 学士学位 丨 康复治疗学（中外合作 丨 全日制”
+    """
+    # 用多种分隔符拆分：丨、|；先统一替换为同一种分隔符，方便 split
+    parts = [p.strip() for p in line.replace("|", "丨").split("丨") if p.strip()]
+    for p in parts:
+        # 过滤掉明显不是专业的片段：包含“学历”、“学位”、“全日制”等
+        if any(key in p for key in MAJOR_EXCLUDE_KEYS):
+            continue
+        # 要有至少2个中文/字母，避免一些杂质词
+        if len(MAJOR_WORD_CHAR_PATTERN.findall(p)) >= 2:
+            # 在候选中，选择第一个作为专业
+            return p
+    return None
+
+
+def parse_candidate_info(text: str) -> Dict[str, Optional[str]]:
+    """
+    通用文本解析（备用）。
+    简单解析：邮箱、电话、学校、学历、专业。
+    """
+    lines = split_lines(text)
+    joined = "\n".join(lines)
 
     name = None
     if lines:
-        m_name = re.match(r"([\u4e00-\u9fa5]{2,4})", lines[0])
+        m_name = NAME_PATTERN.match(lines[0])
         if m_name:
-            name = m_name.group(1)
+            name = m_name.group(0)
 
     university = None
+    major = None
     for line in lines:
-        if "大学" in line or "学院" in line:
-            m = re.search(r"(.+(大学|学院))", line)
+        if university is None and ("大学" in line or "学院" in line):
+            m = UNIVERSITY_PATTERN.search(line)
             if m:
                 university = m.group(1).strip()
-                break
-
-    degree = None
-    for d in ["博士", "硕士", "本科", "大专", "中专"]:
-        if any(d in line for line in lines):
-            degree = d
-            break
-
-    major = None
-    for line in lines:
-        if "专业" in line:
-            m = re.search(r"专业[:：\s]*([\u4e00-\u9fa5A-Za-z0-9（）()·\s]{2,30})", line)
+        if major is None and "专业" in line:
+            m = MAJOR_PATTERN.search(line)
             if m:
                 major = m.group(1).strip()
-                break
+        if university is not None and major is not None:
+            break
 
     return {
         "name": name,
-        "email": email,
-        "phone": phone,
+        # 邮箱和手机号的字符集不含空白，在整段文本上查找与逐行查找结果一致
+        "email": _search_group(EMAIL_PATTERN, joined),
+        "phone": _search_group(PHONE_PATTERN, joined),
         "university": university,
-        "degree": degree,
+        "degree": first_degree(joined),
         "major": major,
     }
 
 
 def parse_resume_text_cn(text: str) -> Dict[str, Optional[str]]:
     # 清理文本：移除不可打印字符和可能导致编码问题的字符
-    text = text.replace("\u00A0", " ").strip()
-    # 移除控制字符，但保留换行符和制表符
-    text = ''.join(char for char in text if ord(char) >= 32 or char in '\n\t\r')
-    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    text = clean_text(text)
+    lines = split_lines(text)
     name = None
     gender = None
     age = None
     degree = None
     university = None
     major = None
-    phone = None
-    email = None
 
     if not lines:
         return {
@@ -221,89 +384,43 @@ def parse_resume_text_cn(text: str) -> Dict[str, Optional[str]]:
         }
 
     # 1) 姓名：第一行
-    first_line = lines[0]
-    m_name = re.match(r"^([\u4e00-\u9fa5]{2,4})$", first_line)
+    m_name = NAME_PATTERN.fullmatch(lines[0])
     if m_name:
-        name = m_name.group(1)
+        name = m_name.group(0)
 
     # 2) 性别 / 年龄 / 学历（前几行合并）
-    base_info_lines = lines[1:4]
-    base_info_text = " ".join(base_info_lines)
+    base_info_text = " ".join(lines[1:4])
 
     if "女" in base_info_text:
         gender = "女"
     elif "男" in base_info_text:
         gender = "男"
 
-    m_age = re.search(r"(\d{1,2})\s*岁", base_info_text)
-    if m_age:
-        age = m_age.group(1)
-
-    for d in ["博士", "硕士", "本科", "大专", "中专"]:
-        if d in base_info_text:
-            degree = d
-            break
+    age = _search_group(AGE_PATTERN, base_info_text, 1)
+    degree = first_degree(base_info_text)
 
     # 3) 联系方式
-    phone_pattern = re.compile(r"1[3-9]\d{9}")
-    m_phone = phone_pattern.search(text)
-    if m_phone:
-        phone = m_phone.group(0)
-
-    email_pattern = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}")
-    m_email = email_pattern.search(text)
-    if m_email:
-        email = m_email.group(0)
-
-    # 4) 教育经历
-    edu_start_idx = -1
-    for i, line in enumerate(lines):
-        if "教育经历" in line:
-            edu_start_idx = i
-            break
+    phone = _search_group(PHONE_PATTERN, text)
+    email = _search_group(EMAIL_PATTERN, text)
 
+    # 4) 教育经历：只看标题后的 EDU_BLOCK_LINES 行，学校和专业在同一次遍历中取得
+    edu_start_idx = next((i for i, line in enumerate(lines) if "教育经历" in line), -1)
     if edu_start_idx != -1:
-        edu_lines = lines[edu_start_idx + 1: edu_start_idx + 6]
-        edu_text = " ".join(edu_lines)
-
-        # 学校
+        edu_lines = lines[edu_start_idx + 1: edu_start_idx + 1 + EDU_BLOCK_LINES]
+        university_done = major_done = False
         for line in edu_lines:
-            if "大学" in line or "学院" in line:
-                m_uni = re.search(r"(.+?(大学|学院))", line)
-                if m_uni:
-                    university = m_uni.group(1).strip()
-                else:
-                    university = line.strip()
+            if not university_done and ("大学" in line or "学院" in line):
+                m_uni = UNIVERSITY_SHORT_PATTERN.search(line)
+                university = m_uni.group(1).strip() if m_uni else line.strip()
+                university_done = True
+            if not major_done and ("学历" in line or "学位" in line):
+                major = _pick_major(line)
+                major_done = True
+            if university_done and major_done:
                 break
 
         # 学历（以教育经历为准再覆盖）
-        for d in ["博士", "硕士", "本科", "大专", "中专"]:
-            if d in edu_text:
-                degree = d
-                break
-
-        # 专业：针对你这行的格式精细拆分
-        # 示例行：“本科学历 丨 学士学位 丨 康复治疗学（中外合作 丨 全日制”
-        for line in edu_lines:
-            if "学历" in line or "学位" in line:
-                # 用多种分隔符拆分：丨、|、空格
-                # 先统一替换为同一种分隔符，方便 split
-                tmp = line.replace("|", "丨")
-                # 以“丨”切片
-                parts = [p.strip() for p in tmp.split("丨") if p.strip()]
-                # 过滤掉明显不是专业的片段：包含“学历”、“学位”、“全日制”等
-                candidates = []
-                for p in parts:
-                    if any(key in p for key in ["学历", "学位", "全日制", "统招", "非全日制"]):
-                        continue
-                    # 要有至少2个中文/字母，避免一些杂质词
-                    if len(re.findall(r"[\u4e00-\u9fa5A-Za-z]", p)) >= 2:
-                        candidates.append(p)
-
-                # 在候选中，选择第一个作为专业
-                if candidates:
-                    major = candidates[0]
-                break
+        degree = first_degree(" ".join(edu_lines)) or degree
 
     return {
         "name": name,
@@ -316,21 +433,27 @@ def parse_resume_text_cn(text: str) -> Dict[str, Optional[str]]:
         "major": major,
     }
 
-def parse_resume_file(path: str) -> Dict[str, Optional[str]]:
+def parse_resume_file(path: str, include_text: bool = False,
+                      early_exit: bool = PDF_EARLY_EXIT) -> Dict[str, Optional[str]]:
     """
     统一入口：根据文件扩展名选择解析方式（PDF / DOCX），
     优先使用中文简历解析规则。
+    include_text=True 时结果中额外包含提取出的文字（"text" 字段）以及是否为全文（"text_complete" 字段）；
+    early_exit=True 时 PDF 只读到字段找齐的那一页，text 可能只是前几页。
     """
     try:
         lower = path.lower()
         if lower.endswith(".pdf"):
-            text = extract_text_from_pdf(path)
-            return parse_resume_text_cn(text)
+            text, complete = extract_pdf_text(path, stop_when_complete=early_exit)
         elif lower.endswith(".docx"):
-            text = extract_text_from_docx(path)
-            return parse_resume_text_cn(text)
+            text, complete = extract_text_from_docx(path), True
         else:
             raise ValueError("暂不支持的简历格式（仅支持 PDF / DOCX）")
+        parsed = parse_resume_text_cn(text)
+        if include_text:
+            parsed["text"] = text
+            parsed["text_complete"] = complete
+        return parsed
     except Exception as e:
         # 安全处理异常，避免编码问题
         error_msg = str(e)
@@ -339,3 +462,153 @@ def parse_resume_file(path: str) -> Dict[str, Optional[str]]:
         except:
             error_msg = "解析文件时发生未知错误"
         raise ValueError(error_msg) from e
+
+
+def extract_full_text(path: str) -> str:
+    """提取简历全文（不提前结束，受 PDF_MAX_PAGES 限制），用于补全全文检索内容"""
+    lower = path.lower()
+    if lower.endswith(".pdf"):
+        return extract_pdf_text(path, stop_when_complete=False)[0]
+    if lower.endswith(".docx"):
+        return extract_text_from_docx(path)
+    raise ValueError("暂不支持的简历格式（仅支持 PDF / DOCX）")
+
+
+# ==================== 解析结果缓存 ====================
+
+# 解析器版本：取本文件内容的指纹，修改任何解析规则后旧缓存自动失效
+with open(__file__, "rb") as _f:
+    PARSER_VERSION = hashlib.sha256(_f.read()).hexdigest()[:16]
+
+PARSE_CACHE_ENABLED = os.getenv("PARSE_CACHE_ENABLED", "1") == "1"
+PARSE_CACHE_PATH = os.getenv("PARSE_CACHE_PATH", "parse_cache.db")
+PARSE_CACHE_MAX_ENTRIES = int(os.getenv("PARSE_CACHE_MAX_ENTRIES", "50000"))
+PARSE_CACHE_MAX_BYTES = int(os.getenv("PARSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# 条目数和总字节数在进程内累计，每写入这么多次重新统计一次（校正其它 worker 写入带来的偏差）
+PARSE_CACHE_RESYNC_PUTS = 200
+
+
+class ParseCache:
+    """
+    以文件内容 SHA-256 + 解析器版本为键的持久化解析结果缓存（SQLite），值为可 JSON 序列化的对象。
+    不同用途的缓存使用同一文件中的不同表（table），如解析结果 parse_cache、DOCX 预览 HTML docx_html_cache。
+    按最近访问时间做 LRU 淘汰，条目数或总字节数超限时删除最久未使用的记录。
+    多个 uvicorn worker 可以共享同一个缓存文件。
+    """
+
+    def __init__(self, path: str = PARSE_CACHE_PATH, max_entries: int = PARSE_CACHE_MAX_ENTRIES,
+                 max_bytes: int = PARSE_CACHE_MAX_BYTES, version: str = PARSER_VERSION, table: str = "parse_cache"):
+        self.path = path
+        self.table = table
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.version = version
+        self.hits = 0
+        self.misses = 0
+        self._conn = None
+        self._lock = threading.Lock()
+        self._entries = 0
+        self._bytes = 0
+        self._puts_since_sync = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                " content_hash TEXT PRIMARY KEY,"
+                " parser_version TEXT NOT NULL,"
+                " result TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " last_access REAL NOT NULL)"
+            )
+            conn.execute(f"CREATE INDEX IF NOT EXISTS ix_{self.table}_last_access ON {self.table} (last_access)")
+            # 解析器版本变化后，旧版本的结果全部作废
+            conn.execute(f"DELETE FROM {self.table} WHERE parser_version != ?", (self.version,))
+            conn.commit()
+            self._sync_totals(conn)
+            self._conn = conn
+        return self._conn
+
+    def _sync_totals(self, conn: sqlite3.Connection):
+        self._entries, self._bytes = conn.execute(
+            f"SELECT COUNT(*), COALESCE(SUM(size), 0) FROM {self.table}"
+        ).fetchone()
+        self._puts_since_sync = 0
+
+    def get(self, content_hash: str) -> Optional[Any]:
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(
+                f"SELECT result FROM {self.table} WHERE content_hash = ? AND parser_version = ?",
+                (content_hash, self.version),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            conn.execute(f"UPDATE {self.table} SET last_access = ? WHERE content_hash = ?", (time.time(), content_hash))
+            conn.commit()
+            self.hits += 1
+            return json.loads(row[0])
+
+    def put(self, content_hash: str, result: Any):
+        payload = json.dumps(result, ensure_ascii=False)
+        size = len(payload.encode("utf-8"))
+        with self._lock:
+            conn = self._connect()
+            old = conn.execute(f"SELECT size FROM {self.table} WHERE content_hash = ?", (content_hash,)).fetchone()
+            conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (content_hash, parser_version, result, size, last_access)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (content_hash, self.version, payload, size, time.time()),
+            )
+            if old is None:
+                self._entries += 1
+                self._bytes += size
+            else:
+                self._bytes += size - old[0]
+            self._puts_since_sync += 1
+            if self._puts_since_sync >= PARSE_CACHE_RESYNC_PUTS:
+                self._sync_totals(conn)
+            self._evict(conn)
+            conn.commit()
+
+    def _evict(self, conn: sqlite3.Connection):
+        # 用累计的条目数和字节数判断，写入路径上不做全表统计
+        count, total = self._entries, self._bytes
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        # 一次多淘汰 10%，避免每次写入都触发淘汰
+        excess = max(count - self.max_entries, 0)
+        if total > self.max_bytes and count:
+            excess = max(excess, int(count * (total - self.max_bytes) / total) + 1)
+        excess += max(self.max_entries // 10, 1)
+        conn.execute(
+            f"DELETE FROM {self.table} WHERE content_hash IN ("
+            f" SELECT content_hash FROM {self.table} ORDER BY last_access LIMIT ?)",
+            (excess,),
+        )
+        self._sync_totals(conn)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            count, total = self._connect().execute(
+                f"SELECT COUNT(*), COALESCE(SUM(size), 0) FROM {self.table}"
+            ).fetchone()
+        return {
+            "parser_version": self.version,
+            "entries": count,
+            "bytes": total,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+parse_cache = ParseCache()
+
+# DOCX 预览 HTML：首次预览时生成，之后直接从缓存读取（解析器版本变化后自动重新生成）
+DOCX_HTML_CACHE_MAX_BYTES = int(os.getenv("DOCX_HTML_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+docx_html_cache = ParseCache(max_bytes=DOCX_HTML_CACHE_MAX_BYTES, table="docx_html_cache")
+
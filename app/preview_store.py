@@ -0,0 +1,147 @@
+"""
+预览会话存储：/preview 把解析结果和全文保存在服务端，只把一个不透明的 preview_token 交给客户端，
+/save 凭 token 直接把会话提升为候选人，不再重新解析，也不再信任客户端回传的路径和字段。
+
+会话保存在内存中（带 TTL 和容量上限）；配置了 PREVIEW_STORE_PATH 时同时写入 SQLite，
+这样多个 uvicorn worker 之间可以共享会话，内存放不下的会话也不会丢失。
+
+配置（环境变量）：
+- PREVIEW_TTL_SECONDS：预览会话有效期，默认 3600
+- PREVIEW_MEMORY_MAX：内存中最多保留的会话数，默认 1000
+- PREVIEW_STORE_PATH：SQLite 文件路径，默认 preview_sessions.db，设为空字符串则只用内存
+- PREVIEW_GC_INTERVAL：清理过期会话的间隔（秒），默认 300（孤儿文件的清理间隔见 storage.ORPHAN_SWEEP_INTERVAL）
+
+预览文件按内容寻址保存（见 storage.py），可能与已入库的候选人共用同一个文件，
+因此会话过期时不直接删除文件，由孤儿清理在确认无人引用后删除。
+"""
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+PREVIEW_TTL_SECONDS = int(os.getenv("PREVIEW_TTL_SECONDS", "3600"))
+PREVIEW_MEMORY_MAX = int(os.getenv("PREVIEW_MEMORY_MAX", "1000"))
+PREVIEW_STORE_PATH = os.getenv("PREVIEW_STORE_PATH", "preview_sessions.db")
+PREVIEW_GC_INTERVAL = int(os.getenv("PREVIEW_GC_INTERVAL", "300"))
+
+
+class PreviewStore:
+    """token -> 会话字典（stored_name / original_name / path / sha256 / parsed / text）"""
+
+    def __init__(self, ttl: int = PREVIEW_TTL_SECONDS, memory_max: int = PREVIEW_MEMORY_MAX,
+                 path: Optional[str] = PREVIEW_STORE_PATH):
+        self.ttl = ttl
+        self.memory_max = max(1, memory_max)
+        self.path = path or None
+        self._memory: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        if self.path is None:
+            return None
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS preview_sessions ("
+                " token TEXT PRIMARY KEY,"
+                " payload TEXT NOT NULL,"
+                " expires_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_preview_sessions_expires_at ON preview_sessions (expires_at)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def create(self, session: Dict) -> str:
+        """保存会话并返回新的 preview_token"""
+        token = secrets.token_urlsafe(24)
+        session = dict(session, expires_at=time.time() + self.ttl)
+        with self._lock:
+            self._memory[token] = session
+            # 内存超出上限时丢弃最早的会话；已写入 SQLite 的会话仍可通过 token 取回
+            while len(self._memory) > self.memory_max:
+                self._memory.popitem(last=False)
+            conn = self._connect()
+            if conn is not None:
+                conn.execute(
+                    "INSERT OR REPLACE INTO preview_sessions (token, payload, expires_at) VALUES (?, ?, ?)",
+                    (token, json.dumps(session, ensure_ascii=False), session["expires_at"]),
+                )
+                conn.commit()
+        return token
+
+    def restore(self, token: str, session: Dict):
+        """把 pop 出的会话放回（/save 写库失败时使用，保持原有的过期时间）"""
+        with self._lock:
+            self._memory[token] = session
+            conn = self._connect()
+            if conn is not None:
+                conn.execute(
+                    "INSERT OR REPLACE INTO preview_sessions (token, payload, expires_at) VALUES (?, ?, ?)",
+                    (token, json.dumps(session, ensure_ascii=False), session["expires_at"]),
+                )
+                conn.commit()
+
+    def pop(self, token: str) -> Optional[Dict]:
+        """
+        取出并删除会话（每个 token 只能被保存一次）；已过期或不存在时返回 None。
+        SQLite 中以 DELETE 的影响行数判断归属，多个 worker 并发 /save 同一个 token 时只有一个成功。
+        """
+        now = time.time()
+        with self._lock:
+            session = self._memory.pop(token, None)
+            conn = self._connect()
+            if conn is not None:
+                if session is None:
+                    row = conn.execute(
+                        "SELECT payload FROM preview_sessions WHERE token = ?", (token,)
+                    ).fetchone()
+                    session = json.loads(row[0]) if row else None
+                deleted = conn.execute("DELETE FROM preview_sessions WHERE token = ?", (token,)).rowcount
+                conn.commit()
+                if not deleted:
+                    session = None
+        if session is None or session["expires_at"] < now:
+            return None
+        return session
+
+    def live_files(self) -> List[str]:
+        """仍在有效期内的会话引用的存储键"""
+        now = time.time()
+        with self._lock:
+            names = {s["stored_name"] for s in self._memory.values() if s["expires_at"] >= now}
+            conn = self._connect()
+            if conn is not None:
+                for payload, in conn.execute(
+                    "SELECT payload FROM preview_sessions WHERE expires_at >= ?", (now,)
+                ):
+                    names.add(json.loads(payload)["stored_name"])
+        return list(names)
+
+    def collect_expired(self) -> int:
+        """删除过期会话，返回清理的会话数（文件由孤儿清理删除）"""
+        now = time.time()
+        with self._lock:
+            expired = [token for token, session in self._memory.items() if session["expires_at"] < now]
+            for token in expired:
+                del self._memory[token]
+            conn = self._connect()
+            if conn is not None:
+                tokens = {row[0] for row in conn.execute(
+                    "SELECT token FROM preview_sessions WHERE expires_at < ?", (now,)
+                )}
+                conn.executemany("DELETE FROM preview_sessions WHERE token = ?", [(t,) for t in tokens])
+                conn.commit()
+                tokens.update(expired)
+                return len(tokens)
+        return len(expired)
+
+
+preview_store = PreviewStore()
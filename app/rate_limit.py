@@ -0,0 +1,55 @@
+"""
+进程内令牌桶限流：每个 key（用户名、客户端 IP）一个桶，容量为 burst，每秒补充 rate 个令牌。
+用于登录、注册等会触发 bcrypt 计算的接口，在进入密码哈希线程池之前拒绝过于频繁的请求。
+
+状态只保存在本进程内，多个 uvicorn worker 时实际允许的频率为配置值乘以 worker 数。
+
+配置（环境变量）：
+- LOGIN_RATE_PER_USER：同一用户名每分钟允许的登录尝试次数（同时也是突发容量），默认 10
+- LOGIN_RATE_PER_IP：同一 IP 每分钟允许的登录/注册尝试次数，默认 30
+"""
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Tuple
+
+LOGIN_RATE_PER_USER = float(os.getenv("LOGIN_RATE_PER_USER", "10"))
+LOGIN_RATE_PER_IP = float(os.getenv("LOGIN_RATE_PER_IP", "30"))
+RATE_LIMIT_MAX_KEYS = 100_000
+
+
+class TokenBucketLimiter:
+    def __init__(self, rate: float, burst: float, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        """rate：每秒补充的令牌数；burst：桶容量；max_keys：最多跟踪的 key 数，超出时淘汰最久未使用的"""
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.max_keys = max(1, max_keys)
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def acquire(self, key: str) -> Tuple[bool, int]:
+        """取一个令牌，返回 (是否允许, 需要等待的秒数)"""
+        if self.rate <= 0:
+            return True, 0
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [self.burst, now]
+            else:
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+                self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return True, 0
+            return False, max(1, math.ceil((1 - bucket[0]) / self.rate))
+
+
+login_user_limiter = TokenBucketLimiter(LOGIN_RATE_PER_USER / 60, LOGIN_RATE_PER_USER)
+login_ip_limiter = TokenBucketLimiter(LOGIN_RATE_PER_IP / 60, LOGIN_RATE_PER_IP)
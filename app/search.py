@@ -0,0 +1,206 @@
+"""
+简历全文检索：SQLite FTS5 虚拟表 candidates_fts（rowid = candidates.id），索引姓名、标签和简历全文。
+
+FTS5 自带的 unicode61 分词器会把一整段连续的中文当成一个词，因此写入和查询前都先做 n-gram 切分：
+连续的中文切成重叠的二元组（“前端开发” -> “前端 端开 开发”），英文和数字按词保留并转小写。
+查询词按同样的方式切分后作为短语匹配，效果等价于子串匹配，但可以走倒排索引。
+
+另有 candidate_names_fts 按单个字符索引姓名，供 /candidates?name= 做子串检索（LIKE '%x%' 无法使用 B 树索引）。
+
+索引通过 Candidate 的 ORM 事件在同一事务内同步维护（插入、修改姓名/标签/全文、删除）。
+非 SQLite 数据库或 SQLite 未编译 FTS5 时，检索回落为 LIKE 查询。
+"""
+import html
+import re
+from typing import Dict, List, Optional
+
+from sqlalchemy import event, inspect, text
+
+FTS_TABLE = "candidates_fts"
+# 姓名子串检索用的索引表：姓名按单个字符切分，检索词作为连续字符组成的短语匹配，等价于 LIKE '%词%'
+NAME_FTS_TABLE = "candidate_names_fts"
+# bm25 各列权重：姓名、标签、全文
+BM25_WEIGHTS = (10.0, 5.0, 1.0)
+SNIPPET_RADIUS = 40
+
+_CJK = "\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff"
+_TOKEN_PATTERN = re.compile(rf"[{_CJK}]+|[A-Za-z0-9]+")
+_CJK_RUN_PATTERN = re.compile(rf"[{_CJK}]+")
+
+
+def segment(value: Optional[str]) -> str:
+    """把文本切分为 FTS 词元：中文二元组 + 英文/数字单词（小写），以空格分隔"""
+    if not value:
+        return ""
+    tokens = []
+    for token in _TOKEN_PATTERN.findall(value):
+        if _CJK_RUN_PATTERN.fullmatch(token):
+            if len(token) == 1:
+                tokens.append(token)
+            else:
+                tokens.extend(token[i:i + 2] for i in range(len(token) - 1))
+        else:
+            tokens.append(token.lower())
+    return " ".join(tokens)
+
+
+def query_terms(q: str) -> List[str]:
+    """用户输入按空白拆分为检索词（去重，保持顺序）"""
+    seen = []
+    for term in q.split():
+        if term and term not in seen:
+            seen.append(term)
+    return seen
+
+
+def build_match_query(q: str, column: Optional[str] = None) -> Optional[str]:
+    """
+    把用户输入转换为 FTS5 MATCH 表达式，多个检索词之间为 AND。
+    - 中文词：二元组组成的短语；单个汉字用前缀匹配
+    - 英文/数字：前缀匹配（“kube” 可以命中 “kubernetes”）
+    column 指定时只在该列中匹配。
+    """
+    parts = []
+    for term in query_terms(q):
+        for token in _TOKEN_PATTERN.findall(term):
+            if _CJK_RUN_PATTERN.fullmatch(token):
+                expr = f"{token}*" if len(token) == 1 else '"' + segment(token) + '"'
+            else:
+                expr = f'"{token.lower()}"*'
+            parts.append(f"{{{column}}}: {expr}" if column else expr)
+    return " AND ".join(parts) if parts else None
+
+
+def segment_chars(value: Optional[str]) -> str:
+    """姓名按字符切分为词元（只保留文字和数字），以空格分隔"""
+    return " ".join(ch for ch in (value or "") if ch.isalnum())
+
+
+def build_name_match_query(name: str) -> Optional[str]:
+    """姓名子串检索的 MATCH 表达式：连续字符组成的短语"""
+    chars = segment_chars(name)
+    return f'"{chars}"' if chars else None
+
+
+def highlight_snippet(body: Optional[str], q: str, radius: int = SNIPPET_RADIUS) -> Optional[str]:
+    """
+    从原文中截取第一个命中位置附近的片段，并用 <mark> 标出所有检索词（HTML 已转义）。
+    片段在 Python 中生成，索引中保存的是切分后的词元，直接用 FTS5 的 snippet() 会得到二元组。
+    """
+    if not body:
+        return None
+    terms = [t for t in query_terms(q) if t]
+    if not terms:
+        return None
+    pattern = re.compile("|".join(re.escape(t) for t in sorted(terms, key=len, reverse=True)), re.IGNORECASE)
+    m = pattern.search(body)
+    if not m:
+        return None
+    start = max(m.start() - radius, 0)
+    end = min(m.end() + radius, len(body))
+    window = body[start:end].replace("\n", " ")
+    pieces, last = [], 0
+    for hit in pattern.finditer(window):
+        pieces.append(html.escape(window[last:hit.start()]))
+        pieces.append(f"<mark>{html.escape(hit.group(0))}</mark>")
+        last = hit.end()
+    pieces.append(html.escape(window[last:]))
+    return ("…" if start > 0 else "") + "".join(pieces) + ("…" if end < len(body) else "")
+
+
+# ==================== 索引维护 ====================
+
+_fts_ready: Dict[str, bool] = {}
+
+
+def fts_available(connection, table: str = FTS_TABLE) -> bool:
+    """当前数据库是否存在指定的全文索引表（按数据库 URL 缓存结果）"""
+    key = f"{connection.engine.url}#{table}"
+    if key not in _fts_ready:
+        ready = False
+        if connection.dialect.name == "sqlite":
+            ready = connection.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                {"name": table},
+            ).first() is not None
+        _fts_ready[key] = ready
+    return _fts_ready[key]
+
+
+def create_fts_table(connection):
+    connection.execute(text(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+        "name, tags, body, tokenize='unicode61 remove_diacritics 2')"
+    ))
+    _fts_ready.pop(f"{connection.engine.url}#{FTS_TABLE}", None)
+
+
+def create_name_fts_table(connection):
+    connection.execute(text(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {NAME_FTS_TABLE} USING fts5("
+        "name, tokenize='unicode61 remove_diacritics 2')"
+    ))
+    _fts_ready.pop(f"{connection.engine.url}#{NAME_FTS_TABLE}", None)
+
+
+def index_name(connection, candidate_id: int, name: Optional[str]):
+    connection.execute(text(f"DELETE FROM {NAME_FTS_TABLE} WHERE rowid = :id"), {"id": candidate_id})
+    connection.execute(
+        text(f"INSERT INTO {NAME_FTS_TABLE} (rowid, name) VALUES (:id, :name)"),
+        {"id": candidate_id, "name": segment_chars(name)},
+    )
+
+
+def index_row(connection, candidate_id: int, name: Optional[str], tags: Optional[str], body: Optional[str]):
+    connection.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :id"), {"id": candidate_id})
+    connection.execute(
+        text(f"INSERT INTO {FTS_TABLE} (rowid, name, tags, body) VALUES (:id, :name, :tags, :body)"),
+        {
+            "id": candidate_id,
+            "name": segment(name),
+            "tags": segment((tags or "").replace(",", " ")),
+            "body": segment(body),
+        },
+    )
+
+
+def remove_row(connection, candidate_id: int, table: str = FTS_TABLE):
+    connection.execute(text(f"DELETE FROM {table} WHERE rowid = :id"), {"id": candidate_id})
+
+
+def _resume_text(connection, target) -> Optional[str]:
+    # resume_text 是延迟加载列，未赋值时不会被加载；flush 过程中不能触发懒加载，直接用当前连接读取
+    if "resume_text" in inspect(target).unloaded:
+        return connection.execute(
+            text("SELECT resume_text FROM candidates WHERE id = :id"), {"id": target.id}
+        ).scalar()
+    return target.resume_text
+
+
+def register_index_events(candidate_cls):
+    """在 Candidate 的插入/更新/删除时同步维护全文索引和姓名索引"""
+
+    @event.listens_for(candidate_cls, "after_insert")
+    def _after_insert(mapper, connection, target):
+        if fts_available(connection):
+            index_row(connection, target.id, target.name, target.tags, _resume_text(connection, target))
+        if fts_available(connection, NAME_FTS_TABLE):
+            index_name(connection, target.id, target.name)
+
+    @event.listens_for(candidate_cls, "after_update")
+    def _after_update(mapper, connection, target):
+        state = inspect(target)
+        changed = {
+            attr for attr in ("name", "tags", "resume_text") if state.attrs[attr].history.has_changes()
+        }
+        if changed and fts_available(connection):
+            index_row(connection, target.id, target.name, target.tags, _resume_text(connection, target))
+        if "name" in changed and fts_available(connection, NAME_FTS_TABLE):
+            index_name(connection, target.id, target.name)
+
+    @event.listens_for(candidate_cls, "after_delete")
+    def _after_delete(mapper, connection, target):
+        if fts_available(connection):
+            remove_row(connection, target.id)
+        if fts_available(connection, NAME_FTS_TABLE):
+            remove_row(connection, target.id, NAME_FTS_TABLE)
@@ -0,0 +1,380 @@
+"""
+简历文件存储。
+
+上传文件先按块写入暂存目录（超过大小限制立即中止，同一遍读取中计算 SHA-256），解析通过后按内容寻址
+移入存储：键为 ab/cd/<sha256>.pdf（取哈希前两级做分片目录），每个目录下的文件数保持在几千以内，
+列目录和备份不会随简历数量变慢；同一文件重复上传只保存一份。
+
+数据库中 resume_filename / ingest_jobs.stored_name 保存键，resume_path / file_path 保存位置：
+本地存储为文件路径（早期平铺在上传目录下的 <uuid>.pdf 仍按原路径读取），S3 存储为 s3://bucket/前缀/键。
+同一个键可能被多个候选人引用，删除时先统计引用（见 main.delete_candidate），无人引用的文件再由
+sweep_orphan_blobs 定期清理。
+
+配置（环境变量）：
+- UPLOAD_DIR：本地存储目录，默认 uploads
+- STORAGE_BACKEND：local（默认）或 s3（需要安装 boto3）
+- S3_BUCKET：S3 存储桶
+- S3_PREFIX：键前缀，默认 resumes/
+- S3_ENDPOINT_URL：S3 兼容服务的地址（如 MinIO），默认使用 AWS
+- S3_REGION：区域，默认取 AWS_DEFAULT_REGION
+- S3_PRESIGN_EXPIRES：下载时签发的临时链接有效期（秒），默认 300
+- ORPHAN_SWEEP_INTERVAL：孤儿清理的间隔（秒），默认 86400，0 为不在服务进程中清理
+访问密钥使用 boto3 的默认来源（AWS_ACCESS_KEY_ID / AWS_SECRET_ACCESS_KEY 环境变量、配置文件等）。
+"""
+import contextlib
+import hashlib
+import os
+import tempfile
+import time
+import uuid
+from typing import BinaryIO, Callable, Iterable, Iterator, NamedTuple, Optional, Set, Tuple
+from urllib.parse import quote
+
+from starlette.concurrency import run_in_threadpool
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+COPY_CHUNK_SIZE = 1024 * 1024  # 1MB
+
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local")
+S3_BUCKET = os.getenv("S3_BUCKET", "")
+S3_PREFIX = os.getenv("S3_PREFIX", "resumes/")
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL") or None
+S3_REGION = os.getenv("S3_REGION") or os.getenv("AWS_DEFAULT_REGION") or None
+S3_PRESIGN_EXPIRES = int(os.getenv("S3_PRESIGN_EXPIRES", "300"))
+ORPHAN_SWEEP_INTERVAL = int(os.getenv("ORPHAN_SWEEP_INTERVAL", "86400"))
+
+# 暂存目录与本地存储在同一文件系统上，移入存储只需一次 rename
+STAGING_DIR = os.path.join(UPLOAD_DIR, ".staging")
+# 记录上次孤儿清理时间的文件，放在以点开头的目录中，遍历存储时不会被当作孤儿文件
+SWEEP_MARKER = os.path.join(UPLOAD_DIR, ".locks", "orphan_sweep")
+# 文件在这段时间内被重新写入（重复上传）过时，删除候选人不立即删除文件，交给孤儿清理；
+# 避免另一个同内容的上传刚移入存储、还没写库时文件被删掉
+BLOB_DELETE_GRACE = 60
+
+
+class FileTooLarge(Exception):
+    pass
+
+
+class StoredFile(NamedTuple):
+    size: int
+    sha256: str
+
+
+def save_stream(src: BinaryIO, dest_path: str, max_size: int) -> StoredFile:
+    """
+    按块把 src 复制到 dest_path，返回写入字节数和内容的 SHA-256。
+    超过 max_size 时立即中止并删除半截文件；任何异常都不会留下残缺文件。
+    """
+    digest = hashlib.sha256()
+    written = 0
+    try:
+        with open(dest_path, "wb") as f:
+            while True:
+                chunk = src.read(COPY_CHUNK_SIZE)
+                if not chunk:
+                    break
+                written += len(chunk)
+                if written > max_size:
+                    raise FileTooLarge(f"文件大小不能超过 {max_size / 1024 / 1024}MB")
+                digest.update(chunk)
+                f.write(chunk)
+    except BaseException:
+        if os.path.exists(dest_path):
+            os.remove(dest_path)
+        raise
+    return StoredFile(written, digest.hexdigest())
+
+
+def file_sha256(path: str) -> str:
+    """按块计算已落盘文件的 SHA-256（早期记录没有保存 content_hash 时使用）"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(COPY_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def blob_key(sha256: str, ext: str) -> str:
+    """按内容寻址的存储键：ab/cd/<sha256><ext>"""
+    return f"{sha256[:2]}/{sha256[2:4]}/{sha256}{ext.lower()}"
+
+
+def new_staging_path(ext: str) -> str:
+    """暂存目录中一个新的临时文件路径"""
+    os.makedirs(STAGING_DIR, exist_ok=True)
+    return os.path.join(STAGING_DIR, f"{uuid.uuid4().hex}{ext}")
+
+
+def discard_staged(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class LocalBlobStore:
+    """本地文件系统存储，root 下按键的分片目录保存文件"""
+
+    def __init__(self, root: str = UPLOAD_DIR):
+        self.root = root
+
+    def location(self, key: str) -> str:
+        return os.path.join(self.root, *key.split("/"))
+
+    def key_of(self, location: str) -> str:
+        return os.path.relpath(location, self.root).replace(os.sep, "/")
+
+    def put(self, staged_path: str, key: str) -> str:
+        """把暂存文件移入存储并返回位置；同一内容已存在时只刷新修改时间，丢弃暂存文件"""
+        dest = self.location(key)
+        if os.path.exists(dest):
+            os.utime(dest)
+            discard_staged(staged_path)
+            return dest
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        os.replace(staged_path, dest)
+        return dest
+
+    def modified_at(self, key: str) -> Optional[float]:
+        try:
+            return os.path.getmtime(self.location(key))
+        except OSError:
+            return None
+
+    def delete(self, key: str):
+        os.remove(self.location(key))
+
+    def iter_blobs(self) -> Iterator[Tuple[str, float]]:
+        """遍历所有文件，返回 (键, 修改时间)；跳过暂存目录等以点开头的目录"""
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = [d for d in dirnames if not d.startswith(".")]
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    mtime = os.path.getmtime(path)
+                except OSError:
+                    continue
+                yield self.key_of(path), mtime
+
+    @contextlib.contextmanager
+    def local_file(self, key: str) -> Iterator[str]:
+        yield self.location(key)
+
+
+class S3BlobStore:
+    """S3 兼容对象存储（AWS S3、MinIO 等）"""
+
+    def __init__(self, bucket: str = S3_BUCKET, prefix: str = S3_PREFIX, endpoint_url: Optional[str] = S3_ENDPOINT_URL,
+                 region: Optional[str] = S3_REGION):
+        try:
+            import boto3
+        except ImportError:
+            raise RuntimeError("STORAGE_BACKEND=s3 需要安装 boto3")
+        if not bucket:
+            raise RuntimeError("STORAGE_BACKEND=s3 时必须设置 S3_BUCKET")
+        self.bucket = bucket
+        self.prefix = prefix
+        self.client = boto3.client("s3", endpoint_url=endpoint_url, region_name=region)
+
+    def location(self, key: str) -> str:
+        return f"s3://{self.bucket}/{self.prefix}{key}"
+
+    def key_of(self, location: str) -> str:
+        return location[len(f"s3://{self.bucket}/{self.prefix}"):]
+
+    def _head(self, key: str) -> Optional[dict]:
+        from botocore.exceptions import ClientError
+
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=self.prefix + key)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+
+    def put(self, staged_path: str, key: str) -> str:
+        """上传暂存文件并返回位置；同一内容已存在时原地复制一次以刷新修改时间，不重新上传"""
+        try:
+            if self._head(key) is None:
+                self.client.upload_file(staged_path, self.bucket, self.prefix + key)
+            else:
+                self.client.copy_object(
+                    Bucket=self.bucket, Key=self.prefix + key, MetadataDirective="REPLACE",
+                    CopySource={"Bucket": self.bucket, "Key": self.prefix + key},
+                )
+        finally:
+            discard_staged(staged_path)
+        return self.location(key)
+
+    def modified_at(self, key: str) -> Optional[float]:
+        head = self._head(key)
+        return head["LastModified"].timestamp() if head else None
+
+    def delete(self, key: str):
+        self.client.delete_object(Bucket=self.bucket, Key=self.prefix + key)
+
+    def iter_blobs(self) -> Iterator[Tuple[str, float]]:
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix):
+            for obj in page.get("Contents", []):
+                yield obj["Key"][len(self.prefix):], obj["LastModified"].timestamp()
+
+    @contextlib.contextmanager
+    def local_file(self, key: str) -> Iterator[str]:
+        """下载到临时文件供解析使用，用完删除"""
+        fd, path = tempfile.mkstemp(suffix=os.path.splitext(key)[1])
+        os.close(fd)
+        try:
+            try:
+                self.client.download_file(self.bucket, self.prefix + key, path)
+            except Exception as e:
+                raise FileNotFoundError(f"简历文件不存在: {key} ({e})")
+            yield path
+        finally:
+            discard_staged(path)
+
+    def presigned_url(self, key: str, filename: str, media_type: str, disposition: str) -> str:
+        """签发临时下载链接，由浏览器直接从对象存储下载（Range、ETag 由对象存储处理）"""
+        return self.client.generate_presigned_url(
+            "get_object",
+            Params={
+                "Bucket": self.bucket,
+                "Key": self.prefix + key,
+                "ResponseContentType": media_type,
+                "ResponseContentDisposition": f"{disposition}; filename*=utf-8''{quote(filename)}",
+            },
+            ExpiresIn=S3_PRESIGN_EXPIRES,
+        )
+
+
+local_store = LocalBlobStore()
+blob_store = S3BlobStore() if STORAGE_BACKEND == "s3" else local_store
+
+
+def is_blob_location(location: Optional[str]) -> bool:
+    """纯文本导入的候选人使用 "(from_text)" 之类的标记，没有文件"""
+    return bool(location) and not (location.startswith("(") and location.endswith(")"))
+
+
+def resolve(location: str):
+    """位置 -> (存储, 键)；s3:// 以外的位置都是本地文件路径（包括早期的平铺文件）"""
+    if location.startswith("s3://"):
+        if blob_store is local_store:
+            raise RuntimeError("该文件保存在 S3 中，需要设置 STORAGE_BACKEND=s3")
+        return blob_store, blob_store.key_of(location)
+    return local_store, local_store.key_of(location)
+
+
+def is_remote(location: str) -> bool:
+    return location.startswith("s3://")
+
+
+@contextlib.asynccontextmanager
+async def local_copy(location: str):
+    """取得可供解析进程读取的本地路径：本地存储直接返回，S3 先下载到临时文件（在线程池中执行）"""
+    if not is_remote(location):
+        yield location
+        return
+    store, key = resolve(location)
+    context = store.local_file(key)
+    path = await run_in_threadpool(context.__enter__)
+    try:
+        yield path
+    finally:
+        await run_in_threadpool(context.__exit__, None, None, None)
+
+
+def delete_if_unused(location: str, referenced: Callable[[Iterable[str]], Set[str]]) -> bool:
+    """
+    键不再被引用且最近没有被重新写入时删除文件，返回是否删除。
+    referenced(keys) 返回其中仍被引用的键（候选人、未完成的入库任务、有效的预览会话）。
+    """
+    if not is_blob_location(location):
+        return False
+    store, key = resolve(location)
+    if key in referenced([key]):
+        return False
+    modified = store.modified_at(key)
+    if modified is None or modified > time.time() - BLOB_DELETE_GRACE:
+        return False
+    store.delete(key)
+    return True
+
+
+def sweep_orphan_blobs(store, referenced: Callable[[Iterable[str]], Set[str]], min_age: float) -> int:
+    """
+    删除 store 中早于 min_age 秒、且没有被任何记录引用的文件（如删除候选人时还在宽限期内的文件、
+    失败的入库任务、过期预览留下的文件），以及暂存目录中遗留的临时文件。
+    """
+    cutoff = time.time() - min_age
+    removed = 0
+    if store is local_store:
+        try:
+            for entry in os.scandir(STAGING_DIR):
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    discard_staged(entry.path)
+                    removed += 1
+        except FileNotFoundError:
+            pass
+
+    batch = []
+
+    def flush():
+        nonlocal removed
+        in_use = referenced(batch)
+        for key in batch:
+            if key in in_use:
+                continue
+            # 查询引用之后同内容的文件可能被重新上传（只刷新修改时间，随后写库引用该键），删除前再确认一次
+            modified = store.modified_at(key)
+            if modified is None or modified >= cutoff:
+                continue
+            try:
+                store.delete(key)
+                removed += 1
+            except Exception as e:
+                print(f"删除孤儿文件 {key} 失败: {e}")
+        batch.clear()
+
+    for key, mtime in store.iter_blobs():
+        if mtime < cutoff:
+            batch.append(key)
+            if len(batch) >= 500:
+                flush()
+    if batch:
+        flush()
+    return removed
+
+
+def claim_orphan_sweep(interval: float = ORPHAN_SWEEP_INTERVAL) -> bool:
+    """
+    孤儿清理要遍历整个存储，多个 uvicorn worker（以及共用上传目录的实例）中每 interval 秒只让一个进程执行：
+    在文件锁内读取上次清理时间，已到期时写入当前时间并返回 True。
+    """
+    if interval <= 0:
+        return False
+    os.makedirs(os.path.dirname(SWEEP_MARKER), exist_ok=True)
+    with open(SWEEP_MARKER, "a+", encoding="utf-8") as f:
+        if fcntl is not None:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                return False  # 另一个进程正在检查
+        f.seek(0)
+        try:
+            last = float(f.read().strip() or 0)
+        except ValueError:
+            last = 0
+        now = time.time()
+        if now - last < interval:
+            return False
+        f.seek(0)
+        f.truncate()
+        f.write(str(now))
+    return True
@@ -0,0 +1,188 @@
+"""
+合成中文简历生成器：用于解析器基准测试和压测数据准备。
+每份简历同时给出期望的解析结果（golden），格式与 parse_resume_text_cn 的输出一致。
+
+generate_corpus 生成纯文本；generate_documents + render_pdf / render_docx 生成 1~20 页的 PDF / DOCX 文件，
+其中一部分把教育经历排成表格。PDF 使用 reportlab 的内置中文字体 STSong-Light（只在生成 PDF 时需要 reportlab）。
+"""
+import random
+from typing import Dict, List, Optional, Tuple
+
+SURNAMES = "王李张刘陈杨黄赵吴周徐孙马朱胡郭何高林罗郑梁谢宋唐许韩冯邓曹彭曾肖田董袁潘蒋蔡余杜叶程苏魏吕丁任沈姚卢姜崔钟谭陆汪范金石廖贾夏韦付方白邹孟熊秦邱江尹薛闫段雷侯龙史陶黎贺顾毛郝龚邵万钱严覃武戴莫孔向汤"
+GIVEN_CHARS = "伟芳娜秀英敏静丽强磊军洋勇艳杰娟涛明超秀兰霞平刚桂英华建国志强海燕晓东雪梅文博宇轩子涵梓萱浩然欣怡思远嘉怡雨泽"
+UNIVERSITIES = [
+    "北京大学", "清华大学", "复旦大学", "浙江大学", "南京大学", "武汉大学", "中山大学", "四川大学",
+    "华中科技大学", "西安交通大学", "哈尔滨工业大学", "北京外国语学院", "上海音乐学院", "中央美术学院",
+]
+MAJORS = [
+    "计算机科学与技术", "软件工程", "金融学", "会计学", "康复治疗学", "电子信息工程", "市场营销",
+    "汉语言文学", "机械设计制造及其自动化", "数据科学与大数据技术", "人力资源管理", "临床医学",
+]
+DEGREES = ["博士", "硕士", "本科", "大专"]
+SKILLS = ["Java", "Python", "React", "Vue", "Kubernetes", "Docker", "MySQL", "Redis", "Go", "Spark",
+          "产品设计", "数据分析", "项目管理", "用户研究", "财务报表", "临床护理"]
+COMPANIES = ["字节跳动", "腾讯", "阿里巴巴", "美团", "京东", "华为", "小米", "网易", "百度", "招商银行"]
+ROLES = ["后端开发工程师", "前端开发工程师", "产品经理", "数据分析师", "测试工程师", "运营专员", "会计"]
+
+
+def _name(rng: random.Random) -> str:
+    return rng.choice(SURNAMES) + "".join(rng.choice(GIVEN_CHARS) for _ in range(rng.choice((1, 2))))
+
+
+def _phone(rng: random.Random) -> str:
+    return "1" + rng.choice("3456789") + "".join(rng.choice("0123456789") for _ in range(9))
+
+
+def _email(rng: random.Random) -> str:
+    user = "".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(4, 10)))
+    return f"{user}{rng.randint(1, 999)}@{rng.choice(['qq.com', '163.com', 'gmail.com', 'example.cn'])}"
+
+
+def _experience_lines(rng: random.Random, count: int) -> List[str]:
+    lines = []
+    for _ in range(count):
+        year = rng.randint(2010, 2024)
+        lines.append(f"{year}.{rng.randint(1, 12):02d}-{year + rng.randint(1, 3)}.{rng.randint(1, 12):02d} "
+                     f"{rng.choice(COMPANIES)} {rng.choice(ROLES)}")
+        lines.append("负责" + "、".join(rng.sample(SKILLS, 3)) + "相关工作，推动团队效率提升"
+                     f"{rng.randint(10, 60)}%，参与{rng.randint(2, 9)}个核心项目的设计与交付。")
+    return lines
+
+
+def generate_resume(rng: random.Random, experience_blocks: int = 3) -> Tuple[Dict, Dict[str, Optional[str]]]:
+    """
+    生成一份简历，返回 (结构化内容, 期望解析结果)。
+    结构化内容中 sections 为 [(标题, [行...]), ...]，header 为开头的基本信息行，便于渲染成文本 / DOCX / PDF。
+    """
+    name = _name(rng)
+    gender = rng.choice(["男", "女"])
+    age = str(rng.randint(21, 45))
+    degree = rng.choice(DEGREES)
+    university = rng.choice(UNIVERSITIES)
+    major = rng.choice(MAJORS)
+    phone = _phone(rng)
+    email = _email(rng)
+    start = rng.randint(2005, 2020)
+
+    header = [
+        name,
+        f"{gender} 丨 {age}岁 丨 {degree}",
+        f"电话：{phone}  邮箱：{email}",
+    ]
+    sections = [
+        ("教育经历", [
+            f"{university} {start}.09-{start + 4}.06",
+            f"{degree}学历 丨 {'学士' if degree in ('本科', '大专') else degree}学位 丨 {major} 丨 全日制",
+        ]),
+        ("工作经历", _experience_lines(rng, experience_blocks)),
+        ("专业技能", ["熟悉 " + "、".join(rng.sample(SKILLS, 5))]),
+    ]
+    expected = {
+        "name": name,
+        "gender": gender,
+        "age": age,
+        "phone": phone,
+        "email": email,
+        "university": university,
+        "degree": degree,
+        "major": major,
+    }
+    education = {"university": university, "period": f"{start}.09-{start + 4}.06", "degree": degree, "major": major}
+    return {"header": header, "sections": sections, "education": education}, expected
+
+
+def render_text(resume: Dict) -> str:
+    lines = list(resume["header"])
+    for title, body in resume["sections"]:
+        lines.append(title)
+        lines.extend(body)
+    return "\n".join(lines)
+
+
+def generate_corpus(count: int, seed: int = 42, min_blocks: int = 1, max_blocks: int = 8):
+    """生成 count 份 (文本, 期望结果)，相同 seed 得到相同语料"""
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(count):
+        resume, expected = generate_resume(rng, rng.randint(min_blocks, max_blocks))
+        corpus.append((render_text(resume), expected))
+    return corpus
+
+
+# ==================== PDF / DOCX 文件 ====================
+
+LAYOUTS = ("plain", "table")  # table：教育经历排成表格
+BLOCKS_PER_PAGE = 14  # A4、10.5 号字时每页约容纳的工作经历条数
+
+
+def generate_documents(count: int, seed: int = 42, min_pages: int = 1, max_pages: int = 20) -> List[Dict]:
+    """
+    生成 count 份待渲染的简历：{"resume", "expected", "pages"（目标页数）, "layout"}。
+    目标页数七成落在 min_pages~3 页（常见简历长度），其余在 min_pages~max_pages 之间均匀分布。
+    """
+    rng = random.Random(seed)
+    documents = []
+    for _ in range(count):
+        short = rng.random() < 0.7
+        pages = rng.randint(min_pages, min(max_pages, 3) if short else max_pages)
+        layout = rng.choice(LAYOUTS)
+        resume, expected = generate_resume(rng, max(1, pages * BLOCKS_PER_PAGE - 4))
+        documents.append({"resume": resume, "expected": expected, "pages": pages, "layout": layout})
+    return documents
+
+
+def _education_table(resume: Dict) -> List[List[str]]:
+    edu = resume["education"]
+    return [["学校", "时间", "学历", "专业"], [edu["university"], edu["period"], edu["degree"], edu["major"]]]
+
+
+def render_pdf(document: Dict, path: str):
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import ParagraphStyle
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.cidfonts import UnicodeCIDFont
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Table
+
+    if "STSong-Light" not in pdfmetrics.getRegisteredFontNames():
+        pdfmetrics.registerFont(UnicodeCIDFont("STSong-Light"))
+    body = ParagraphStyle("body", fontName="STSong-Light", fontSize=10.5, leading=15)
+    title = ParagraphStyle("title", parent=body, fontSize=13, leading=20, spaceBefore=6)
+
+    resume = document["resume"]
+    story = [Paragraph(line, body) for line in resume["header"]]
+    for section, lines in resume["sections"]:
+        story.append(Paragraph(section, title))
+        if section == "教育经历" and document["layout"] == "table":
+            story.append(Table(_education_table(resume), style=[
+                ("FONTNAME", (0, 0), (-1, -1), "STSong-Light"),
+                ("GRID", (0, 0), (-1, -1), 0.5, "black"),
+            ]))
+            continue
+        story.extend(Paragraph(line, body) for line in lines)
+    SimpleDocTemplate(path, pagesize=A4).build(story)
+
+
+def render_docx(document: Dict, path: str):
+    from docx import Document
+    from docx.enum.text import WD_BREAK
+
+    resume = document["resume"]
+    doc = Document()
+    for line in resume["header"]:
+        doc.add_paragraph(line)
+    for section, lines in resume["sections"]:
+        doc.add_heading(section, level=2)
+        if section == "教育经历" and document["layout"] == "table":
+            rows = _education_table(resume)
+            table = doc.add_table(rows=len(rows), cols=len(rows[0]))
+            table.style = "Table Grid"
+            for r, row in enumerate(rows):
+                for c, value in enumerate(row):
+                    table.cell(r, c).text = value
+            continue
+        for i, line in enumerate(lines):
+            paragraph = doc.add_paragraph(line)
+            # 按目标页数插入分页符，Word 中打开时页数与 PDF 接近
+            if section == "工作经历" and i and i % (BLOCKS_PER_PAGE * 2) == 0:
+                paragraph.add_run().add_break(WD_BREAK.PAGE)
+    doc.save(path)
@@ -0,0 +1,88 @@
+"""
+候选人标签：tags（标签字典，name 唯一）+ candidate_tags（候选人与标签的关联表）。
+
+Candidate.tags 字符串仍然保留，用于列表展示和全文索引；修改标签时通过 set_candidate_tags
+同时更新字符串和关联表。按标签筛选、统计标签数量都只查关联表，走 (tag_id, candidate_id) 索引，
+不再对 tags 字符串做 LIKE '%x%'（无法使用索引，且 "Java" 会误命中 "JavaScript"）。
+"""
+from typing import Dict, List, Optional
+
+from sqlalchemy import func, select
+
+from models import Candidate, Tag, CandidateTag
+
+TAG_MAX_LENGTH = 100
+TAG_MODES = ("and", "or")
+
+
+def split_tags(value: Optional[str]) -> List[str]:
+    """逗号分隔的标签字符串 -> 标签列表（去除空白、去重，保持原有顺序）"""
+    result = []
+    for tag in (value or "").split(","):
+        tag = tag.strip()
+        if tag and tag not in result:
+            result.append(tag)
+    return result
+
+
+def _insert_missing_tags(db, names: List[str]):
+    """插入尚不存在的标签；并发插入同名标签时依靠唯一约束忽略冲突"""
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        existing = {row[0] for row in db.query(Tag.name).filter(Tag.name.in_(names))}
+        db.add_all(Tag(name=name) for name in names if name not in existing)
+        db.flush()
+        return
+    db.execute(insert(Tag).values([{"name": name} for name in names]).on_conflict_do_nothing(
+        index_elements=["name"]
+    ))
+
+
+def get_or_create_tags(db, names: List[str]) -> List[Tag]:
+    """按名称取出标签，不存在的先创建；返回顺序与 names 一致"""
+    if not names:
+        return []
+    _insert_missing_tags(db, names)
+    by_name: Dict[str, Tag] = {tag.name: tag for tag in db.query(Tag).filter(Tag.name.in_(names))}
+    return [by_name[name] for name in names]
+
+
+def set_candidate_tags(db, candidate: Candidate, names: List[str]):
+    """替换候选人的标签（字符串和关联表一起更新，由调用方提交事务）"""
+    candidate.tags = ",".join(names)
+    candidate.tag_items = get_or_create_tags(db, names)
+
+
+def tag_filter(names: List[str], mode: str = "and"):
+    """
+    按标签精确筛选候选人的条件表达式。
+    mode="and" 要求包含全部标签，mode="or" 包含任意一个即可。
+    """
+    matched = (
+        select(CandidateTag.candidate_id)
+        .join(Tag, Tag.id == CandidateTag.tag_id)
+        .where(Tag.name.in_(names))
+    )
+    if mode == "and" and len(names) > 1:
+        # (candidate_id, tag_id) 是主键，同一候选人命中的行数即命中的标签数
+        matched = matched.group_by(CandidateTag.candidate_id).having(func.count() == len(names))
+    return Candidate.id.in_(matched)
+
+
+def tag_counts(db) -> List[Dict]:
+    """
+    所有标签及其候选人数量（一次聚合查询，只扫描关联表的 (tag_id, candidate_id) 索引，
+    不加载候选人）；没有候选人的标签不返回。按标签名排序。
+    """
+    rows = (
+        db.query(Tag.name, func.count(CandidateTag.candidate_id))
+        .join(CandidateTag, CandidateTag.tag_id == Tag.id)
+        .group_by(Tag.id, Tag.name)
+        .order_by(Tag.name)
+        .all()
+    )
+    return [{"name": name, "count": count} for name, count in rows]
@@ -0,0 +1,164 @@
+"""
+纯文本批量入库（/upload-text/batch）：流式读取请求体中的记录，在解析进程池中分批解析。
+
+请求体可以是 NDJSON（每行一个 JSON）或 JSON 数组，按首个非空白字符是否为 [ 判断；
+边接收边解码，不会把整个请求体读入内存。每条记录为 {"text": "...", "external_id": "..."}，
+也可以直接是一个字符串（即 text）。external_id 由调用方提供（如爬虫的原始页面 ID），
+同一个 external_id 重复提交时返回已有候选人，不会重复入库。
+
+本模块也会在解析进程中导入，不要在这里引入数据库相关模块。
+"""
+import codecs
+import json
+from typing import AsyncIterator, Dict, List, Optional, Union
+
+from parser import parse_resume_text_cn
+
+EXTERNAL_ID_MAX_LENGTH = 200
+_WHITESPACE = " \t\r\n"
+
+
+class RecordError:
+    """无法解码或格式不正确的记录；NDJSON 中只影响该行，JSON 数组中之后的内容无法继续读取"""
+
+    def __init__(self, message: str):
+        self.message = message
+
+
+def parse_resume_texts(texts: List[str]) -> List[Dict]:
+    """在解析进程中执行：逐条解析，单条失败时返回 {"error": ...}，不影响同批其它记录"""
+    results = []
+    for text in texts:
+        try:
+            results.append(parse_resume_text_cn(text))
+        except Exception as e:
+            results.append({"error": str(e).encode('utf-8', errors='replace').decode('utf-8')})
+    return results
+
+
+def normalize_record(record) -> Union[Dict, RecordError]:
+    """记录 -> {"text", "external_id"}；格式不正确时返回 RecordError"""
+    if isinstance(record, RecordError):
+        return record
+    if isinstance(record, str):
+        record = {"text": record}
+    if not isinstance(record, dict):
+        return RecordError("记录必须是对象或字符串")
+    text = record.get("text")
+    if not isinstance(text, str) or not text.strip():
+        return RecordError("缺少 text 字段")
+    external_id = record.get("external_id")
+    if external_id is not None:
+        if not isinstance(external_id, (str, int)) or isinstance(external_id, bool):
+            return RecordError("external_id 必须是字符串或整数")
+        external_id = str(external_id)
+        if not external_id or len(external_id) > EXTERNAL_ID_MAX_LENGTH:
+            return RecordError(f"external_id 长度必须在 1 到 {EXTERNAL_ID_MAX_LENGTH} 之间")
+    return {"text": text, "external_id": external_id}
+
+
+async def iter_records(chunks: AsyncIterator[bytes], max_record_bytes: int) -> AsyncIterator:
+    """
+    从字节流中逐条解码记录（NDJSON 或 JSON 数组），返回 Python 对象或 RecordError。
+    单条记录超过 max_record_bytes 时返回 RecordError 并停止读取。
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    json_decoder = json.JSONDecoder()
+    buf = ""
+    pos = 0
+    mode: Optional[str] = None  # "ndjson" / "array"
+    array_state = "open"  # open：等待 [；value：等待记录或 ]；sep：等待 , 或 ]；done
+    eof = False
+
+    iterator = chunks.__aiter__()
+    while True:
+        # 补充数据
+        if not eof:
+            try:
+                chunk = await iterator.__anext__()
+                buf = buf[pos:] + decoder.decode(chunk)
+            except StopAsyncIteration:
+                eof = True
+                buf = buf[pos:] + decoder.decode(b"", final=True)
+            pos = 0
+
+        if mode is None:
+            stripped = buf.lstrip(_WHITESPACE)
+            if not stripped:
+                if eof:
+                    return
+                continue
+            mode = "array" if stripped[0] == "[" else "ndjson"
+
+        if mode == "ndjson":
+            while True:
+                newline = buf.find("\n", pos)
+                if newline == -1:
+                    break
+                line = buf[pos:newline].strip()
+                pos = newline + 1
+                if line:
+                    yield _loads_line(line)
+            if len(buf) - pos > max_record_bytes:
+                yield RecordError(f"单条记录不能超过 {max_record_bytes} 字节")
+                return
+            if eof:
+                line = buf[pos:].strip()
+                if line:
+                    yield _loads_line(line)
+                return
+            continue
+
+        # JSON 数组：逐个解码元素，未接收完整的元素等待更多数据
+        while array_state != "done":
+            while pos < len(buf) and buf[pos] in _WHITESPACE:
+                pos += 1
+            if pos >= len(buf):
+                break
+            ch = buf[pos]
+            if array_state == "open":
+                if ch != "[":
+                    yield RecordError("请求体不是合法的 JSON 数组")
+                    return
+                pos += 1
+                array_state = "value"
+            elif array_state == "sep":
+                if ch == ",":
+                    pos += 1
+                    array_state = "value"
+                elif ch == "]":
+                    pos += 1
+                    array_state = "done"
+                else:
+                    yield RecordError("请求体不是合法的 JSON 数组")
+                    return
+            else:
+                if ch == "]":
+                    pos += 1
+                    array_state = "done"
+                    continue
+                try:
+                    value, end = json_decoder.raw_decode(buf, pos)
+                except json.JSONDecodeError as e:
+                    if eof:
+                        yield RecordError(f"JSON 解码失败: {e.msg}")
+                        return
+                    break  # 元素尚未接收完整
+                pos = end
+                array_state = "sep"
+                yield value
+        if array_state == "done":
+            return
+        if len(buf) - pos > max_record_bytes:
+            yield RecordError(f"单条记录不能超过 {max_record_bytes} 字节")
+            return
+        if eof:
+            yield RecordError("JSON 数组不完整")
+            return
+
+
+def _loads_line(line: str):
+    try:
+        return json.loads(line)
+    except json.JSONDecodeError as e:
+        return RecordError(f"JSON 解码失败: {e.msg}")
@@ -38,6 +38,16 @@ export async function login(username, password) {
   return await response.json();
 }
 
+/**
+ * 退出登录（服务端注销当前 token）
+ */
+export async function logout() {
+  await fetch(`${API_BASE_URL}/api/auth/logout`, {
+    method: 'POST',
+    headers: getAuthHeaders(),
+  });
+}
+
 /**
  * 获取当前用户信息
  * @returns {Promise<Object>} 用户信息